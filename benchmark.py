@@ -0,0 +1,53 @@
+import sys
+import argparse
+
+from const import FORMULATION_PAIRS, FORMULATION_ALTERNATIVE, SEARCH_PHASES_NONE, SEARCH_PHASES_DUE_DATE, \
+    SEARCH_PHASES_SEQUENCE_FIRST
+from libs.loggers import logging
+from services.production_planning.model_replay import ModelReplay
+from services.production_planning.planner_benchmark import PlannerBenchmark
+
+
+parser = argparse.ArgumentParser(
+    description="Compare planner configurations on instances exported with main.py --export-model.")
+parser.add_argument("model_dir", help="Directory of exported models")
+parser.add_argument("--time-limit", type=float, default=60, help="Time limit of every solve in seconds")
+parser.add_argument("--formulation", nargs='*', default=[FORMULATION_PAIRS, FORMULATION_ALTERNATIVE],
+                    choices=[FORMULATION_PAIRS, FORMULATION_ALTERNATIVE],
+                    help="Formulations to compare, both by default")
+parser.add_argument("--search-phases", nargs='*', default=[],
+                    choices=[SEARCH_PHASES_NONE, SEARCH_PHASES_DUE_DATE, SEARCH_PHASES_SEQUENCE_FIRST])
+parser.add_argument("--due-date-hint", type=int, nargs='*', default=[], choices=[0, 1])
+parser.add_argument("--output", help="Write the result table to this CSV file")
+args = parser.parse_args()
+
+logging.init()
+logger = logging.getLogger('benchmark')
+
+
+def main():
+    model_dirs = ModelReplay.find_model_dirs(args.model_dir)
+    benchmark = PlannerBenchmark(model_dirs=model_dirs)
+    if len(benchmark.model_dirs) == 0:
+        logger.error("No exported instance found in {}".format(args.model_dir))
+        return
+
+    result_df = benchmark.run(
+        time_limit=args.time_limit,
+        config_grid={
+            "formulation": args.formulation,
+            "search_phases": args.search_phases,
+            "due_date_hint": [bool(x) for x in args.due_date_hint]
+        }
+    )
+
+    print(result_df.to_string(index=False))
+
+    if args.output:
+        result_df.to_csv(args.output, index=False)
+        logger.info("Write results to {}".format(args.output))
+
+
+if __name__ == "__main__":
+    main()
+    sys.exit(0)
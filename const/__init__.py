@@ -4,4 +4,69 @@ IRON_DENSITY = 7875
 TIME_SCALE = 15
 DEFUALT_RUN_TIME_LIMIT = 60
 OT = False
-N_DATE_BEFORE_DEADLINE = 14
\ No newline at end of file
+N_DATE_BEFORE_DEADLINE = 14
+MIN_REMAINING_RATIO = 0.03
+CP_ENGINE = 'cp'
+LOCAL_SEARCH_ENGINE = 'local_search'
+DEFAULT_ENGINE = CP_ENGINE
+LOCAL_SEARCH_TIME_LIMIT = 0.5
+FETCH_CHUNK_SIZE = 5000
+PIPELINE_WORKERS = 2
+SOLUTION_CACHE_DIR = './solution_cache'
+SOLUTION_CACHE_MAX_BYTES = 50 * 1024 * 1024
+SOLVER_POOL_SIZE = 2
+COARSE_TIME_SCALE = 60
+COARSE_TIME_LIMIT_RATIO = 0.3
+PUBLISH_MODE_SWAP = 'swap'
+PUBLISH_MODE_DIFF = 'diff'
+DEFAULT_PUBLISH_MODE = PUBLISH_MODE_SWAP
+PLAN_VERSION_RETENTION = 3
+TARGET_GAP = 0.01
+MULTI_SITE_PARALLEL = 2
+MULTI_SITE_LOG_DIR = './logs'
+WATCH_POLL_INTERVAL = 30
+WATCH_DEBOUNCE = 60
+WATCH_MAX_DELAY = 600
+PORTFOLIO_SIZE = 0
+# Search parameters of the portfolio members, the members after the list use
+# restarts with different random seeds
+PORTFOLIO_SEARCH_CONFIGS = [
+    {},
+    {"SearchType": "Restart", "RandomSeed": 1},
+    {"SearchType": "MultiPoint"},
+    {"SearchType": "IterativeDiving"}
+]
+# Large neighborhood search
+LNS_INITIAL_TIME_RATIO = 0.5
+LNS_ITERATION_TIME_LIMIT = 2
+LNS_NEIGHBORHOOD_SIZE = 20
+LNS_NEIGHBORHOODS = ["machine", "time_window", "material"]
+LNS_RANDOM_SEED = 0
+MACHINE_GROUPING_AUTO = 'auto'
+MACHINE_GROUPING_FIXED = 'fixed'
+DEFAULT_MACHINE_GROUPING = MACHINE_GROUPING_AUTO
+# Solve history and automatic time limit
+HISTORY_DIR = './solve_history'
+HISTORY_MAX_RECORDS = 1000
+HISTORY_MIN_RECORDS = 3
+HISTORY_NEIGHBORS = 5
+HISTORY_NEGLIGIBLE_IMPROVEMENT = 0.01
+HISTORY_SAFETY_FACTOR = 1.5
+TIME_LIMIT_FLOOR = 10
+TIME_LIMIT_CEILING = 300
+FORMULATION_PAIRS = 'pairs'
+FORMULATION_ALTERNATIVE = 'alternative'
+DEFAULT_FORMULATION = FORMULATION_PAIRS
+BENCHMARK_QUALITY_GAP = 0.01
+# Search phases
+SEARCH_PHASES_NONE = 'none'
+SEARCH_PHASES_DUE_DATE = 'due_date'
+SEARCH_PHASES_SEQUENCE_FIRST = 'sequence_first'
+DEFAULT_SEARCH_PHASES = SEARCH_PHASES_NONE
+SEARCH_PHASE_BUCKETS = 4
+# Distributed planning
+QUEUE_LEASE_SECONDS = 60
+QUEUE_HEARTBEAT_INTERVAL = 10
+QUEUE_POLL_INTERVAL = 1
+QUEUE_MAX_ATTEMPTS = 3
+QUEUE_WAIT_TIMEOUT = 3600
\ No newline at end of file
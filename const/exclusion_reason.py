@@ -0,0 +1,4 @@
+NON_POSITIVE_REMAINING = 'non_positive_remaining'
+BELOW_MIN_REMAINING_RATIO = 'below_min_remaining_ratio'
+NO_COMPATIBLE_MACHINE = 'no_compatible_machine'
+GROUP_SOLVE_FAILED = 'group_solve_failed'
@@ -6,6 +6,7 @@ CONFIG_KEYS = ["user", "password", "host", "database"]
 class DbConnection:
     def __init__(self):
         self.__conn = None
+        self.__config = None
         
     def __validate_config(self, config: dict):
         for key in CONFIG_KEYS:
@@ -21,6 +22,17 @@ class DbConnection:
             raise Exception('Something went wrong')
 
         self.__conn = mariadb.connect(**config)
+        self.__config = config
+
+    def create_connector(self):
+        """
+            Open a new connection with the configuration of connect().
+            The caller is responsible for closing it.
+        """
+        if self.__config is None:
+            raise Exception('Database is not connected')
+
+        return mariadb.connect(**self.__config)
 
     def get_connector(self):
         return self.__conn
@@ -1,6 +1,12 @@
 from abc import ABCMeta
+from datetime import date
+from decimal import Decimal
+import numpy as np
+import pandas as pd
 from mariadb import Connection, Cursor
 
+from const import FETCH_CHUNK_SIZE
+
 
 class Repository:
     def __init__(self, conn: Connection):
@@ -41,3 +47,98 @@ class CustomRepository(metaclass=ABCMeta):
         result = [dict(zip(key_names, x)) for x in result]
 
         return result
+
+    def __infer_kind(self, values: tuple):
+        sample = next((x for x in values if x is not None), None)
+
+        if sample is None:
+            return 'none'
+        elif isinstance(sample, (Decimal, float)):
+            return 'float'
+        elif isinstance(sample, date):
+            return 'datetime'
+        elif isinstance(sample, (int, np.integer)) and not isinstance(sample, bool):
+            # Integer columns with NULL become float64
+            return 'float' if None in values else 'int'
+        else:
+            return 'object'
+
+    def __to_array(self, values: tuple, kind: str):
+        if kind == 'none':
+            return np.full(len(values), None, dtype=object)
+        elif kind == 'float':
+            return np.array([np.nan if x is None else x for x in values], dtype=np.float64)
+        elif kind == 'datetime':
+            return pd.to_datetime(list(values)).to_numpy(dtype='datetime64[ns]')
+        elif kind == 'int':
+            return np.array(values, dtype=np.int64)
+        else:
+            return np.array(values, dtype=object)
+
+    def __merge_kinds(self, kinds: list):
+        """
+            Kind of a whole column from the kinds of its chunks, so that the
+            dtype does not depend on the chunk size.
+        """
+        kinds = set(kinds) - {'none'}
+        if len(kinds) == 0:
+            return 'none'
+        if kinds == {'int', 'float'}:
+            return 'float'
+        if len(kinds) == 1:
+            return kinds.pop()
+
+        return 'object'
+
+    def __cast_chunk(self, chunk: np.ndarray, chunk_kind: str, kind: str):
+        if chunk_kind == kind:
+            return chunk
+        if chunk_kind == 'none':
+            if kind in ('float', 'int'):
+                return np.full(len(chunk), np.nan)
+            if kind == 'datetime':
+                return np.full(len(chunk), np.datetime64('NaT'), dtype='datetime64[ns]')
+            return chunk
+        if kind == 'float':
+            return chunk.astype(np.float64)
+
+        return chunk.astype(object)
+
+    def fetch_dataframe(self, cur: Cursor, chunk_size: int = FETCH_CHUNK_SIZE):
+        """
+            Fetch the result of an executed cursor into a DataFrame.
+
+            Rows are fetched chunk by chunk and every chunk is converted into typed
+            columns immediately: DECIMAL becomes float64, DATE/DATETIME becomes
+            datetime64 and integer columns with NULL become float64. The dtype of
+            a column is decided over all of its chunks.
+        """
+        key_names = [x[0] for x in cur.description]
+        column_chunks = [[] for _ in key_names]
+        column_kinds = [[] for _ in key_names]
+
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+
+            for chunks, kinds, values in zip(column_chunks, column_kinds, zip(*rows)):
+                kind = self.__infer_kind(values)
+                chunks.append(self.__to_array(values, kind))
+                kinds.append(kind)
+
+        for i, (chunks, kinds) in enumerate(zip(column_chunks, column_kinds)):
+            kind = self.__merge_kinds(kinds)
+            # An integer column with an all NULL chunk is nullable
+            if kind == 'int' and 'none' in kinds:
+                kind = 'float'
+            column_chunks[i] = [self.__cast_chunk(chunk, chunk_kind, kind)
+                                for chunk, chunk_kind in zip(chunks, kinds)]
+
+        return pd.DataFrame(
+            {
+                key_name: np.concatenate(chunks) if len(chunks) > 0 else np.array([])
+                for key_name, chunks in zip(key_names, column_chunks)
+            },
+            columns=key_names
+        )
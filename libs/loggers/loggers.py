@@ -14,3 +14,22 @@ class Logging:
 
     def getLogger(self, name: str):
         return logging.getLogger(name)
+
+    def add_site_handler(self, file: str, site: str):
+        """
+            Write the records logged while the current thread plans site
+            (setting site) into file.
+        """
+        handler = logging.FileHandler(file)
+        handler.setFormatter(logging.Formatter(
+            fmt='%(asctime)s %(name)s %(levelname)s %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        ))
+        handler.addFilter(lambda record: settings.get_setting('site') == site)
+        logging.getLogger().addHandler(handler)
+
+        return handler
+
+    def remove_handler(self, handler: logging.Handler):
+        logging.getLogger().removeHandler(handler)
+        handler.close()
@@ -0,0 +1,107 @@
+import time
+import tracemalloc
+from contextlib import contextmanager
+import psutil
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+from libs.loggers import logging
+
+
+logger = logging.getLogger('profiler')
+
+N_TOP_ALLOCATIONS = 3
+
+
+class Profiler:
+    """
+        Opt-in memory profiler. Every phase records its wall time, the RSS of
+        the process, the peak RSS so far and the traced python allocations
+        (current, peak during the phase and the largest allocation sites).
+
+        tracemalloc traces the whole process, so phases of machine groups
+        solved at the same time are not separated.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.phases = []
+        self.counters = {}
+
+        if self.enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def __get_peak_rss(self, memory_info):
+        if hasattr(memory_info, 'peak_wset'):
+            return memory_info.peak_wset
+        if resource is not None:
+            # ru_maxrss is in kilobytes on Linux
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+        return None
+
+    @contextmanager
+    def phase(self, name: str):
+        if not self.enabled:
+            yield
+            return
+
+        tracemalloc.reset_peak()
+        traced_before, _ = tracemalloc.get_traced_memory()
+        started_at = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started_at
+            traced, traced_peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap*>')
+            ])
+            memory_info = psutil.Process().memory_info()
+
+            record = {
+                "phase": name,
+                "seconds": round(seconds, 3),
+                "rss_bytes": memory_info.rss,
+                "peak_rss_bytes": self.__get_peak_rss(memory_info),
+                "traced_bytes": traced,
+                "traced_delta_bytes": traced - traced_before,
+                "traced_peak_bytes": traced_peak,
+                "top_allocations": [
+                    str(stat) for stat in snapshot.statistics('lineno')[:N_TOP_ALLOCATIONS]
+                ]
+            }
+            self.phases.append(record)
+
+            logger.debug('Phase {}: {:.3f} s, RSS {:.1f} MB, traced peak {:.1f} MB'.format(
+                name, seconds, memory_info.rss / 1024 ** 2, traced_peak / 1024 ** 2))
+
+    def add_counters(self, **counters):
+        if self.enabled:
+            self.counters.update(counters)
+
+    def log_summary(self):
+        """
+            Log the wall time and memory of every phase.
+        """
+        for record in self.phases:
+            logger.info('Phase {}: {:.3f} s, RSS {:.1f} MB, traced peak {:.1f} MB'.format(
+                record['phase'],
+                record['seconds'],
+                record['rss_bytes'] / 1024 ** 2,
+                record['traced_peak_bytes'] / 1024 ** 2))
+
+    def get_report(self):
+        if not self.enabled:
+            return None
+
+        return {
+            "phases": self.phases,
+            "counters": self.counters
+        }
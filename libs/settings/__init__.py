@@ -1,4 +1,5 @@
 from libs.settings.settings import Settings
+from libs.settings.planning_context import PlanningContext
 
 
 settings = Settings()
@@ -0,0 +1,95 @@
+import dataclasses
+from datetime import datetime
+from typing import FrozenSet
+
+from const import DEFUALT_RUN_TIME_LIMIT, OT
+from const.weights import WEIGHT_OF_ADJUSTMENT_TIME, WEIGHT_OF_TARDY_JOB
+from const.working_hour import working_hour_interval, overtime_hour_interval
+from libs.settings.settings import Settings
+
+
+@dataclasses.dataclass(frozen=True)
+class PlanningContext:
+    """
+        Parameters of one planning run. The context is immutable and passed
+        explicitly to ProductionPlanning, Planner, Scheduler and the other
+        services of the run, so runs with different parameters can share one
+        process. from_settings() creates it from the global settings.
+
+            Parameters:
+                start_working_hour (datetime): start of the first working day
+                holiday (FrozenSet[str]): holidays YYYY-MM-DD
+                ot (bool): plan with overtime hours
+                run_time_limit (float): time limit of the solver per machine group in seconds
+                weight_of_tardy_job (int): objective weight of a tardy time unit
+                weight_of_adjustment_time (int): objective weight of an adjustment time unit
+    """
+    start_working_hour: datetime
+    holiday: FrozenSet[str] = frozenset()
+    ot: bool = OT
+    run_time_limit: float = DEFUALT_RUN_TIME_LIMIT
+    weight_of_tardy_job: int = WEIGHT_OF_TARDY_JOB
+    weight_of_adjustment_time: int = WEIGHT_OF_ADJUSTMENT_TIME
+
+    def __post_init__(self):
+        object.__setattr__(self, 'holiday', frozenset(self.holiday))
+
+    @classmethod
+    def from_settings(cls, source: Settings = None):
+        if source is None:
+            from libs.settings import settings as source
+
+        return cls(
+            start_working_hour=source.get_start_working_date(date_type='datetime'),
+            holiday=frozenset(source.get_setting('holiday')),
+            ot=bool(source.get_setting('ot')),
+            run_time_limit=source.get_setting('run_time_limit')
+        )
+
+    def to_dict(self):
+        """
+            JSON serializable form of the context, see from_dict.
+        """
+        return {
+            "start_working_hour": self.start_working_hour.isoformat(),
+            "holiday": sorted(self.holiday),
+            "ot": self.ot,
+            "run_time_limit": self.run_time_limit,
+            "weight_of_tardy_job": self.weight_of_tardy_job,
+            "weight_of_adjustment_time": self.weight_of_adjustment_time
+        }
+
+    @classmethod
+    def from_dict(cls, values: dict):
+        return cls(**{
+            **values,
+            "start_working_hour": datetime.fromisoformat(values['start_working_hour'])
+        })
+
+    def replace(self, **changes):
+        return dataclasses.replace(self, **changes)
+
+    def with_start_date(self, date_str: str):
+        """
+            Copy of the context starting at the first working hour of date_str (YYYY-MM-DD).
+        """
+        return self.replace(start_working_hour=datetime.strptime(
+            date_str + ' {}'.format(self.working_hour_interval[0][0]),
+            '%Y-%m-%d %H:%M'
+        ))
+
+    @property
+    def working_hour_interval(self):
+        if self.ot:
+            return working_hour_interval + overtime_hour_interval
+
+        return working_hour_interval
+
+    def is_holiday(self, date: datetime):
+        return date.strftime('%Y-%m-%d') in self.holiday
+
+    def get_start_working_date(self, date_type: str = 'date'):
+        if date_type == 'date':
+            return self.start_working_hour.strftime('%Y-%m-%d')
+
+        return self.start_working_hour
@@ -1,6 +1,10 @@
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 
-from const import DEFUALT_RUN_TIME_LIMIT, OT
+from const import DEFUALT_RUN_TIME_LIMIT, OT, DEFAULT_ENGINE, PIPELINE_WORKERS, \
+    DEFAULT_PUBLISH_MODE, PLAN_VERSION_RETENTION, TARGET_GAP, PORTFOLIO_SIZE, DEFAULT_MACHINE_GROUPING, \
+    TIME_LIMIT_FLOOR, TIME_LIMIT_CEILING, DEFAULT_FORMULATION, DEFAULT_SEARCH_PHASES
 from const.working_hour import working_hour_interval
 
 
@@ -20,15 +24,80 @@ class Settings:
             "start_working_hour": start_working_hour,
             "run_time_limit": DEFUALT_RUN_TIME_LIMIT,
             "holiday": [],
-            "ot": OT
+            "ot": OT,
+            "engine": DEFAULT_ENGINE,
+            "model_export_dir": None,
+            "solution_cache_dir": None,
+            "pipeline": False,
+            "pipeline_workers": PIPELINE_WORKERS,
+            "solver_pool_size": None,
+            "coarse_time_scale": None,
+            "publish_mode": DEFAULT_PUBLISH_MODE,
+            "plan_version_retention": PLAN_VERSION_RETENTION,
+            "target_gap": TARGET_GAP,
+            "report_file": None,
+            "profile": False,
+            "site": None,
+            "solver_workers": None,
+            "portfolio_size": PORTFOLIO_SIZE,
+            "lns": False,
+            "machine_grouping": DEFAULT_MACHINE_GROUPING,
+            "history_dir": None,
+            "auto_time_limit": False,
+            "time_limit_floor": TIME_LIMIT_FLOOR,
+            "time_limit_ceiling": TIME_LIMIT_CEILING,
+            "formulation": DEFAULT_FORMULATION,
+            "search_phases": DEFAULT_SEARCH_PHASES,
+            "due_date_hint": False,
+            "job_queue": None
         }
+        self.__local = threading.local()
+
+    @contextmanager
+    def override(self, values: dict):
+        """
+            Override settings for the current thread only. Updates made inside
+            the block stay in the override and the other threads keep seeing
+            the shared settings.
+        """
+        previous = getattr(self.__local, 'settings', None)
+        self.__local.settings = dict(values)
+        try:
+            yield
+        finally:
+            self.__local.settings = previous
+
+    def bind(self, task):
+        """
+            Wrap task to run with the override of the current thread, for
+            tasks handed to other threads which do not inherit it.
+        """
+        values = getattr(self.__local, 'settings', None)
+        if values is None:
+            return task
+
+        def run(*args, **kwargs):
+            with self.override(values):
+                return task(*args, **kwargs)
+
+        return run
 
     def update_setting(self, key, value):
-        self.settings.update({
-            key: value
-        })
+        local_settings = getattr(self.__local, 'settings', None)
+        if local_settings is not None:
+            local_settings.update({
+                key: value
+            })
+        else:
+            self.settings.update({
+                key: value
+            })
 
     def get_setting(self, key):
+        local_settings = getattr(self.__local, 'settings', None)
+        if local_settings is not None and key in local_settings:
+            return local_settings.get(key)
+
         return self.settings.get(key)
 
     def set_start_working_date(self, date_str: str):
@@ -37,14 +106,12 @@ class Settings:
             '%Y-%m-%d %H:%M'
         )
 
-        self.settings.update({
-            'start_working_hour': start_working_hour
-        })
+        self.update_setting('start_working_hour', start_working_hour)
 
     def get_start_working_date(self, date_type: str = 'date'):
         if date_type == 'date':
-            return self.settings.get('start_working_hour').strftime('%Y-%m-%d')
+            return self.get_setting('start_working_hour').strftime('%Y-%m-%d')
         elif date_type == 'timestamp':
-            return self.settings.get('start_working_hour').stftime('%Y-%m-%d %H-%M-%D')
+            return self.get_setting('start_working_hour').stftime('%Y-%m-%d %H-%M-%D')
         elif date_type == 'datetime':
-            return self.settings.get('start_working_hour')
+            return self.get_setting('start_working_hour')
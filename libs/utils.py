@@ -1,5 +1,6 @@
 import os
 import sys
+import platform
 import numpy as np
 from datetime import datetime
 
@@ -10,6 +11,21 @@ def resource_path(relative_path):
     return os.path.join(os.path.abspath("."), relative_path)
 
 
+def get_cpoptimizer_path():
+    if platform.system() in (['Linux', 'Darwin']):
+        # Linux or MAC OS X
+        execfile = './cpoptimizer'
+
+    elif platform.system() == 'Windows':
+        # Windows
+        execfile = './cpoptimizer.exe'
+
+    else:
+        raise Exception('Invalid platform')
+
+    return resource_path(execfile)
+
+
 def create_time_for_comparison(time: str):
     (hour, min) = time.split(':')
     return datetime(year=2022, month=1, day=1, hour=int(hour), minute=int(min))
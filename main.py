@@ -4,23 +4,101 @@ import sys
 import time
 import traceback
 import argparse
+import multiprocessing
 from datetime import datetime
 
+from const import CP_ENGINE, LOCAL_SEARCH_ENGINE, COARSE_TIME_SCALE, PUBLISH_MODE_SWAP, PUBLISH_MODE_DIFF, \
+    PLAN_VERSION_RETENTION, TARGET_GAP, PORTFOLIO_SIZE, MACHINE_GROUPING_AUTO, MACHINE_GROUPING_FIXED, \
+    DEFAULT_MACHINE_GROUPING, TIME_LIMIT_FLOOR, TIME_LIMIT_CEILING, FORMULATION_PAIRS, FORMULATION_ALTERNATIVE, \
+    DEFAULT_FORMULATION, SEARCH_PHASES_NONE, SEARCH_PHASES_DUE_DATE, SEARCH_PHASES_SEQUENCE_FIRST, DEFAULT_SEARCH_PHASES, \
+    SOLVER_POOL_SIZE, SOLUTION_CACHE_DIR, HISTORY_DIR
 from libs import DbConnection
 from libs.utils import is_date_format, resource_path
 from services.production_planning import ProductionPlanning
-from libs.settings import settings
+from services.production_planning.change_watcher import ChangeWatcher
+from libs.settings import settings, PlanningContext
 from libs.loggers import logging
 
 
 parser = argparse.ArgumentParser()
 parser.add_argument("--debug", action="store_true")
+parser.add_argument("--engine", choices=[CP_ENGINE, LOCAL_SEARCH_ENGINE], default=CP_ENGINE)
+parser.add_argument("--export-model", metavar="DIR",
+                    help="Write the CP model, inputs and solve parameters of every machine group to DIR")
+parser.add_argument("--solution-cache", metavar="DIR", nargs="?", const=SOLUTION_CACHE_DIR,
+                    help="Reuse the plan of a machine group whose inputs did not change, cached in DIR (default %(const)s)")
+parser.add_argument("--pipeline", action="store_true",
+                    help="Fetch data concurrently, solve machine groups in parallel and stage finished groups before one atomic switch")
+parser.add_argument("--solver-pool", metavar="N", type=int, nargs="?", const=SOLVER_POOL_SIZE,
+                    help="Keep N cpoptimizer processes (default %(const)s) alive and reuse them between solves")
+parser.add_argument("--coarse-time-scale", metavar="MIN", type=int, nargs="?", const=COARSE_TIME_SCALE,
+                    help="Solve on a MIN minute grid first (default %(const)s) and refine the solution on the normal grid")
+parser.add_argument("--publish", choices=[PUBLISH_MODE_SWAP, PUBLISH_MODE_DIFF], default=PUBLISH_MODE_SWAP,
+                    help="swap: switch in a new plan table atomically, diff: write only the changed plan rows")
+parser.add_argument("--plan-retention", metavar="N", type=int, default=PLAN_VERSION_RETENTION,
+                    help="Number of replaced plan versions to keep in swap mode")
+parser.add_argument("--target-gap", metavar="GAP", type=float, default=TARGET_GAP,
+                    help="Stop solving a machine group once its relative gap to the lower bound is at most GAP, 0 to always use the full time limit")
+parser.add_argument("--report", metavar="FILE",
+                    help="Write objective values, lower bounds and gaps of every machine group to FILE (JSON)")
+parser.add_argument("--profile", action="store_true",
+                    help="Log the time and memory use of every phase, with --report also the model size of every machine group")
+parser.add_argument("--portfolio", metavar="N", type=int, default=PORTFOLIO_SIZE,
+                    help="Solve every machine group with N search configurations in parallel processes and keep the best solution")
+parser.add_argument("--lns", action="store_true",
+                    help="Improve the solution of large machine groups by re-solving small neighborhoods of jobs")
+parser.add_argument("--machine-grouping", choices=[MACHINE_GROUPING_AUTO, MACHINE_GROUPING_FIXED], default=DEFAULT_MACHINE_GROUPING,
+                    help="auto: solve the independent groups of machines and pending materials separately, fixed: solve the groups of MACHINE_GROUP")
+parser.add_argument("--auto-time-limit", action="store_true",
+                    help="Set the time limit of every machine group from the solve history of similar sized groups (implies --solve-history)")
+parser.add_argument("--time-limit-floor", metavar="SEC", type=float, default=TIME_LIMIT_FLOOR,
+                    help="Shortest automatic time limit")
+parser.add_argument("--time-limit-ceiling", metavar="SEC", type=float, default=TIME_LIMIT_CEILING,
+                    help="Longest automatic time limit")
+parser.add_argument("--solve-history", metavar="DIR", nargs="?", const=HISTORY_DIR,
+                    help="Record the objective value over time of the solves in DIR (default %(const)s)")
+parser.add_argument("--formulation", choices=[FORMULATION_PAIRS, FORMULATION_ALTERNATIVE], default=DEFAULT_FORMULATION,
+                    help="pairs: one optional interval per job and machine, alternative: plus one master interval per job linked by alternative()")
+parser.add_argument("--search-phases", choices=[SEARCH_PHASES_NONE, SEARCH_PHASES_DUE_DATE, SEARCH_PHASES_SEQUENCE_FIRST],
+                    default=DEFAULT_SEARCH_PHASES,
+                    help="Fix the intervals of the urgent jobs first, then (due_date) or after (sequence_first) the machine sequences")
+parser.add_argument("--due-date-hint", action="store_true",
+                    help="Start the search from an earliest due date schedule")
+parser.add_argument("--queue", metavar="PATH",
+                    help="Solve the machine groups on workers (worker.py) through this job queue: a SQLite file (.db) or a directory")
+parser.add_argument("--watch", action="store_true",
+                    help="After the plan, keep running and replan the affected machine groups when pending jobs change (needs sql/change_log.sql)")
 args = parser.parse_args()
 
 
 if args.debug:
     settings.update_setting('STAGE', 'dev')
 
+settings.update_setting('engine', args.engine)
+settings.update_setting('model_export_dir', args.export_model)
+settings.update_setting('solution_cache_dir', args.solution_cache)
+settings.update_setting('pipeline', args.pipeline)
+settings.update_setting('coarse_time_scale', args.coarse_time_scale)
+settings.update_setting('publish_mode', args.publish)
+settings.update_setting('plan_version_retention', args.plan_retention)
+settings.update_setting('target_gap', args.target_gap)
+settings.update_setting('report_file', args.report)
+settings.update_setting('profile', args.profile)
+settings.update_setting('portfolio_size', args.portfolio)
+settings.update_setting('lns', args.lns)
+settings.update_setting('machine_grouping', args.machine_grouping)
+settings.update_setting('auto_time_limit', args.auto_time_limit)
+settings.update_setting('formulation', args.formulation)
+settings.update_setting('search_phases', args.search_phases)
+settings.update_setting('due_date_hint', args.due_date_hint)
+settings.update_setting('job_queue', args.queue)
+settings.update_setting('time_limit_floor', args.time_limit_floor)
+settings.update_setting('time_limit_ceiling', args.time_limit_ceiling)
+if args.auto_time_limit and not args.solve_history:
+    args.solve_history = HISTORY_DIR
+settings.update_setting('history_dir', args.solve_history)
+settings.update_setting('solver_pool_size', args.solver_pool)
+
 logging.init()
 logger = logging.getLogger('main')
 
@@ -116,12 +194,9 @@ def main():
                             if not is_date_format(h):
                                 raise Exception('Incorrect date format')
 
-                        old_holidays = settings.get_setting('holiday')
-                        old_holidays.extend(holidays)
-
                         settings.update_setting(
                             key='holiday',
-                            value=old_holidays
+                            value=settings.get_setting('holiday') + holidays
                         )
 
                         is_holiday_finish = True
@@ -161,12 +236,24 @@ def main():
 
         try:
             conn = db_connection.get_connector()
+            context = PlanningContext.from_settings()
 
-            production_planning = ProductionPlanning(
-                conn=conn
-            )
+            if args.watch:
+                change_watcher = ChangeWatcher(
+                    conn=conn,
+                    connection_factory=db_connection.create_connector,
+                    context=context
+                )
 
-            production_planning.generate_production_plan()
+                change_watcher.run()
+            else:
+                production_planning = ProductionPlanning(
+                    conn=conn,
+                    connection_factory=db_connection.create_connector,
+                    context=context
+                )
+
+                production_planning.generate_production_plan()
         except Exception as e:
             logger.debug(e)
             logger.debug(traceback.format_exc())
@@ -180,6 +267,9 @@ def main():
 
 
 if __name__ == "__main__":
+    # The solver portfolio starts worker processes, also from the bundled executable
+    multiprocessing.freeze_support()
+
     try:
         main()
         input(">>>Press enter to exit the program ...")
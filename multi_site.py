@@ -0,0 +1,48 @@
+import sys
+import json
+import argparse
+
+from const import MULTI_SITE_PARALLEL, MULTI_SITE_LOG_DIR
+from libs.settings import settings
+from libs.loggers import logging
+from services.production_planning.multi_site_runner import MultiSiteRunner
+
+
+parser = argparse.ArgumentParser(
+    description="Plan several sites concurrently. See sites_template.json for the site configuration.")
+parser.add_argument("sites_file", help="JSON file with the list of sites")
+parser.add_argument("--debug", action="store_true")
+parser.add_argument("--parallel-sites", type=int, default=MULTI_SITE_PARALLEL,
+                    help="Number of sites planned at the same time")
+parser.add_argument("--cpu-budget", type=int,
+                    help="Number of cores shared by the sites running at the same time, all cores by default")
+parser.add_argument("--log-dir", default=MULTI_SITE_LOG_DIR,
+                    help="Directory of the log file of every site")
+args = parser.parse_args()
+
+if args.debug:
+    settings.update_setting('STAGE', 'dev')
+
+logging.init()
+logger = logging.getLogger('multi_site')
+
+
+def main():
+    with open(args.sites_file, 'r') as jsonfile:
+        sites = json.load(jsonfile)
+
+    runner = MultiSiteRunner(
+        sites=sites,
+        max_parallel_sites=args.parallel_sites,
+        cpu_budget=args.cpu_budget,
+        log_dir=args.log_dir
+    )
+    result_df = runner.run()
+
+    print(result_df.to_string(index=False))
+
+    return (result_df['status'] == 'success').all()
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
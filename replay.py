@@ -0,0 +1,48 @@
+import sys
+import argparse
+
+from libs.loggers import logging
+from services.production_planning.model_replay import ModelReplay
+
+
+parser = argparse.ArgumentParser(
+    description="Re-solve models exported with main.py --export-model under different solver settings.")
+parser.add_argument("model_dir", help="Directory of exported models")
+parser.add_argument("--time-limit", type=float, nargs='*', default=[])
+parser.add_argument("--workers", type=int, nargs='*', default=[])
+parser.add_argument("--search-type", nargs='*', default=[],
+                    choices=['DepthFirst', 'Restart', 'MultiPoint', 'IterativeDiving', 'Neighborhood', 'Auto'])
+parser.add_argument("--seed", type=int, nargs='*', default=[])
+parser.add_argument("--output", help="Write the result table to this CSV file")
+args = parser.parse_args()
+
+logging.init()
+logger = logging.getLogger('replay')
+
+
+def main():
+    model_dirs = ModelReplay.find_model_dirs(args.model_dir)
+    if len(model_dirs) == 0:
+        logger.error("No exported model found in {}".format(args.model_dir))
+        return
+
+    replay = ModelReplay(model_dirs=model_dirs)
+    result_df = replay.run(
+        param_grid={
+            "TimeLimit": args.time_limit,
+            "Workers": args.workers,
+            "SearchType": args.search_type,
+            "RandomSeed": args.seed
+        }
+    )
+
+    print(result_df.to_string(index=False))
+
+    if args.output:
+        result_df.to_csv(args.output, index=False)
+        logger.info("Write results to {}".format(args.output))
+
+
+if __name__ == "__main__":
+    main()
+    sys.exit(0)
@@ -0,0 +1,165 @@
+import time
+import traceback
+from datetime import datetime, timedelta
+from typing import Callable
+import pandas as pd
+from mariadb import Connection
+
+from const import MACHINE_GROUP, WATCH_POLL_INTERVAL, WATCH_DEBOUNCE, WATCH_MAX_DELAY
+from libs.settings import PlanningContext
+from libs.loggers import logging
+from services.production_planning.production_planning import ProductionPlanning
+from services.production_planning.repositories import ProductionPlanningRepository
+
+
+logger = logging.getLogger('change_watcher')
+
+
+class ChangeWatcher:
+    """
+        Replan when the pending jobs change.
+
+        The triggers of sql/change_log.sql write every change of the tables
+        read by SoItem.get_pending_job into pd_change_log. The watcher polls
+        the log, waits until no new change arrived for debounce seconds (at
+        most max_delay seconds after the first change), and replans only the
+        machine groups which can produce the changed materials.
+
+        Every batch of changes is handled once. The machine groups of a failed
+        replan are replanned again with the next batch. Every replan starts
+        at the start date of the context, but not before tomorrow.
+    """
+
+    def __init__(
+        self,
+        conn: Connection,
+        connection_factory: Callable[[], Connection] = None,
+        poll_interval: float = WATCH_POLL_INTERVAL,
+        debounce: float = WATCH_DEBOUNCE,
+        max_delay: float = WATCH_MAX_DELAY,
+        context: PlanningContext = None
+    ):
+        self.conn = conn
+        self.context = context
+        self.connection_factory = connection_factory
+        self.repository = ProductionPlanningRepository(conn=conn)
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.last_change_id = None
+        self.failed_machine_groups = []
+
+    def __get_changes(self, after_change_id: int):
+        changes = self.repository.change_log.get_changes(after_change_id=after_change_id)
+        # End the read transaction, otherwise the next poll reads the same snapshot
+        self.repository.commit()
+
+        return changes
+
+    def __wait_for_changes(self):
+        changes = self.__get_changes(self.last_change_id)
+        while len(changes) == 0:
+            time.sleep(self.poll_interval)
+            changes = self.__get_changes(self.last_change_id)
+
+        logger.info('{} changes found, wait for more changes ...'.format(len(changes)))
+        first_change_at = time.monotonic()
+
+        while time.monotonic() - first_change_at < self.max_delay:
+            time.sleep(self.debounce)
+            new_changes = self.__get_changes(int(changes['change_id'].max()))
+            if len(new_changes) == 0:
+                break
+
+            changes = pd.concat([changes, new_changes], sort=False, axis=0, ignore_index=True)
+
+        return changes
+
+    def __find_affected_groups(self, changes: pd.DataFrame):
+        if changes['mat_id'].isna().any():
+            # A change without material can affect every group
+            return MACHINE_GROUP
+
+        machine_master = self.repository.machine.get_machine_master()
+        machine_material = self.repository.machine_material.get_machine_material()
+        self.repository.commit()
+
+        machine_ids = machine_material.loc[
+            machine_material['mat_id'].isin(changes['mat_id'].unique()), 'machine_id']
+        machine_types = set(machine_master.loc[
+            machine_master['machine_id'].isin(machine_ids), 'machine_type_id'])
+
+        return [
+            machines_type_list for machines_type_list in MACHINE_GROUP
+            if len(machine_types.intersection(machines_type_list)) > 0
+        ]
+
+    def __create_context(self):
+        context = self.context if self.context is not None else PlanningContext.from_settings()
+        tomorrow = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+        if context.get_start_working_date() < tomorrow:
+            context = context.with_start_date(tomorrow)
+
+        return context
+
+    def __plan(self, machine_groups=None):
+        production_planning = ProductionPlanning(
+            conn=self.conn,
+            connection_factory=self.connection_factory,
+            context=self.__create_context()
+        )
+        production_planning.generate_production_plan(
+            machine_groups=machine_groups
+        )
+
+    def replan(self, changes: pd.DataFrame):
+        # The batch is handled even if the replan fails, otherwise the same changes are read again
+        self.last_change_id = int(changes['change_id'].max())
+        failed_machine_groups = self.failed_machine_groups
+        # Until the affected groups are known a failure replans every group
+        self.failed_machine_groups = MACHINE_GROUP
+
+        affected_groups = self.__find_affected_groups(changes)
+        machine_groups = [
+            machines_type_list for machines_type_list in MACHINE_GROUP
+            if machines_type_list in affected_groups or machines_type_list in failed_machine_groups
+        ]
+        self.failed_machine_groups = machine_groups
+
+        if len(machine_groups) == 0:
+            logger.info('No machine group is affected by the changes.')
+        else:
+            logger.info('Replan machine groups: {}.'.format(
+                ', '.join(['_'.join([str(x) for x in group]) for group in machine_groups])))
+            self.__plan(machine_groups=machine_groups)
+
+        self.failed_machine_groups = []
+        self.repository.run_in_transaction(
+            task=self.repository.change_log.delete_changes,
+            kwargs={
+                "up_to_change_id": self.last_change_id
+            }
+        )
+
+    def run(self, initial_plan: bool = True):
+        self.last_change_id = self.repository.change_log.get_last_change_id()
+        self.repository.commit()
+
+        if initial_plan:
+            self.__plan()
+
+        logger.info('Watch pending job changes every {} seconds ...'.format(self.poll_interval))
+
+        while True:
+            changes = self.__wait_for_changes()
+
+            try:
+                self.replan(changes)
+            except Exception as e:
+                logger.debug(e)
+                logger.debug(traceback.format_exc())
+                logger.error('Replan failed, replan these machine groups again with the next changes.')
+
+                time.sleep(self.poll_interval)
+
+            logger.info('------------------------------------------------')
@@ -0,0 +1,84 @@
+from typing import List
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from libs.loggers import logging
+
+
+logger = logging.getLogger('decomposition')
+
+
+class MachineGroupDecomposition:
+    """
+        Split the planning into independent machine groups.
+
+        Machines and pending materials are the nodes of a bipartite graph with
+        an edge for every machine which can produce a material. Every connected
+        component is a machine group: its jobs can only run on its machines and
+        no other group competes for them, so the groups are solved separately
+        without losing any solution and every job belongs to exactly one group.
+        Machines without pending materials form no group.
+
+            Parameters:
+                pending_job (DataFrame): plannable pending jobs
+                machine_master (DataFrame): machines with their machine_type_id
+                machine_material (DataFrame): machine_id and mat_id of every compatible pair
+                machine_types (List[int]): only machines of these types are planned
+    """
+
+    def __init__(self, pending_job: pd.DataFrame, machine_master: pd.DataFrame, machine_material: pd.DataFrame, machine_types: List[int]):
+        self.machine_master = machine_master[machine_master['machine_type_id'].isin(machine_types)]
+        machine_ids = self.machine_master['machine_id'].unique()
+        self.edges = machine_material.loc[
+            machine_material['machine_id'].isin(machine_ids)
+            & machine_material['mat_id'].isin(pending_job['mat_id'].unique()),
+            ['machine_id', 'mat_id']].drop_duplicates()
+        self.n_jobs_per_mat = pending_job.groupby('mat_id').size()
+
+    def __find_components(self):
+        machine_ids, machine_index = np.unique(self.edges['machine_id'].to_numpy(), return_inverse=True)
+        mat_ids, mat_index = np.unique(self.edges['mat_id'].to_numpy(), return_inverse=True)
+
+        # Machines are the nodes 0 .. n_machines - 1, materials follow them
+        n_nodes = len(machine_ids) + len(mat_ids)
+        graph = coo_matrix(
+            (np.ones(len(self.edges)), (machine_index, len(machine_ids) + mat_index)),
+            shape=(n_nodes, n_nodes))
+        _, labels = connected_components(graph, directed=False)
+
+        return machine_ids, labels[:len(machine_ids)], mat_ids, labels[len(machine_ids):]
+
+    def find_groups(self):
+        """
+            Return the machine groups, largest first, as dicts with the keys
+            name, machines_type_list, machine_ids, mat_ids and size (number of
+            job and machine pairs the solver can choose from).
+        """
+        machine_ids, machine_labels, mat_ids, mat_labels = self.__find_components()
+        machine_type = self.machine_master.drop_duplicates('machine_id').set_index('machine_id')['machine_type_id']
+        n_machines_per_mat = self.edges.groupby('mat_id').size()
+
+        groups = []
+        for label in np.unique(machine_labels):
+            group_machine_ids = sorted(int(x) for x in machine_ids[machine_labels == label])
+            group_mat_ids = sorted(int(x) for x in mat_ids[mat_labels == label])
+
+            groups.append({
+                "name": 'machines_{}'.format('_'.join([str(x) for x in group_machine_ids])),
+                "machines_type_list": sorted(set(int(x) for x in machine_type.loc[group_machine_ids])),
+                "machine_ids": group_machine_ids,
+                "mat_ids": group_mat_ids,
+                "size": int((self.n_jobs_per_mat.loc[group_mat_ids] * n_machines_per_mat.loc[group_mat_ids]).sum())
+            })
+
+        # Largest groups first, so that they start first when solved in parallel
+        groups = sorted(groups, key=lambda x: (-x['size'], x['machine_ids']))
+
+        for group in groups:
+            logger.debug('{}: {} machines, {} materials, {} job machine pairs.'.format(
+                group['name'], len(group['machine_ids']), len(group['mat_ids']), group['size']))
+        logger.info('{} independent machine groups found.'.format(len(groups)))
+
+        return groups
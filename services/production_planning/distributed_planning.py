@@ -0,0 +1,247 @@
+import io
+import os
+import time
+import uuid
+import socket
+import threading
+import traceback
+from datetime import datetime
+from typing import Any, Dict
+import numpy as np
+import pandas as pd
+
+from const import QUEUE_HEARTBEAT_INTERVAL, QUEUE_POLL_INTERVAL, QUEUE_WAIT_TIMEOUT
+from libs.settings import settings, PlanningContext
+from libs.loggers import logging
+from services.production_planning.job_queue import JobQueue, TASK_DONE, TASK_FAILED
+from services.production_planning.planner import Planner
+from services.production_planning.presolve import PresolveAnalysis
+from services.production_planning.problem_instance import ProblemInstance
+from services.production_planning.solver_pool import SolverPool
+
+
+logger = logging.getLogger('distributed_planning')
+
+# Settings of the coordinator which apply to the solve on the worker, the
+# worker keeps its own STAGE (worker.py --debug)
+WORKER_SETTINGS = ['target_gap']
+
+
+class RemotePlanner:
+    """
+        Planner of the coordinator: the machine group is put on the job queue
+        and solved by a PlanningWorker, possibly on another host. It has the
+        interface of Planner, generate() blocks until the result arrives.
+
+            Parameters:
+                instance (ProblemInstance): instance of the machine group
+                job_queue (JobQueue): queue shared with the workers
+                name (str): machine group name
+                presolve (PresolveAnalysis): bounds of the group
+                context (PlanningContext): context of the planning run
+                planner_options (dict): arguments of the Planner on the worker, e.g. formulation
+                wait_timeout (float): seconds to wait for the result
+    """
+
+    def __init__(
+        self,
+        instance: ProblemInstance,
+        job_queue: JobQueue,
+        name: str = 'productionPlanning',
+        presolve: PresolveAnalysis = None,
+        context: PlanningContext = None,
+        planner_options: Dict[str, Any] = None,
+        wait_timeout: float = QUEUE_WAIT_TIMEOUT
+    ):
+        logger.info('Start planning (distributed) ...')
+
+        self.instance = instance
+        self.job_queue = job_queue
+        self.name = name
+        self.context = context if context is not None else PlanningContext.from_settings()
+        self.presolve = presolve if presolve is not None else PresolveAnalysis(instance, self.context)
+        self.planner_options = planner_options or {}
+        self.wait_timeout = wait_timeout
+        self.result = None
+
+    def __create_task(self):
+        buffer = io.BytesIO()
+        self.instance.save(buffer)
+
+        task = {
+            "name": self.name,
+            "context": self.context.to_dict(),
+            "planner": self.planner_options,
+            "settings": {key: settings.get_setting(key) for key in WORKER_SETTINGS}
+        }
+
+        return task, buffer.getvalue()
+
+    def __wait(self, task_id: str):
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            state = self.job_queue.get(task_id)
+            if state['status'] == TASK_DONE:
+                return state['result']
+            if state['status'] == TASK_FAILED:
+                raise Exception('Task {} failed: {}'.format(task_id, state['error']))
+            if time.monotonic() > deadline:
+                raise Exception('No worker solved task {} in {} seconds'.format(task_id, self.wait_timeout))
+
+            time.sleep(QUEUE_POLL_INTERVAL)
+
+    def generate(self):
+        task_id = '{}_{}_{}'.format(datetime.now().strftime('%Y%m%d%H%M%S'), uuid.uuid4().hex[:8], self.name)
+        task, data = self.__create_task()
+        self.job_queue.put(task_id, task, data)
+        logger.info('Queued task {}, wait for a worker ...'.format(task_id))
+
+        try:
+            self.result = self.__wait(task_id)
+        finally:
+            self.job_queue.delete(task_id)
+
+        if self.result['solution_status']:
+            logger.info('Success (worker {}, {:.1f} s).'.format(self.result['worker_id'], self.result['seconds']))
+            logger.info('Objective value is {}'.format(self.result['objective_value']))
+        else:
+            logger.warning('Worker {} found no solution for {}.'.format(self.result['worker_id'], self.name))
+
+        return self.result
+
+    def get_processing_itv_vars(self):
+        return []
+
+    def get_solution_status(self):
+        return self.result is not None and self.result['solution_status']
+
+    def get_objective_value(self):
+        return self.result['objective_value'] if self.result is not None else None
+
+    def get_lower_bound(self):
+        if self.result is None or self.result['lower_bound'] is None:
+            return self.presolve.lower_bound
+
+        return self.result['lower_bound']
+
+    def get_gap(self):
+        return self.result['gap'] if self.result is not None else None
+
+    def get_solutions_df(self):
+        return pd.DataFrame(self.result['solutions'], columns=['machine_id', 'job_id', 'start', 'end'])
+
+
+class PlanningWorker:
+    """
+        Stateless worker: claims machine groups from the job queue, solves
+        them with the local cpoptimizer and returns the interval of every job.
+
+        The lease of the task is renewed every QUEUE_HEARTBEAT_INTERVAL
+        seconds (at least three times per lease) while solving, so a worker which dies loses its task to the
+        next worker when the lease expires. A failed solve is reported and
+        retried by the next worker.
+
+            Parameters:
+                job_queue (JobQueue): queue shared with the coordinator
+                worker_id (str): name of the worker in the queue, host and process id by default
+                solver_pool (SolverPool): cpoptimizer processes to reuse between tasks
+    """
+
+    def __init__(self, job_queue: JobQueue, worker_id: str = None, solver_pool: SolverPool = None):
+        self.job_queue = job_queue
+        self.worker_id = worker_id or '{}-{}'.format(socket.gethostname(), os.getpid())
+        self.solver_pool = solver_pool
+
+    def __renew_lease(self, claimed: Dict[str, Any], stop_event: threading.Event):
+        interval = min(QUEUE_HEARTBEAT_INTERVAL, self.job_queue.lease_seconds / 3)
+        while not stop_event.wait(interval):
+            if not self.job_queue.renew(claimed['task_id'], claimed['attempt']):
+                logger.warning('Lost the lease of task {}.'.format(claimed['task_id']))
+                return
+
+    @staticmethod
+    def __to_json(value):
+        return value.item() if isinstance(value, np.generic) else value
+
+    def __solve(self, claimed: Dict[str, Any]):
+        task = claimed['task']
+        instance = ProblemInstance.load(io.BytesIO(claimed['data']))
+        context = PlanningContext.from_dict(task['context'])
+        started_at = time.perf_counter()
+
+        with settings.override(task['settings']):
+            planner = Planner(
+                instance=instance,
+                name=task['name'],
+                solver_pool=self.solver_pool,
+                context=context,
+                **task['planner']
+            )
+            planner.generate()
+
+        solution_status = bool(planner.get_solution_status())
+        solutions = {"machine_id": [], "job_id": [], "start": [], "end": []}
+        if solution_status:
+            solutions = {key: values.tolist() for key, values in planner.get_solutions_df().items()}
+
+        return {
+            "worker_id": self.worker_id,
+            "seconds": time.perf_counter() - started_at,
+            "solution_status": solution_status,
+            "objective_value": self.__to_json(planner.get_objective_value()),
+            "lower_bound": self.__to_json(planner.get_lower_bound()),
+            "gap": self.__to_json(planner.get_gap()),
+            "solutions": solutions
+        }
+
+    def run_once(self):
+        """
+            Solve one task, False if the queue had none.
+        """
+        claimed = self.job_queue.claim(self.worker_id)
+        if claimed is None:
+            return False
+
+        logger.info('Solve task {} (attempt {}) ...'.format(claimed['task_id'], claimed['attempt']))
+
+        stop_event = threading.Event()
+        heartbeat = threading.Thread(target=self.__renew_lease, args=(claimed, stop_event), daemon=True)
+        heartbeat.start()
+
+        try:
+            result = self.__solve(claimed)
+            self.job_queue.complete(claimed['task_id'], claimed['attempt'], result)
+            logger.info('Task {} done.'.format(claimed['task_id']))
+        except Exception as e:
+            logger.debug(traceback.format_exc())
+            logger.error('Task {} failed: {}'.format(claimed['task_id'], e))
+            self.job_queue.fail(claimed['task_id'], claimed['attempt'], '{}\n{}'.format(e, traceback.format_exc()))
+        finally:
+            stop_event.set()
+            heartbeat.join()
+
+        return True
+
+    def run(self, idle_timeout: float = None, max_tasks: int = None):
+        """
+            Solve tasks until the queue was empty for idle_timeout seconds
+            (forever by default) or max_tasks were solved.
+        """
+        logger.info('Worker {} started.'.format(self.worker_id))
+
+        n_tasks = 0
+        idle_since = time.monotonic()
+        while max_tasks is None or n_tasks < max_tasks:
+            if self.run_once():
+                n_tasks = n_tasks + 1
+                idle_since = time.monotonic()
+                continue
+
+            if idle_timeout is not None and time.monotonic() - idle_since > idle_timeout:
+                break
+
+            time.sleep(QUEUE_POLL_INTERVAL)
+
+        logger.info('Worker {} stopped after {} tasks.'.format(self.worker_id, n_tasks))
+
+        return n_tasks
@@ -1,6 +1,7 @@
 import numpy as np
+import pandas as pd
 from pandas import DataFrame
-from typing import Union
+from typing import List, Union
 
 from const import IRON_DENSITY, TIME_SCALE
 
@@ -62,3 +63,55 @@ class JobDurationCalculator:
         self.machine_id = None
         self.mat_id = None
         self.is_compatible = False
+
+    def __create_compatible_mask(self, machine_ids: List[int], mat_ids: List[int]) -> np.ndarray:
+        compatible_table = (pd.crosstab(
+            self.machine_material['mat_id'], self.machine_material['machine_id']) > 0)
+
+        return compatible_table.reindex(
+            index=mat_ids, columns=machine_ids, fill_value=False).to_numpy(dtype=bool)
+
+    def __create_production_rate_matrix(self, machine_ids: List[int], mat_ids: List[int]) -> np.ndarray:
+        machine_spd_mul = self.machine_master.loc[machine_ids, 'machine_spd_mul'].to_numpy(dtype=float)
+        mat_size = self.material_master.reindex(mat_ids)['mat_size'].to_numpy(dtype=float) / 1000
+
+        return IRON_DENSITY * machine_spd_mul[np.newaxis, :] * \
+            np.pi * np.power(mat_size[:, np.newaxis], 2) / 4 * 60 * TIME_SCALE
+
+    def calculate_duration_matrix(self, machine_ids: List[int], mat_ids: List[int], pending_volumes: np.ndarray) -> np.ndarray:
+        """
+            Vectorized calculate_duration for every job (row) and machine (column).
+            Incompatible pairs have duration 0.
+        """
+        machine_weight_hour = self.machine_master.loc[machine_ids, 'machine_weight_hour'].to_numpy(dtype=float)
+        pending_volumes = np.asarray(pending_volumes, dtype=float)[:, np.newaxis]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            duration = np.where(
+                machine_weight_hour[np.newaxis, :] > 0,
+                np.ceil(pending_volumes / machine_weight_hour[np.newaxis, :] * 60 / TIME_SCALE),
+                np.ceil(pending_volumes / self.__create_production_rate_matrix(machine_ids, mat_ids))
+            )
+
+        duration = np.nan_to_num(duration, nan=0, posinf=0, neginf=0)
+        duration[~self.__create_compatible_mask(machine_ids, mat_ids)] = 0
+
+        return duration.astype(np.int32)
+
+    def calculate_rate_matrix(self, machine_ids: List[int], mat_ids: List[int]) -> np.ndarray:
+        """
+            Vectorized weight produced in one time unit for every material (row) and machine (column).
+            Incompatible pairs have rate 0.
+        """
+        machine_weight_hour = self.machine_master.loc[machine_ids, 'machine_weight_hour'].to_numpy(dtype=float)
+
+        rate = np.where(
+            machine_weight_hour[np.newaxis, :] > 0,
+            TIME_SCALE / 60 * machine_weight_hour[np.newaxis, :],
+            self.__create_production_rate_matrix(machine_ids, mat_ids)
+        )
+
+        rate = np.nan_to_num(rate, nan=0)
+        rate[~self.__create_compatible_mask(machine_ids, mat_ids)] = 0
+
+        return rate
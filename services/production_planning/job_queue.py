@@ -0,0 +1,367 @@
+import os
+import json
+import time
+import sqlite3
+from contextlib import contextmanager
+from abc import ABCMeta, abstractmethod
+from typing import Any, Dict
+
+from const import QUEUE_LEASE_SECONDS, QUEUE_MAX_ATTEMPTS
+from libs.loggers import logging
+
+
+logger = logging.getLogger('job_queue')
+
+TASK_PENDING = 'pending'
+TASK_CLAIMED = 'claimed'
+TASK_DONE = 'done'
+TASK_FAILED = 'failed'
+
+LEASE_EXPIRED_ERROR = 'The lease of the last attempt expired'
+
+
+class JobQueue(metaclass=ABCMeta):
+    """
+        Queue of planning tasks shared by the coordinator and the workers.
+
+        A task is a JSON description and a binary data blob. A worker claims
+        a task for lease_seconds and renews the lease while it works. A task
+        whose lease expired, or whose worker reported a failure, is claimed
+        again by the next worker, at most max_attempts times; then it fails.
+    """
+
+    def __init__(self, lease_seconds: float = QUEUE_LEASE_SECONDS, max_attempts: int = QUEUE_MAX_ATTEMPTS):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    @abstractmethod
+    def put(self, task_id: str, task: Dict[str, Any], data: bytes):
+        pass
+
+    @abstractmethod
+    def claim(self, worker_id: str):
+        """
+            Claim the oldest claimable task, None if there is none.
+
+                Returns:
+                    dict with the keys task_id, task, data and attempt
+        """
+        pass
+
+    @abstractmethod
+    def renew(self, task_id: str, attempt: int):
+        """
+            Extend the lease, False if the attempt lost its lease.
+        """
+        pass
+
+    @abstractmethod
+    def complete(self, task_id: str, attempt: int, result: Dict[str, Any]):
+        pass
+
+    @abstractmethod
+    def fail(self, task_id: str, attempt: int, error: str):
+        pass
+
+    @abstractmethod
+    def get(self, task_id: str):
+        """
+            Return a dict with the keys status, result and error.
+        """
+        pass
+
+    @abstractmethod
+    def delete(self, task_id: str):
+        pass
+
+
+class FileJobQueue(JobQueue):
+    """
+        Queue in a directory, one subdirectory per task, for one host or a
+        shared file system. The attempt n of a task is claimed by creating
+        its lease file lease.n exclusively, so only one worker wins it, and
+        the modification time of the lease file is the last renewal.
+
+        Modification times are set by the storage, so leases are compared
+        with the time of the storage, read from the probe file .clock, and
+        not with the clock of the host.
+
+            <queue_dir>/.clock: probe file, touched to read the storage time
+            <queue_dir>/<task_id>/task.json, data.bin: the task
+            <queue_dir>/<task_id>/lease.<n>: attempt n, content is the worker id
+            <queue_dir>/<task_id>/error.<n>: attempt n failed
+            <queue_dir>/<task_id>/result.json: the task is done
+    """
+
+    def __init__(self, queue_dir: str, **kwargs):
+        super().__init__(**kwargs)
+        self.queue_dir = queue_dir
+        os.makedirs(queue_dir, exist_ok=True)
+
+    def __path(self, task_id: str, *names):
+        return os.path.join(self.queue_dir, task_id, *names)
+
+    def __get_storage_time(self):
+        path = os.path.join(self.queue_dir, '.clock')
+        with open(path, 'a'):
+            pass
+        # Without explicit times the file system sets its own current time
+        os.utime(path)
+
+        return os.path.getmtime(path)
+
+    def __write_atomic(self, path: str, content: bytes):
+        with open(path + '.tmp', 'wb') as file:
+            file.write(content)
+        os.replace(path + '.tmp', path)
+
+    def put(self, task_id: str, task: Dict[str, Any], data: bytes):
+        # The task becomes visible with the rename, after all of its files
+        staging_dir = os.path.join(self.queue_dir, '.{}'.format(task_id))
+        os.makedirs(staging_dir)
+        with open(os.path.join(staging_dir, 'data.bin'), 'wb') as file:
+            file.write(data)
+        with open(os.path.join(staging_dir, 'task.json'), 'w') as jsonfile:
+            json.dump(task, jsonfile)
+        os.rename(staging_dir, self.__path(task_id))
+
+    def __get_attempt(self, task_id: str):
+        attempts = [
+            int(x.split('.')[1]) for x in os.listdir(self.__path(task_id))
+            if x.startswith('lease.') and x.split('.')[1].isdigit()
+        ]
+
+        return max(attempts, default=0)
+
+    def __get_status(self, task_id: str, now: float):
+        if os.path.exists(self.__path(task_id, 'result.json')):
+            return TASK_DONE
+
+        attempt = self.__get_attempt(task_id)
+        if attempt == 0:
+            return TASK_PENDING
+
+        is_released = os.path.exists(self.__path(task_id, 'error.{}'.format(attempt)))
+        if not is_released:
+            try:
+                renewed_at = os.path.getmtime(self.__path(task_id, 'lease.{}'.format(attempt)))
+            except FileNotFoundError:
+                renewed_at = 0
+            is_released = renewed_at + self.lease_seconds < now
+
+        if not is_released:
+            return TASK_CLAIMED
+
+        return TASK_PENDING if attempt < self.max_attempts else TASK_FAILED
+
+    def claim(self, worker_id: str):
+        now = self.__get_storage_time()
+        for task_id in sorted(os.listdir(self.queue_dir)):
+            if task_id.startswith('.'):
+                continue
+
+            try:
+                if self.__get_status(task_id, now) != TASK_PENDING:
+                    continue
+                attempt = self.__get_attempt(task_id) + 1
+                fd = os.open(self.__path(task_id, 'lease.{}'.format(attempt)), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except (FileExistsError, FileNotFoundError):
+                # Another worker claimed or the coordinator deleted the task
+                continue
+            with os.fdopen(fd, 'w') as file:
+                file.write(worker_id)
+
+            if attempt > 1:
+                logger.warning('Requeue task {} (attempt {}).'.format(task_id, attempt))
+
+            with open(self.__path(task_id, 'task.json'), 'r') as jsonfile:
+                task = json.load(jsonfile)
+            with open(self.__path(task_id, 'data.bin'), 'rb') as file:
+                data = file.read()
+
+            return {"task_id": task_id, "task": task, "data": data, "attempt": attempt}
+
+        return None
+
+    def renew(self, task_id: str, attempt: int):
+        if self.__get_attempt(task_id) != attempt:
+            return False
+
+        try:
+            os.utime(self.__path(task_id, 'lease.{}'.format(attempt)))
+        except FileNotFoundError:
+            return False
+
+        return True
+
+    def complete(self, task_id: str, attempt: int, result: Dict[str, Any]):
+        # A late result of an expired attempt is still a valid result
+        try:
+            self.__write_atomic(self.__path(task_id, 'result.json'), json.dumps(result).encode('utf-8'))
+        except FileNotFoundError:
+            logger.warning('Task {} was deleted by the coordinator.'.format(task_id))
+
+    def fail(self, task_id: str, attempt: int, error: str):
+        try:
+            self.__write_atomic(self.__path(task_id, 'error.{}'.format(attempt)), error.encode('utf-8'))
+        except FileNotFoundError:
+            logger.warning('Task {} was deleted by the coordinator.'.format(task_id))
+
+    def get(self, task_id: str):
+        status = self.__get_status(task_id, self.__get_storage_time())
+        result = None
+        error = None
+
+        if status == TASK_DONE:
+            with open(self.__path(task_id, 'result.json'), 'r') as jsonfile:
+                result = json.load(jsonfile)
+        elif status == TASK_FAILED:
+            error_path = self.__path(task_id, 'error.{}'.format(self.__get_attempt(task_id)))
+            if os.path.exists(error_path):
+                with open(error_path, 'r') as file:
+                    error = file.read()
+            else:
+                error = LEASE_EXPIRED_ERROR
+
+        return {"status": status, "result": result, "error": error}
+
+    def delete(self, task_id: str):
+        path = self.__path(task_id)
+        for name in os.listdir(path):
+            os.remove(os.path.join(path, name))
+        os.rmdir(path)
+
+
+class SqliteJobQueue(JobQueue):
+    """
+        Queue in a SQLite database file. Every operation is one transaction,
+        claims take the write lock first (BEGIN IMMEDIATE) so two workers
+        never claim the same attempt. Leases use the clock of each host, so
+        the hosts sharing the file need synchronized clocks.
+    """
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with self.__connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS planning_task (
+                    task_id TEXT PRIMARY KEY,
+                    task TEXT NOT NULL,
+                    data BLOB NOT NULL,
+                    status TEXT NOT NULL,
+                    attempt INTEGER NOT NULL DEFAULT 0,
+                    worker_id TEXT,
+                    lease_until REAL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+
+    @contextmanager
+    def __connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+
+    def put(self, task_id: str, task: Dict[str, Any], data: bytes):
+        with self.__connect() as conn:
+            conn.execute(
+                'INSERT INTO planning_task (task_id, task, data, status, created_at) VALUES (?, ?, ?, ?, ?)',
+                (task_id, json.dumps(task), sqlite3.Binary(data), TASK_PENDING, time.time()))
+
+    def claim(self, worker_id: str):
+        now = time.time()
+        with self.__connect() as conn:
+            conn.execute(
+                'UPDATE planning_task SET status = ?, error = ? '
+                'WHERE status = ? AND lease_until < ? AND attempt >= ?',
+                (TASK_FAILED, LEASE_EXPIRED_ERROR, TASK_CLAIMED, now, self.max_attempts))
+            row = conn.execute(
+                'SELECT task_id, task, data, attempt FROM planning_task '
+                'WHERE status = ? OR (status = ? AND lease_until < ?) ORDER BY created_at, task_id LIMIT 1',
+                (TASK_PENDING, TASK_CLAIMED, now)).fetchone()
+            if row is None:
+                return None
+
+            task_id, task, data, attempt = row
+            conn.execute(
+                'UPDATE planning_task SET status = ?, attempt = ?, worker_id = ?, lease_until = ? WHERE task_id = ?',
+                (TASK_CLAIMED, attempt + 1, worker_id, now + self.lease_seconds, task_id))
+
+        if attempt > 0:
+            logger.warning('Requeue task {} (attempt {}).'.format(task_id, attempt + 1))
+
+        return {"task_id": task_id, "task": json.loads(task), "data": bytes(data), "attempt": attempt + 1}
+
+    def renew(self, task_id: str, attempt: int):
+        with self.__connect() as conn:
+            cursor = conn.execute(
+                'UPDATE planning_task SET lease_until = ? WHERE task_id = ? AND attempt = ? AND status = ?',
+                (time.time() + self.lease_seconds, task_id, attempt, TASK_CLAIMED))
+
+            return cursor.rowcount > 0
+
+    def complete(self, task_id: str, attempt: int, result: Dict[str, Any]):
+        # A late result of an expired attempt is still a valid result
+        with self.__connect() as conn:
+            conn.execute(
+                'UPDATE planning_task SET status = ?, result = ? WHERE task_id = ? AND status != ?',
+                (TASK_DONE, json.dumps(result), task_id, TASK_DONE))
+
+    def fail(self, task_id: str, attempt: int, error: str):
+        with self.__connect() as conn:
+            conn.execute(
+                'UPDATE planning_task SET status = CASE WHEN attempt >= ? THEN ? ELSE ? END, error = ? '
+                'WHERE task_id = ? AND attempt = ? AND status = ?',
+                (self.max_attempts, TASK_FAILED, TASK_PENDING, error, task_id, attempt, TASK_CLAIMED))
+
+    def get(self, task_id: str):
+        now = time.time()
+        with self.__connect() as conn:
+            row = conn.execute(
+                'SELECT status, attempt, lease_until, result, error FROM planning_task WHERE task_id = ?',
+                (task_id,)).fetchone()
+
+        if row is None:
+            raise Exception('Task {} is not in the queue'.format(task_id))
+
+        status, attempt, lease_until, result, error = row
+        if status == TASK_CLAIMED and lease_until < now:
+            status = TASK_PENDING if attempt < self.max_attempts else TASK_FAILED
+            error = LEASE_EXPIRED_ERROR if status == TASK_FAILED else error
+
+        return {
+            "status": status,
+            "result": json.loads(result) if result is not None else None,
+            "error": error if status == TASK_FAILED else None
+        }
+
+    def delete(self, task_id: str):
+        with self.__connect() as conn:
+            conn.execute('DELETE FROM planning_task WHERE task_id = ?', (task_id,))
+
+
+def create_job_queue(location: str):
+    """
+        SQLite queue for a file ending with .db or .sqlite, file system
+        queue in the directory location otherwise.
+    """
+    if os.path.splitext(location)[1] in ('.db', '.sqlite'):
+        return SqliteJobQueue(location)
+
+    return FileJobQueue(location)
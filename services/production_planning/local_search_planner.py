@@ -0,0 +1,245 @@
+import time
+from typing import List
+import numpy as np
+import pandas as pd
+
+from const import LOCAL_SEARCH_TIME_LIMIT
+from libs.settings import PlanningContext
+from services.production_planning.problem_instance import ProblemInstance
+from services.production_planning.presolve import PresolveAnalysis
+from libs.loggers import logging
+
+
+logger = logging.getLogger('local_search_planner')
+
+
+class LocalSearchPlanner:
+    """
+        Simulated annealing over the job sequence of every machine.
+
+        It optimizes the same objective as the CP model (weighted tardiness plus
+        weighted adjustment time) without the cpoptimizer executable and stops
+        after a fixed time budget.
+    """
+
+    def __init__(
+        self,
+        instance: ProblemInstance,
+        time_limit: float = LOCAL_SEARCH_TIME_LIMIT,
+        seed: int = None,
+        presolve: PresolveAnalysis = None,
+        context: PlanningContext = None
+    ):
+        logger.info('Start planning (local search) ...')
+
+        self.instance = instance
+        self.jobs = list(range(instance.n_jobs))
+        self.machines = list(range(instance.n_machines))
+        self.duration_matrix = instance.duration
+        self.candidate_mask = instance.candidate_mask
+        self.mat_index = instance.mat_index
+        self.due = instance.due_time_unit
+        self.setup_time = instance.setup_time
+        self.time_limit = time_limit
+        self.rng = np.random.default_rng(seed)
+        self.sequences: List[List[int]] = []
+        self.objective_value = None
+        self.context = context if context is not None else PlanningContext.from_settings()
+        self.presolve = presolve if presolve is not None else PresolveAnalysis(instance, self.context)
+        self.__solution_status = False
+
+    def __evaluate_machine(self, m: int, sequence: List[int]):
+        """
+            Return (tardiness, adjustment time) of one machine sequence.
+        """
+        if len(sequence) == 0:
+            return 0, 0
+
+        seq = np.asarray(sequence)
+        mats = self.mat_index[seq]
+        setups = np.zeros(len(seq), dtype=np.int64)
+        setups[1:] = (mats[1:] != mats[:-1]) * self.setup_time[m]
+
+        ends = np.cumsum(self.duration_matrix[seq, m] + setups)
+        due = self.due[seq]
+        tardiness = np.where(due > 0, np.maximum(ends - due, 0), 0).sum()
+
+        return int(tardiness), int(setups.sum())
+
+    def __machine_cost(self, m: int, sequence: List[int]):
+        tardiness, adjustment_time = self.__evaluate_machine(m, sequence)
+
+        return tardiness * self.context.weight_of_tardy_job + adjustment_time * self.context.weight_of_adjustment_time
+
+    def __initial_solution(self):
+        # Earliest due date first, each job goes to the compatible machine
+        # that currently finishes earliest.
+        sequences = [[] for _ in self.machines]
+        machine_end = np.zeros(len(self.machines), dtype=np.int64)
+        due_order = np.where(self.due > 0, self.due, np.inf)
+
+        for j in np.lexsort((self.mat_index, due_order)):
+            candidates = np.flatnonzero(self.candidate_mask[j])
+            if len(candidates) == 0:
+                raise Exception('Job {} has no compatible machine'.format(j))
+
+            m = candidates[np.argmin(
+                machine_end[candidates] + self.duration_matrix[j, candidates])]
+            sequences[m].append(int(j))
+            machine_end[m] = machine_end[m] + self.duration_matrix[j, m] + self.setup_time[m]
+
+        return sequences
+
+    def __propose_move(self, sequences: List[List[int]], assignment: np.ndarray):
+        """
+            Return {machine: new sequence} for a random relocate or swap move.
+        """
+        j1 = int(self.rng.integers(len(self.jobs)))
+        m1 = int(assignment[j1])
+
+        if self.rng.random() < 0.5:
+            candidates = np.flatnonzero(self.candidate_mask[j1])
+            m2 = int(candidates[self.rng.integers(len(candidates))])
+            new_m1 = list(sequences[m1])
+            new_m1.remove(j1)
+
+            if m2 == m1:
+                new_m1.insert(int(self.rng.integers(len(new_m1) + 1)), j1)
+                return {m1: new_m1}
+
+            new_m2 = list(sequences[m2])
+            new_m2.insert(int(self.rng.integers(len(new_m2) + 1)), j1)
+
+            return {m1: new_m1, m2: new_m2}
+
+        j2 = int(self.rng.integers(len(self.jobs)))
+        m2 = int(assignment[j2])
+        if j1 == j2 or not (self.candidate_mask[j1, m2] and self.candidate_mask[j2, m1]):
+            return None
+
+        if m1 == m2:
+            new_m1 = list(sequences[m1])
+            p1, p2 = new_m1.index(j1), new_m1.index(j2)
+            new_m1[p1], new_m1[p2] = j2, j1
+
+            return {m1: new_m1}
+
+        new_m1 = list(sequences[m1])
+        new_m2 = list(sequences[m2])
+        new_m1[new_m1.index(j1)] = j2
+        new_m2[new_m2.index(j2)] = j1
+
+        return {m1: new_m1, m2: new_m2}
+
+    def __anneal(self, sequences: List[List[int]]):
+        if len(self.jobs) == 0:
+            # Nothing to move
+            return sequences
+
+        started_at = time.perf_counter()
+
+        assignment = np.zeros(len(self.jobs), dtype=np.int64)
+        for m, sequence in enumerate(sequences):
+            assignment[sequence] = m
+
+        costs = np.array([self.__machine_cost(m, seq) for m, seq in enumerate(sequences)], dtype=float)
+        current_cost = costs.sum()
+        best_cost = current_cost
+        best_sequences = [list(seq) for seq in sequences]
+
+        start_temperature = max(current_cost * 0.05 / max(len(self.jobs), 1), 1.0)
+        end_temperature = 0.01
+        temperature = start_temperature
+        iteration = 0
+
+        while True:
+            iteration = iteration + 1
+            if iteration % 64 == 0:
+                progress = (time.perf_counter() - started_at) / self.time_limit
+                if progress >= 1:
+                    break
+                temperature = start_temperature * \
+                    (end_temperature / start_temperature) ** progress
+
+            move = self.__propose_move(sequences, assignment)
+            if move is None:
+                continue
+
+            new_costs = {m: self.__machine_cost(m, seq) for m, seq in move.items()}
+            delta = sum(new_costs.values()) - sum(costs[m] for m in move)
+
+            if delta <= 0 or self.rng.random() < np.exp(-delta / temperature):
+                for m, seq in move.items():
+                    sequences[m] = seq
+                    costs[m] = new_costs[m]
+                    assignment[seq] = m
+                current_cost = current_cost + delta
+
+                if current_cost < best_cost:
+                    best_cost = current_cost
+                    best_sequences = [list(seq) for seq in sequences]
+
+        logger.debug('Local search iterations: {}'.format(iteration))
+
+        return best_sequences
+
+    def get_processing_itv_vars(self):
+        return []
+
+    def get_solution_status(self):
+        return self.__solution_status
+
+    def get_objective_value(self):
+        return self.objective_value
+
+    def get_lower_bound(self):
+        return self.presolve.lower_bound
+
+    def get_gap(self):
+        return self.presolve.relative_gap(self.objective_value)
+
+    def get_solutions_df(self):
+        solutions = []
+        for m, sequence in enumerate(self.sequences):
+            end = 0
+            for position, j in enumerate(sequence):
+                if position > 0 and self.mat_index[j] != self.mat_index[sequence[position - 1]]:
+                    end = end + int(self.setup_time[m])
+                start = end
+                end = start + int(self.duration_matrix[j, m])
+
+                solutions.append(
+                    {
+                        "machine_id": m,
+                        "job_id": j,
+                        "start": start,
+                        "end": end
+                    }
+                )
+
+        return pd.DataFrame(solutions, columns=['machine_id', 'job_id', 'start', 'end'])
+
+    def generate(self):
+        self.sequences = self.__anneal(self.__initial_solution())
+
+        tardiness = 0
+        adjustment_time = 0
+        for m, sequence in enumerate(self.sequences):
+            machine_tardiness, machine_adjustment_time = self.__evaluate_machine(m, sequence)
+            tardiness = tardiness + machine_tardiness
+            adjustment_time = adjustment_time + machine_adjustment_time
+
+        self.objective_value = tardiness * self.context.weight_of_tardy_job + \
+            adjustment_time * self.context.weight_of_adjustment_time
+        self.__solution_status = True
+
+        logger.info('Success.')
+        logger.info('Objective value is {}'.format(self.objective_value))
+        logger.info('Tardy job objective value: {}'.format(
+            tardiness * self.context.weight_of_tardy_job))
+        logger.info('Adjustment time objective value: {}'.format(
+            adjustment_time * self.context.weight_of_adjustment_time))
+        logger.info('Lower bound is {}, gap {:.2%}'.format(
+            self.get_lower_bound(), self.get_gap()))
+
+        return self.sequences
@@ -0,0 +1,50 @@
+import os
+import json
+from typing import Any, Dict
+from docplex.cp.model import CpoModel
+
+from libs.loggers import logging
+from services.production_planning.problem_instance import ProblemInstance
+
+
+logger = logging.getLogger('model_exporter')
+
+MODEL_FILE = 'model.cpo'
+PARAMS_FILE = 'params.json'
+INSTANCE_FILE = 'instance.npz'
+
+
+class ModelExporter:
+    """
+        Write the CP model of every machine group together with its inputs and
+        solve parameters, so the solve can be replayed offline.
+
+        Each group is stored in its own directory:
+            <export_dir>/<name>/model.cpo
+            <export_dir>/<name>/params.json
+            <export_dir>/<name>/instance.npz
+    """
+
+    def __init__(self, export_dir: str):
+        self.export_dir = export_dir
+
+    def export(
+        self,
+        name: str,
+        mdl: CpoModel,
+        solve_params: Dict[str, Any],
+        instance: ProblemInstance
+    ):
+        model_dir = os.path.join(self.export_dir, name)
+        os.makedirs(model_dir, exist_ok=True)
+
+        mdl.export_model(os.path.join(model_dir, MODEL_FILE))
+
+        with open(os.path.join(model_dir, PARAMS_FILE), 'w') as jsonfile:
+            json.dump(solve_params, jsonfile, indent=4)
+
+        instance.save(os.path.join(model_dir, INSTANCE_FILE))
+
+        logger.info('Export model to {}'.format(model_dir))
+
+        return model_dir
@@ -0,0 +1,101 @@
+import os
+import json
+import itertools
+from typing import Any, Dict, List
+import pandas as pd
+from docplex.cp.model import CpoModel
+
+from libs.utils import get_cpoptimizer_path
+from libs.loggers import logging
+from services.production_planning.model_exporter import MODEL_FILE, PARAMS_FILE
+
+
+logger = logging.getLogger('model_replay')
+
+
+class ModelReplay:
+    """
+        Re-solve models written by ModelExporter under a grid of solver
+        parameters and tabulate the results.
+    """
+
+    def __init__(self, model_dirs: List[str]):
+        self.model_dirs = model_dirs
+
+    @staticmethod
+    def find_model_dirs(root_dir: str):
+        model_dirs = []
+        for dirpath, _, filenames in os.walk(root_dir):
+            if MODEL_FILE in filenames:
+                model_dirs.append(dirpath)
+
+        return sorted(model_dirs)
+
+    def __load_params(self, model_dir: str):
+        params_path = os.path.join(model_dir, PARAMS_FILE)
+        if not os.path.exists(params_path):
+            return {}
+
+        with open(params_path, 'r') as jsonfile:
+            return json.load(jsonfile)
+
+    def __solve(self, model_dir: str, solve_params: Dict[str, Any]):
+        mdl = CpoModel()
+        mdl.import_model(os.path.join(model_dir, MODEL_FILE))
+
+        msol = mdl.solve(
+            execfile=get_cpoptimizer_path(),
+            log_output=None,
+            **solve_params
+        )
+
+        objective_value = None
+        objective_bound = None
+        objective_gap = None
+        if msol and msol.is_solution():
+            objective_value = msol.get_objective_value()
+            objective_bound = msol.get_objective_bound()
+            objective_gap = msol.get_objective_gap()
+
+        return {
+            "model": os.path.basename(model_dir),
+            **solve_params,
+            "solve_status": msol.get_solve_status(),
+            "objective_value": objective_value,
+            "objective_bound": objective_bound,
+            "objective_gap": objective_gap,
+            "solve_time": msol.get_solve_time()
+        }
+
+    def run(self, param_grid: Dict[str, List[Any]]):
+        """
+            Solve every model with every combination of param_grid.
+
+                Parameters:
+                    param_grid (Dict[str, List[Any]]): CP Optimizer parameter name to the values to try,
+                        for example {"TimeLimit": [10, 60], "Workers": [1, 4]}. An empty list keeps the
+                        value that was used in the original solve.
+
+                Returns:
+                    DataFrame with one row per model and parameter combination
+        """
+        results = []
+        for model_dir in self.model_dirs:
+            original_params = self.__load_params(model_dir)
+            grid = {
+                key: values if len(values) > 0 else [original_params.get(key)]
+                for key, values in param_grid.items()
+            }
+            keys = list(grid.keys())
+
+            for values in itertools.product(*[grid[key] for key in keys]):
+                solve_params = dict(original_params)
+                solve_params.update({
+                    key: value for key, value in zip(keys, values) if value is not None
+                })
+
+                logger.info('Replay {} with {}'.format(
+                    os.path.basename(model_dir), solve_params))
+                results.append(self.__solve(model_dir, solve_params))
+
+        return pd.DataFrame(results)
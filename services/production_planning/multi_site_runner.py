@@ -0,0 +1,137 @@
+import os
+import json
+import time
+import traceback
+from typing import Any, Dict, List
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+
+from const import MULTI_SITE_PARALLEL, MULTI_SITE_LOG_DIR
+from libs import DbConnection
+from libs.settings import settings, PlanningContext
+from libs.utils import resource_path
+from libs.loggers import logging
+from services.production_planning.production_planning import ProductionPlanning
+from services.production_planning.solver_pool import get_solver_pool
+
+
+logger = logging.getLogger('multi_site_runner')
+
+
+class MultiSiteRunner:
+    """
+        Plan several sites (plants) concurrently in one process.
+
+        Every site runs in its own thread with its own planning context,
+        settings override, log file and database connection, and a failed site does not stop the
+        others. The sites share the loaded runtime and the cpoptimizer
+        processes, and the CPU budget is split between the sites running at
+        the same time through the Workers parameter of the solver.
+
+        A site is a dictionary:
+            name (str): site name, used for the log file
+            dbconfig (str): path of the database configuration of the site
+            start_date (str) (optional): start date YYYY-MM-DD, tomorrow by default
+            holiday (List[str]) (optional): holidays YYYY-MM-DD
+            ot (bool) (optional): plan with OT
+            settings (dict) (optional): other settings of the site, e.g. run_time_limit
+    """
+
+    def __init__(
+        self,
+        sites: List[Dict[str, Any]],
+        max_parallel_sites: int = MULTI_SITE_PARALLEL,
+        cpu_budget: int = None,
+        log_dir: str = MULTI_SITE_LOG_DIR
+    ):
+        self.sites = sites
+        self.max_parallel_sites = max(1, min(max_parallel_sites, len(sites)))
+        self.cpu_budget = cpu_budget or os.cpu_count() or 1
+        self.log_dir = log_dir
+
+    def __create_site_settings(self, site: Dict[str, Any]):
+        site_settings = {
+            "site": site['name'],
+            # Sites already run in parallel, every site plans its groups serially
+            "pipeline": False,
+            "solver_workers": max(1, self.cpu_budget // self.max_parallel_sites)
+        }
+        site_settings.update(site.get('settings', {}))
+
+        return site_settings
+
+    def __create_site_context(self, site: Dict[str, Any]):
+        # Created inside the settings override of the site, e.g. for run_time_limit
+        context = PlanningContext.from_settings().replace(
+            holiday=frozenset(site.get('holiday', [])),
+            ot=site.get('ot', settings.get_setting('ot'))
+        )
+        if site.get('start_date'):
+            context = context.with_start_date(site['start_date'])
+
+        return context
+
+    def __run_site(self, site: Dict[str, Any]):
+        result = {
+            "site": site['name'],
+            "status": 'failed',
+            "objective_value": None,
+            "seconds": None,
+            "error": None
+        }
+
+        with settings.override(self.__create_site_settings(site)):
+            handler = logging.add_site_handler(
+                file=os.path.join(self.log_dir, '{}.log'.format(site['name'])),
+                site=site['name']
+            )
+            started_at = time.perf_counter()
+
+            try:
+                context = self.__create_site_context(site)
+
+                logger.info('Start production planning of site {} from {}'.format(
+                    site['name'], context.get_start_working_date()))
+
+                with open(resource_path(site['dbconfig']), 'r') as jsonfile:
+                    config = json.load(jsonfile)
+
+                db_connection = DbConnection()
+                db_connection.connect(config=config)
+
+                production_planning = ProductionPlanning(
+                    conn=db_connection.get_connector(),
+                    connection_factory=db_connection.create_connector,
+                    context=context
+                )
+                production_planning.generate_production_plan()
+
+                result['status'] = 'success'
+                result['objective_value'] = production_planning.objective_value
+            except Exception as e:
+                logger.debug(e)
+                logger.debug(traceback.format_exc())
+                logger.error('Production planning of site {} failed.'.format(site['name']))
+
+                result['error'] = str(e)
+            finally:
+                result['seconds'] = round(time.perf_counter() - started_at, 1)
+                logging.remove_handler(handler)
+
+        return result
+
+    def run(self):
+        os.makedirs(self.log_dir, exist_ok=True)
+        if settings.get_setting('solver_pool_size'):
+            # One cpoptimizer process per site running at the same time
+            get_solver_pool(size=self.max_parallel_sites)
+
+        logger.info('Plan {} sites, {} at the same time, {} workers each.'.format(
+            len(self.sites),
+            self.max_parallel_sites,
+            max(1, self.cpu_budget // self.max_parallel_sites)))
+
+        with ThreadPoolExecutor(max_workers=self.max_parallel_sites) as executor:
+            results = list(executor.map(self.__run_site, self.sites))
+
+        return pd.DataFrame(results, columns=['site', 'status', 'objective_value', 'seconds', 'error'])
@@ -0,0 +1,193 @@
+import uuid
+from datetime import datetime
+from typing import List
+import pandas as pd
+
+from const import PUBLISH_MODE_DIFF, PUBLISH_MODE_SWAP, PLAN_VERSION_RETENTION
+from libs.loggers import logging
+from services.production_planning.repositories import ProductionPlanningRepository
+from services.production_planning.repositories.pd_plan import PD_PLAN_STAGING_TABLE_PREFIX, PD_PLAN_VERSION_TABLE_PREFIX
+
+
+logger = logging.getLogger('plan_publisher')
+
+PLAN_KEY_COLUMNS = ['so_id', 'mat_id', 'machine_id', 'start_timestamp', 'end_timestamp']
+PLAN_VALUE_COLUMNS = ['res_volume', 'batch_volume', 'remaining_volume']
+# Volumes are compared after rounding, the plan stores them with 2 decimals
+PLAN_VOLUME_DECIMALS = 2
+
+
+class PlanPublisher:
+    """
+        Publish the schedule of a run into pd_plan.
+
+        swap mode: the schedule is written into the staging table of the run
+            pd_plan_staging_<run id>, which replaces pd_plan with one atomic
+            RENAME TABLE. The replaced plan is kept as a version table
+            pd_plan_v<run id> and only the newest retention versions are
+            kept. The swapped in table has no foreign keys and triggers, so
+            swap mode falls back to diff mode when pd_plan has any.
+        diff mode: the schedule is compared with the current pd_plan and only
+            the rows of changed keys (so, material, machine, period) are
+            deleted and inserted again, in one transaction. Identical rows
+            are compared copy by copy.
+
+        Schedules are added group by group with stage() and made current with
+        publish(). With machine_ids only the plan of these machines is
+        replaced and the plan of the other machines is kept. Publishers of
+        concurrent runs publish one after the other under a named lock.
+    """
+
+    def __init__(
+        self,
+        repository: ProductionPlanningRepository,
+        mode: str,
+        retention: int = PLAN_VERSION_RETENTION,
+        machine_ids: List[int] = None
+    ):
+        self.repository = repository
+        self.mode = mode
+        self.retention = retention
+        self.machine_ids = [int(x) for x in machine_ids] if machine_ids is not None else None
+        self.n_staged_rows = 0
+        self.__staged_schedules = []
+        self.run_id = '{}_{}'.format(datetime.now().strftime('%Y%m%d%H%M%S'), uuid.uuid4().hex[:8])
+        self.staging_table = '{}{}'.format(PD_PLAN_STAGING_TABLE_PREFIX, self.run_id)
+
+        if self.mode == PUBLISH_MODE_SWAP:
+            dependent_objects = self.repository.pd_plan.get_dependent_objects()
+            if len(dependent_objects) > 0:
+                logger.warning('pd_plan has foreign keys or triggers ({}) which a table swap loses, publish in diff mode.'.format(
+                    ', '.join(dependent_objects)))
+                self.mode = PUBLISH_MODE_DIFF
+
+        if self.mode != PUBLISH_MODE_DIFF:
+            self.repository.run_in_transaction(
+                task=self.repository.pd_plan.create_staging_table,
+                kwargs={
+                    "table": self.staging_table
+                }
+            )
+
+    def stage(self, schedule_df: pd.DataFrame):
+        if self.mode == PUBLISH_MODE_DIFF:
+            self.__staged_schedules.append(schedule_df)
+        else:
+            self.repository.run_in_transaction(
+                task=self.repository.pd_plan.insert_plan,
+                kwargs={
+                    "values": schedule_df.to_dict('records'),
+                    "table": self.staging_table
+                }
+            )
+
+        self.n_staged_rows = self.n_staged_rows + len(schedule_df)
+
+    def __normalize(self, plan_df: pd.DataFrame):
+        plan_df = plan_df[PLAN_KEY_COLUMNS + PLAN_VALUE_COLUMNS].copy()
+        plan_df['so_id'] = plan_df['so_id'].astype('int64')
+        plan_df['mat_id'] = plan_df['mat_id'].astype('int64')
+        plan_df['machine_id'] = plan_df['machine_id'].astype('int64')
+        plan_df['start_timestamp'] = pd.to_datetime(plan_df['start_timestamp'])
+        plan_df['end_timestamp'] = pd.to_datetime(plan_df['end_timestamp'])
+        plan_df[PLAN_VALUE_COLUMNS] = plan_df[PLAN_VALUE_COLUMNS].astype(float).round(PLAN_VOLUME_DECIMALS)
+
+        return plan_df
+
+    def __publish_diff(self):
+        if len(self.__staged_schedules) > 0:
+            schedule_df = pd.concat(self.__staged_schedules, sort=False, axis=0, ignore_index=True)
+        else:
+            schedule_df = pd.DataFrame(columns=PLAN_KEY_COLUMNS + PLAN_VALUE_COLUMNS)
+
+        current_df = self.repository.pd_plan.get_plan()
+        if self.machine_ids is not None:
+            current_df = current_df[current_df['machine_id'].isin(self.machine_ids)]
+        compare_columns = PLAN_KEY_COLUMNS + PLAN_VALUE_COLUMNS
+        current_df = self.__normalize(current_df)
+        new_df = self.__normalize(schedule_df).assign(position=range(len(schedule_df)))
+        # Identical rows are legal, the occurrence matches the n-th copy with the n-th copy
+        current_df['occurrence'] = current_df.groupby(compare_columns).cumcount()
+        new_df['occurrence'] = new_df.groupby(compare_columns).cumcount()
+        diff_df = current_df.merge(new_df, on=compare_columns + ['occurrence'], how='outer', indicator=True)
+
+        # Rows are deleted by key, so a key with any changed row is replaced as a whole
+        changed_keys_df = diff_df.loc[diff_df['_merge'] != 'both', PLAN_KEY_COLUMNS].drop_duplicates()
+        is_current_changed = current_df[PLAN_KEY_COLUMNS].merge(
+            changed_keys_df, how='left', indicator=True)['_merge'].eq('both').to_numpy()
+        is_new_changed = new_df[PLAN_KEY_COLUMNS].merge(
+            changed_keys_df, how='left', indicator=True)['_merge'].eq('both').to_numpy()
+
+        deleted_df = current_df.loc[is_current_changed, PLAN_KEY_COLUMNS].drop_duplicates()
+        deleted_df['start_timestamp'] = deleted_df['start_timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S')
+        deleted_df['end_timestamp'] = deleted_df['end_timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S')
+        inserted_df = schedule_df.iloc[new_df.loc[is_new_changed, 'position'].to_numpy()]
+
+        logger.info("Plan rows unchanged: {}, deleted: {}, inserted: {}.".format(
+            int((~is_current_changed).sum()), int(is_current_changed.sum()), len(inserted_df)))
+
+        def publish_diff():
+            if len(deleted_df) > 0:
+                self.repository.pd_plan.delete_plan_rows(
+                    values=deleted_df.to_dict('records'))
+            if len(inserted_df) > 0:
+                self.repository.pd_plan.insert_plan(
+                    values=inserted_df.to_dict('records'))
+
+        self.repository.run_in_transaction(
+            task=publish_diff
+        )
+
+    def __publish_swap(self):
+        version_table = None
+        if self.retention > 0:
+            version_table = '{}{}'.format(PD_PLAN_VERSION_TABLE_PREFIX, self.run_id)
+
+        if self.machine_ids is not None and len(self.machine_ids) > 0:
+            # Copied under the lock, so the plan of a concurrent run is kept
+            self.repository.run_in_transaction(
+                task=self.repository.pd_plan.copy_plan_rows,
+                kwargs={
+                    "exclude_machine_ids": self.machine_ids,
+                    "table": self.staging_table
+                }
+            )
+
+        self.repository.pd_plan.swap_staging_table(
+            staging_table=self.staging_table,
+            version_table=version_table
+        )
+
+        if version_table is not None:
+            logger.info("Previous plan is kept as {}.".format(version_table))
+            self.__prune_versions()
+
+    def __prune_versions(self):
+        for version_table in self.repository.pd_plan.get_version_tables()[self.retention:]:
+            try:
+                self.repository.pd_plan.drop_table(version_table)
+                logger.debug("Drop plan version {}.".format(version_table))
+            except Exception as e:
+                logger.debug(e)
+                logger.warning("Drop plan version {} failed.".format(version_table))
+
+    def publish(self):
+        self.repository.pd_plan.lock_plan()
+        try:
+            if self.mode == PUBLISH_MODE_DIFF:
+                self.__publish_diff()
+            else:
+                self.__publish_swap()
+        finally:
+            self.repository.pd_plan.unlock_plan()
+
+    def discard(self):
+        """
+            Drop the staging table of a plan which is not published.
+        """
+        if self.mode != PUBLISH_MODE_DIFF:
+            try:
+                self.repository.pd_plan.drop_table(self.staging_table)
+            except Exception as e:
+                logger.debug(e)
+                logger.warning("Drop staging table {} failed.".format(self.staging_table))
@@ -1,12 +1,24 @@
-import platform
-from typing import Dict, List
+import time
+from typing import List
+from contextlib import contextmanager
+import numpy as np
 from docplex.cp.model import *
-from pandas import DataFrame
-from const.weights import WEIGHT_OF_ADJUSTMENT_TIME, WEIGHT_OF_TARDY_JOB
-from libs.settings import settings
-
-from services.production_planning.job_duration_calculator import JobDurationCalculator
-from libs.utils import resource_path
+from docplex.cp.solver.solver import CpoSolver
+import pandas as pd
+from const import TIME_SCALE, COARSE_TIME_LIMIT_RATIO, FORMULATION_PAIRS, FORMULATION_ALTERNATIVE, DEFAULT_FORMULATION, LNS_INITIAL_TIME_RATIO, LNS_ITERATION_TIME_LIMIT, \
+    LNS_NEIGHBORHOOD_SIZE, LNS_NEIGHBORHOODS, LNS_RANDOM_SEED, SEARCH_PHASES_NONE, SEARCH_PHASES_SEQUENCE_FIRST, \
+    DEFAULT_SEARCH_PHASES, SEARCH_PHASE_BUCKETS
+from libs.settings import settings, PlanningContext
+
+from services.production_planning.problem_instance import ProblemInstance
+from services.production_planning.model_exporter import ModelExporter
+from services.production_planning.solution_cache import SolutionCache
+from services.production_planning.solver_pool import SolverPool
+from services.production_planning.solver_portfolio import SolverPortfolio
+from services.production_planning.solve_history import SolveHistory
+from services.production_planning.presolve import PresolveAnalysis
+from libs.utils import get_cpoptimizer_path
+from libs.profiler import Profiler
 from libs.loggers import logging
 
 
@@ -16,115 +28,161 @@ logger = logging.getLogger('planner')
 class Planner:
     def __init__(
         self,
-        jobs_dict: Dict[int, int],
-        machines_dict: Dict[int, int],
-        pending_task: DataFrame,
-        duration_calculator: JobDurationCalculator,
-        due_date_dict: Dict[int, int],
-        setup_time_dict: Dict[int, int] = None,
+        instance: ProblemInstance,
+        name: str = 'productionPlanning',
+        model_exporter: ModelExporter = None,
+        solution_cache: SolutionCache = None,
+        solver_pool: SolverPool = None,
+        time_limit: float = None,
+        coarse_time_scale: int = None,
+        presolve: PresolveAnalysis = None,
+        profiler: Profiler = None,
+        portfolio_size: int = 0,
+        lns: bool = False,
+        context: PlanningContext = None,
+        solve_history: SolveHistory = None,
+        auto_time_limit: bool = False,
+        formulation: str = DEFAULT_FORMULATION,
+        record_trajectory: bool = False,
+        search_phases: str = DEFAULT_SEARCH_PHASES,
+        due_date_hint: bool = False
     ):
         logger.info('Start planning ...')
 
-        self.mdl = CpoModel(name='productionPlanning')
-
-        self.jobs = list(jobs_dict.keys())
-        self.machines = list(machines_dict.keys())
-        self.jobs_dict = jobs_dict
-        self.due_date_dict = due_date_dict
-        self.machines_dict = machines_dict
-        self.pending_task = pending_task
-        self.duration_calculator = duration_calculator
-        self.setup_time_dict = setup_time_dict
+        self.mdl = CpoModel(name=name)
+        self.model_exporter = model_exporter
+        self.solution_cache = solution_cache
+        self.solver_pool = solver_pool
+        self.time_limit = time_limit
+        self.coarse_time_scale = coarse_time_scale
+        self.portfolio_size = portfolio_size
+        self.lns = lns
+        self.context = context if context is not None else PlanningContext.from_settings()
+        self.solve_history = solve_history
+        self.auto_time_limit = auto_time_limit
+        self.formulation = formulation
+        self.record_trajectory = record_trajectory
+        self.search_phases = search_phases
+        self.due_date_hint = due_date_hint
+        self.trajectory = None
+
+        self.instance = instance
+        self.jobs = list(range(instance.n_jobs))
+        self.machines = list(range(instance.n_machines))
         self.processing_itv_vars = []
+        self.job_itv_vars = []
+        self.msol = None
+        self.cached_solution = None
+        self.portfolio_solution = None
+        self.presolve = presolve
+        self.objective_bound = None
+        self.gap = None
+        self.profiler = profiler if profiler is not None else Profiler()
         self.__solution_status = False
 
-    def __prepare_processing_interval(self):
-        processing_itv_vars = []
-
-        for j in self.jobs:
-            processing_itv_job_vars = []
-            for m in self.machines:
-                job_id = self.jobs_dict.get(j)
-                mat_id = self.pending_task.loc[job_id]['mat_id']
-                pending_volume = float(
-                    self.pending_task.loc[job_id]['res_draft_volume'])
-                machine = self.machines_dict.get(m)
-
-                self.duration_calculator.register(
-                    machine_id=machine,
-                    mat_id=mat_id
-                )
-
-                duration = self.duration_calculator.calculate_duration(
-                    pending_volume=pending_volume
-                )
-
-                self.duration_calculator.clear()
-
-                if duration:
-                    int_var = self.mdl.interval_var(
-                        optional=True, size=duration, name="interval_job{}_machine{}".format(j, m))
-
-                    processing_itv_job_vars.append(
-                        int_var
-                    )
+    def __build_model(self):
+        processing_itv_vars = self.__prepare_processing_interval()
+        self.processing_itv_vars = processing_itv_vars
 
-                else:
-                    processing_itv_job_vars.append(
-                        None
-                    )
+        if self.formulation == FORMULATION_ALTERNATIVE:
+            self.job_itv_vars = self.__prepare_job_interval()
+            self.__add_alternative_constraint(self.job_itv_vars, processing_itv_vars)
+        else:
+            self.__add_job_must_be_done_constraint(processing_itv_vars)
+        sequence_var = self.__add_no_overlap_and_set_up_overhead_constraint(
+            processing_itv_vars)
+        self.__add_objective_function(sequence_var)
+        if self.search_phases != SEARCH_PHASES_NONE:
+            self.__add_search_phases(sequence_var)
 
-            processing_itv_vars.append(processing_itv_job_vars)
+        return sequence_var
 
-        return processing_itv_vars
+    def __prepare_processing_interval(self):
+        """
+            One optional interval variable per candidate pair p, see
+            ProblemInstance for the pair layout.
+        """
+        pair_duration = self.instance.duration[self.instance.pair_job, self.instance.pair_machine]
+        pair_end_max = self.presolve.end_max[self.instance.pair_job, self.instance.pair_machine]
+
+        return [
+            self.mdl.interval_var(
+                optional=True,
+                size=int(duration),
+                end=(int(duration), int(end_max)),
+                name="interval_job{}_machine{}".format(j, m))
+            for j, m, duration, end_max in zip(
+                self.instance.pair_job, self.instance.pair_machine, pair_duration, pair_end_max)
+        ]
 
-    def __create_setup_matrix(self, processing_itv_vars):
+    def __create_fingerprint(self):
+        return SolutionCache.fingerprint({
+            "mat_id": self.instance.mat_id.tolist(),
+            "volume": self.instance.volume.tolist(),
+            "due_time_unit": self.instance.due_time_unit.tolist(),
+            "machine_id": self.instance.machine_id.tolist(),
+            "duration": self.instance.duration.tolist(),
+            "setup_time": self.instance.setup_time.tolist(),
+            "weights": [self.context.weight_of_tardy_job, self.context.weight_of_adjustment_time],
+            "time_scale": TIME_SCALE,
+            "start_working_hour": self.context.start_working_hour,
+            "holiday": sorted(self.context.holiday),
+            "ot": self.context.ot
+        })
+
+    def __create_setup_matrix(self):
         setup_matrix = [*range(0, len(self.machines))]
         for m in self.machines:
-            setup_time = self.setup_time_dict.get(m)
-            temp1 = []
-            for j1 in self.jobs:
-                temp2 = []
-                for j2 in self.jobs:
-                    if (isinstance(processing_itv_vars[j1][m], expression.CpoIntervalVar) & isinstance(processing_itv_vars[j2][m], expression.CpoIntervalVar)):
-                        if self.pending_task.loc[self.jobs_dict.get(j1)]['mat_id'] == self.pending_task.loc[self.jobs_dict.get(j2)]['mat_id']:
-                            temp2.append(0)
-                        else:
-                            temp2.append(setup_time)
-                if len(temp2) > 0:
-                    temp1.append(temp2)
-            setup_matrix[m] = temp1
+            mat_index = self.instance.mat_index[
+                self.instance.pair_job[self.instance.get_machine_pairs(m)]]
+            setup_matrix[m] = np.where(
+                mat_index[:, np.newaxis] == mat_index[np.newaxis, :],
+                0,
+                int(self.instance.setup_time[m])
+            ).tolist()
 
         return setup_matrix
 
-    def __add_job_must_be_done_constraint(self, processing_itv_vars):
-        for j in self.jobs:
-            processing_itv_vars_at_j = processing_itv_vars[j]
-            non_none_processing_itv_vars_at_j = []
+    def __prepare_job_interval(self):
+        """
+            One master interval per job for the alternative formulation, it
+            takes the start and end of the chosen machine interval.
+        """
+        pair_end_max = self.presolve.end_max[self.instance.pair_job, self.instance.pair_machine]
+
+        return [
+            self.mdl.interval_var(
+                end=(0, int(pair_end_max[self.instance.get_job_pairs(j)].max())),
+                name="interval_job{}".format(j))
+            for j in self.jobs
+        ]
 
-            for m in self.machines:
-                if isinstance(processing_itv_vars_at_j[m], expression.CpoIntervalVar):
-                    non_none_processing_itv_vars_at_j.append(
-                        processing_itv_vars_at_j[m])
+    def __add_alternative_constraint(self, job_itv_vars, processing_itv_vars):
+        for j in self.jobs:
+            self.mdl.add(self.mdl.alternative(
+                job_itv_vars[j],
+                [processing_itv_vars[p] for p in self.instance.get_job_pairs(j)]
+            ))
 
+    def __add_job_must_be_done_constraint(self, processing_itv_vars):
+        for j in self.jobs:
             self.mdl.add(
                 self.mdl.sum(
-                    [self.mdl.presence_of(var)
-                     for var in non_none_processing_itv_vars_at_j]
+                    [self.mdl.presence_of(processing_itv_vars[p])
+                     for p in self.instance.get_job_pairs(j)]
                 ) == 1
             )
 
     def __add_no_overlap_and_set_up_overhead_constraint(self, processing_itv_vars):
         sequence_vars = [
             self.mdl.sequence_var(
-                [processing_itv_vars[j][m] for j in self.jobs if isinstance(
-                    processing_itv_vars[j][m], expression.CpoIntervalVar)],
+                [processing_itv_vars[p] for p in self.instance.get_machine_pairs(m)],
                 name="sequences_machine{}".format(m))
             for m in self.machines
         ]
 
-        if self.setup_time_dict:
-            setup_matrix = self.__create_setup_matrix(processing_itv_vars)
+        if self.instance.setup_time.any():
+            setup_matrix = self.__create_setup_matrix()
 
             for m in self.machines:
                 if len(setup_matrix[m]) > 0:
@@ -160,18 +218,89 @@ class Planner:
         adjustment_time_obj = self.mdl.sum(adjustment_time_list)
 
         n_tardy_day_list = []
-        for m in self.machines:
-            for j in self.jobs:
-                if isinstance(self.processing_itv_vars[j][m], expression.CpoIntervalVar):
-                    due_date = self.due_date_dict.get(j)
-                    if due_date:
-                        if due_date > 0:
-                            n_tardy_day_list.append(self.mdl.max(
-                                [0, self.mdl.end_of(self.processing_itv_vars[j][m]) - due_date]))
+        if self.formulation == FORMULATION_ALTERNATIVE:
+            # Tardiness once per job on its master interval
+            due = self.instance.due_time_unit
+            for j in np.flatnonzero(due > 0):
+                n_tardy_day_list.append(self.mdl.max(
+                    [0, self.mdl.end_of(self.job_itv_vars[j]) - int(due[j])]))
+        else:
+            pair_due = self.instance.due_time_unit[self.instance.pair_job]
+            for p in np.flatnonzero(pair_due > 0):
+                n_tardy_day_list.append(self.mdl.max(
+                    [0, self.mdl.end_of(self.processing_itv_vars[p]) - int(pair_due[p])]))
 
         n_tardy_day_obj = self.mdl.sum(n_tardy_day_list)
         self.mdl.add(self.mdl.minimize(adjustment_time_obj *
-                     WEIGHT_OF_ADJUSTMENT_TIME + n_tardy_day_obj * WEIGHT_OF_TARDY_JOB))
+                     self.context.weight_of_adjustment_time + n_tardy_day_obj * self.context.weight_of_tardy_job))
+
+    def __create_due_date_buckets(self):
+        """
+            Due date bucket of every job: the jobs with a due date are split
+            by due date into SEARCH_PHASE_BUCKETS groups of the same size,
+            the most urgent first, and the jobs without one come last.
+        """
+        due = self.instance.due_time_unit
+        buckets = np.full(self.instance.n_jobs, SEARCH_PHASE_BUCKETS, dtype=np.int64)
+
+        has_due = np.flatnonzero(due > 0)
+        order = has_due[np.argsort(due[has_due], kind='stable')]
+        for bucket, jobs in enumerate(np.array_split(order, min(SEARCH_PHASE_BUCKETS, max(len(order), 1)))):
+            buckets[jobs] = bucket
+
+        return buckets
+
+    def __add_search_phases(self, sequence_vars: List[expression.CpoSequenceVar]):
+        """
+            Fix the intervals of the urgent jobs first, bucket by bucket, and
+            the machine sequences before (sequence_first) or after them.
+        """
+        buckets = self.__create_due_date_buckets()
+
+        interval_phases = []
+        for bucket in np.unique(buckets):
+            jobs = np.flatnonzero(buckets == bucket)
+            if self.formulation == FORMULATION_ALTERNATIVE:
+                itv_vars = [self.job_itv_vars[j] for j in jobs]
+            else:
+                itv_vars = [self.processing_itv_vars[p] for j in jobs for p in self.instance.get_job_pairs(j)]
+            interval_phases.append(self.mdl.search_phase(itv_vars))
+
+        sequence_phase = self.mdl.search_phase(sequence_vars)
+        if self.search_phases == SEARCH_PHASES_SEQUENCE_FIRST:
+            self.mdl.set_search_phases([sequence_phase] + interval_phases)
+        else:
+            self.mdl.set_search_phases(interval_phases + [sequence_phase])
+
+    def __create_due_date_schedule(self):
+        """
+            Earliest due date schedule: jobs by due date bucket and material,
+            each on the compatible machine where it ends first.
+        """
+        instance = self.instance
+        machine_end = np.zeros(instance.n_machines, dtype=np.int64)
+        machine_mat = np.full(instance.n_machines, -1, dtype=np.int64)
+
+        solutions = []
+        for j in np.lexsort((instance.due_time_unit, instance.mat_index, self.__create_due_date_buckets())):
+            candidates = np.flatnonzero(instance.candidate_mask[j])
+            setups = np.where(
+                (machine_mat[candidates] >= 0) & (machine_mat[candidates] != instance.mat_index[j]),
+                instance.setup_time[candidates], 0)
+            ends = machine_end[candidates] + setups + instance.duration[j, candidates]
+            k = int(np.argmin(ends))
+            m = int(candidates[k])
+
+            solutions.append({
+                "machine_id": m,
+                "job_id": int(j),
+                "start": int(ends[k] - instance.duration[j, m]),
+                "end": int(ends[k])
+            })
+            machine_end[m] = ends[k]
+            machine_mat[m] = instance.mat_index[j]
+
+        return pd.DataFrame(solutions, columns=['machine_id', 'job_id', 'start', 'end'])
 
     def get_processing_itv_vars(self):
         return self.processing_itv_vars
@@ -179,74 +308,486 @@ class Planner:
     def get_solution_status(self):
         return self.__solution_status
 
+    def get_objective_value(self):
+        if self.cached_solution is not None:
+            return self.cached_solution['objective_value']
+        if self.portfolio_solution is not None:
+            return self.portfolio_solution['objective_value']
+
+        return self.msol.get_objective_value()
+
+    def get_lower_bound(self):
+        return max(self.presolve.lower_bound, self.objective_bound or 0)
+
+    def get_gap(self):
+        return self.gap
+
+    def get_solutions_df(self):
+        if self.cached_solution is not None:
+            return self.cached_solution['solutions_df']
+
+        if self.portfolio_solution is not None:
+            intervals = self.portfolio_solution['intervals'].items()
+        else:
+            intervals = (
+                (itv.get_name(), (itv.get_start(), itv.get_end()))
+                for itv in self.msol.get_all_var_solutions()
+                if isinstance(itv, CpoIntervalVarSolution) and itv.is_present()
+            )
+
+        # One pass over the present intervals of the solution
+        pair_index = {var.get_name(): p for p, var in enumerate(self.processing_itv_vars)}
+        pairs, starts, ends = [], [], []
+        for name, (start, end) in intervals:
+            p = pair_index.get(name)
+            if p is not None:
+                pairs.append(p)
+                starts.append(start)
+                ends.append(end)
+
+        pairs = np.asarray(pairs, dtype=np.int64)
+        solutions_df = pd.DataFrame({
+            "machine_id": self.instance.pair_machine[pairs],
+            "job_id": self.instance.pair_job[pairs],
+            "start": np.asarray(starts, dtype=np.int64),
+            "end": np.asarray(ends, dtype=np.int64)
+        }, columns=['machine_id', 'job_id', 'start', 'end'])
+
+        return solutions_df.sort_values(['machine_id', 'job_id'], ignore_index=True)
+
+    def __solve_coarse(self, factor: int, time_limit: float):
+        """
+            Solve the group on a time grid factor times coarser and return the
+            scaled solution as a starting point of this model, None if the
+            coarse solve found no solution.
+        """
+        logger.info('Solve on a {} minute grid ...'.format(TIME_SCALE * factor))
+
+        coarse_planner = Planner(
+            instance=self.instance.coarsen(factor),
+            name='{}_coarse'.format(self.mdl.get_name()),
+            solver_pool=self.solver_pool,
+            time_limit=time_limit,
+            context=self.context,
+            formulation=self.formulation,
+            search_phases=self.search_phases,
+            due_date_hint=self.due_date_hint
+        )
+
+        try:
+            coarse_msol = coarse_planner.generate()
+        except Exception as e:
+            logger.debug(e)
+            logger.warning('Coarse solve failed, solve without a starting point.')
+
+            return None
+
+        if coarse_msol is None or not coarse_msol.is_solution():
+            return None
+
+        # Coarse durations and adjustment times are rounded up, so the scaled
+        # intervals of a machine keep apart by their fine adjustment times.
+        # Rounding up can also end them after the fine end_max, such jobs are
+        # left out of the starting point.
+        solutions_df = coarse_planner.get_solutions_df()
+        solutions_df['start'] = solutions_df['start'] * factor
+
+        return self.__create_starting_point(solutions_df)
+
+    def __create_starting_point(self, solutions_df: pd.DataFrame):
+        """
+            Create a starting point from a schedule. CP Optimizer rejects the
+            whole starting point when one interval is outside of its domain,
+            so jobs ending after their end_max are left for the solver to
+            place.
+        """
+        job_start = {}
+        skipped_jobs = set()
+        for row in solutions_df.itertuples():
+            j, m, start = int(row.job_id), int(row.machine_id), int(row.start)
+
+            if start < 0 or start + int(self.instance.duration[j, m]) > int(self.presolve.end_max[j, m]):
+                skipped_jobs.add(j)
+            else:
+                job_start[(j, m)] = start
+
+        if len(skipped_jobs) > 0:
+            logger.debug('{} jobs of the starting point end after their end_max and are left out.'.format(len(skipped_jobs)))
+
+        starting_point = CpoModelSolution()
+        for p, var in enumerate(self.processing_itv_vars):
+            j, m = int(self.instance.pair_job[p]), int(self.instance.pair_machine[p])
+
+            if j in skipped_jobs:
+                continue
+            if (j, m) in job_start:
+                start = job_start[(j, m)]
+                starting_point.add_interval_var_solution(
+                    var, presence=True, start=start, end=start + int(self.instance.duration[j, m]))
+            else:
+                starting_point.add_interval_var_solution(var, presence=False)
+
+        return starting_point
+
+    def __select_neighborhood(self, kind: str, solutions_df: pd.DataFrame, rng: np.random.Generator):
+        """
+            Return the jobs freed by one LNS iteration: at most
+            LNS_NEIGHBORHOOD_SIZE consecutive jobs (by start) of one machine,
+            of all machines, or of one material.
+        """
+        if kind == 'machine':
+            machine = rng.choice(solutions_df['machine_id'].unique())
+            candidates = solutions_df[solutions_df['machine_id'] == machine]
+        elif kind == 'material':
+            job_mat = self.instance.mat_index[solutions_df['job_id'].to_numpy(dtype=int)]
+            candidates = solutions_df[job_mat == rng.choice(np.unique(job_mat))]
+        else:
+            candidates = solutions_df
+
+        candidates = candidates.sort_values('start')
+        offset = int(rng.integers(0, max(len(candidates) - LNS_NEIGHBORHOOD_SIZE, 0) + 1))
+
+        return set(candidates['job_id'].iloc[offset:offset + LNS_NEIGHBORHOOD_SIZE].astype(int))
+
+    def __create_fix_constraints(self, solutions_df: pd.DataFrame, free_jobs: set):
+        constraints = []
+        for row in solutions_df.itertuples():
+            if int(row.job_id) in free_jobs:
+                continue
+
+            pairs = self.instance.get_job_pairs(int(row.job_id))
+            p = pairs[self.instance.pair_machine[pairs] == int(row.machine_id)][0]
+            var = self.processing_itv_vars[p]
+            constraints.append(self.mdl.presence_of(var) == 1)
+            constraints.append(self.mdl.start_of(var) == int(row.start))
+
+        return constraints
+
+    def __solve_neighborhood(self, objective_value: float, **kwargs):
+        """
+            Solve an LNS subproblem until the first solution better than
+            objective_value.
+        """
+        with self.__create_solver(**kwargs) as solver:
+            while True:
+                sres = solver.search_next()
+                if not sres.is_solution() or not sres.is_new_solution() \
+                        or sres.get_objective_value() < objective_value:
+                    break
+
+            return solver.end_search()
+
+    def __improve_by_lns(self, deadline: float, target_gap: float, **kwargs):
+        """
+            Large neighborhood search from the solution in self.msol until
+            deadline (time.monotonic()). Every iteration frees the jobs of one
+            neighborhood, fixes all other jobs to their machine and start and
+            re-solves with a short time limit from the current solution. An
+            improved solution replaces the current one.
+        """
+        rng = np.random.default_rng(LNS_RANDOM_SEED)
+        initial_objective_value = self.msol.get_objective_value()
+        n_iterations = 0
+        n_improvements = 0
+
+        while deadline - time.monotonic() > 1:
+            objective_value = self.msol.get_objective_value()
+            if target_gap and self.presolve.relative_gap(objective_value, self.objective_bound) <= target_gap:
+                break
+
+            solutions_df = self.get_solutions_df()
+            kind = LNS_NEIGHBORHOODS[n_iterations % len(LNS_NEIGHBORHOODS)]
+            free_jobs = self.__select_neighborhood(kind, solutions_df, rng)
+            constraints = self.__create_fix_constraints(solutions_df, free_jobs)
+
+            self.mdl.add(constraints)
+            self.mdl.set_starting_point(self.__create_starting_point(solutions_df))
+            try:
+                sres = self.__solve_neighborhood(
+                    objective_value,
+                    TimeLimit=min(LNS_ITERATION_TIME_LIMIT, deadline - time.monotonic()),
+                    **kwargs
+                )
+            finally:
+                self.mdl.remove(constraints)
+
+            n_iterations = n_iterations + 1
+            if sres.is_solution() and sres.get_objective_value() < objective_value:
+                self.msol = sres
+                n_improvements = n_improvements + 1
+                logger.debug('LNS iteration {} ({}, {} jobs): objective value {} -> {}'.format(
+                    n_iterations, kind, len(free_jobs), objective_value, sres.get_objective_value()))
+
+        logger.info('LNS: {} iterations, {} improvements, objective value {} -> {}'.format(
+            n_iterations, n_improvements, initial_objective_value, self.msol.get_objective_value()))
+
+    def __count_model_size(self, sequence_vars: List[expression.CpoSequenceVar]):
+        n_candidates = np.diff(self.instance.machine_ptr)
+
+        self.profiler.add_counters(
+            n_interval_vars=int(n_candidates.sum()) + len(self.job_itv_vars),
+            n_sequence_vars=len(sequence_vars),
+            n_expressions=len(self.mdl.get_all_expressions()),
+            setup_matrix_cells=int((n_candidates ** 2).sum()) if self.instance.setup_time.any() else 0
+        )
+
+        with self.profiler.phase('serialize_model'):
+            self.profiler.add_counters(
+                model_bytes=len(self.mdl.get_cpo_string().encode('utf-8')))
+
+    @contextmanager
+    def __create_solver(self, **kwargs):
+        if self.solver_pool is not None:
+            with self.solver_pool.session(self.mdl, **kwargs) as solver:
+                yield solver
+        else:
+            solver = CpoSolver(self.mdl, execfile=get_cpoptimizer_path(), **kwargs)
+            try:
+                yield solver
+            finally:
+                solver.end()
+
+    def __solve(self, target_gap: float, **kwargs):
+        """
+            Solve the model. With target_gap the search stops at the first
+            solution whose relative gap to the lower bound is not above it.
+        """
+        with self.__create_solver(**kwargs) as solver:
+            if not target_gap and self.solve_history is None and not self.record_trajectory:
+                return solver.solve()
+
+            # Objective value over time for the solve history and benchmarks
+            started_at = time.perf_counter()
+            self.trajectory = []
+            while True:
+                sres = solver.search_next()
+                if not sres.is_solution() or not sres.is_new_solution():
+                    break
+
+                self.trajectory.append([time.perf_counter() - started_at, sres.get_objective_value()])
+                if not target_gap:
+                    continue
+
+                gap = self.presolve.relative_gap(
+                    sres.get_objective_value(), sres.get_objective_bound())
+                if gap <= target_gap:
+                    logger.info('Gap {:.2%} is within the target gap {:.2%}, stop searching.'.format(
+                        gap, target_gap))
+                    break
+
+            return solver.end_search()
+
+    def __create_other_formulation(self):
+        """
+            The model of the group with the other formulation. Its machine
+            intervals have the same names and its objective the same value.
+        """
+        formulation = FORMULATION_PAIRS if self.formulation == FORMULATION_ALTERNATIVE else FORMULATION_ALTERNATIVE
+        planner = Planner(
+            instance=self.instance,
+            name='{}_{}'.format(self.mdl.get_name(), formulation),
+            presolve=self.presolve,
+            context=self.context,
+            formulation=formulation,
+            search_phases=self.search_phases
+        )
+        planner.__build_model()
+        if self.mdl.get_starting_point() is not None:
+            planner.mdl.set_starting_point(self.mdl.get_starting_point())
+
+        return planner.mdl
+
+    def __solve_portfolio(self, target_gap: float, solve_params: dict):
+        """
+            Solve the model with a portfolio of search configurations in
+            parallel processes, the cores of the solve are shared between them.
+            Every other member solves the model with the other formulation.
+        """
+        logger.info('Solve with a portfolio of {} configurations ...'.format(self.portfolio_size))
+
+        portfolio = SolverPortfolio(
+            size=self.portfolio_size,
+            total_workers=solve_params.pop("Workers", None)
+        )
+        portfolio_solution = portfolio.solve(
+            self.mdl,
+            solve_params=solve_params,
+            lower_bound=self.presolve.lower_bound,
+            target_gap=target_gap,
+            alternative_models=[self.__create_other_formulation()]
+        )
+
+        if portfolio_solution is None:
+            raise Exception('No portfolio configuration found a solution.')
+
+        return portfolio_solution
+
+    def __predict_time_limit(self):
+        if self.auto_time_limit and self.solve_history is not None:
+            time_limit = self.solve_history.predict_time_limit(
+                n_pairs=self.instance.n_pairs,
+                floor=settings.get_setting('time_limit_floor'),
+                ceiling=settings.get_setting('time_limit_ceiling')
+            )
+
+            if time_limit is not None:
+                logger.info('Time limit from the solve history: {:.0f} seconds.'.format(time_limit))
+                return time_limit
+
+            logger.info('Not enough solve history, use the default time limit.')
+
+        return self.context.run_time_limit
+
+    def __add_solve_history(self, time_limit: float, target_gap: float):
+        gap = self.presolve.relative_gap(self.msol.get_objective_value(), self.msol.get_objective_bound())
+        is_complete = self.msol.is_solution_optimal() or (bool(target_gap) and gap <= target_gap)
+
+        try:
+            self.solve_history.add(
+                name=self.mdl.get_name(),
+                n_jobs=self.instance.n_jobs,
+                n_machines=self.instance.n_machines,
+                n_pairs=self.instance.n_pairs,
+                time_limit=time_limit,
+                trajectory=self.trajectory,
+                is_complete=is_complete
+            )
+        except Exception as e:
+            logger.debug(e)
+            logger.warning('Write solve history failed.')
+
     def __update_solution_status(self, status=True):
         self.__solution_status = status
 
-    def __calculate_objective_value(self, overall_objective_value: int, end_time_unit_dict: Dict[int, int]):
-        tardy_job_objective_value = (
-            self.pending_task.index.map(end_time_unit_dict) - self.pending_task['due_time_unit']
-        ).apply(lambda x: x if x > 0 else 0).sum()
-        tardy_job_objective_value = tardy_job_objective_value * WEIGHT_OF_TARDY_JOB
+    def __calculate_objective_value(self, overall_objective_value: int, solutions_df: pd.DataFrame):
+        end_time_unit = np.zeros(self.instance.n_jobs, dtype=np.int64)
+        end_time_unit[solutions_df['job_id'].to_numpy(dtype=int)] = solutions_df['end'].to_numpy(dtype=int)
+
+        due_time_unit = self.instance.due_time_unit
+        tardy_job_objective_value = np.where(
+            due_time_unit > 0, np.maximum(end_time_unit - due_time_unit, 0), 0).sum()
+        tardy_job_objective_value = tardy_job_objective_value * self.context.weight_of_tardy_job
 
         return {
             "tardy_job_objective_value": tardy_job_objective_value,
             "adjustment_time_objective_value": overall_objective_value - tardy_job_objective_value
         }
 
-    def __create_end_time_unit_dict(self, msol):
-        end_time_unit_dict = {}
-        for m in self.machines:
-            for j in self.jobs:
-                itv: CpoIntervalVarSolution = msol.get_var_solution(
-                    self.processing_itv_vars[j][m])
-                if itv:
-                    if itv.is_present():
-                        end_time_unit_dict.update(
-                            {
-                                j: itv.get_end()
-                            }
-                        )
-
-        return end_time_unit_dict
-
     def generate(self):
-        processing_itv_vars = self.__prepare_processing_interval()
-        self.processing_itv_vars = processing_itv_vars
+        if self.presolve is None:
+            self.presolve = PresolveAnalysis(self.instance, self.context)
 
-        self.__add_job_must_be_done_constraint(processing_itv_vars)
-        sequence_var = self.__add_no_overlap_and_set_up_overhead_constraint(
-            processing_itv_vars)
-        self.__add_objective_function(sequence_var)
+        if self.solution_cache is not None:
+            fingerprint = self.__create_fingerprint()
+            self.cached_solution = self.solution_cache.get(fingerprint)
 
-        if platform.system() in (['Linux', 'Darwin']):
-            # Linux or MAC OS X
-            execfile = './cpoptimizer'
+            if self.cached_solution is not None:
+                self.__update_solution_status()
+                self.gap = self.presolve.relative_gap(
+                    self.cached_solution['objective_value'])
 
-        elif platform.system() == 'Windows':
-            # Windows
-            execfile = './cpoptimizer.exe'
+                logger.info('Success (cached solution).')
+                logger.info('Objective value is {}'.format(
+                    self.cached_solution['objective_value']))
 
-        else:
-            raise Exception('Invalid platform')
+                return None
 
-        msol = self.mdl.solve(
-            log_output=True if settings.get_setting(
-                "STAGE") == 'dev' else None,
-            execfile=resource_path(execfile),
-            TimeLimit=settings.get_setting('run_time_limit')
-        )
+        with self.profiler.phase('build_model'):
+            sequence_var = self.__build_model()
+
+        if self.profiler.enabled:
+            self.__count_model_size(sequence_var)
+
+        time_limit = self.time_limit or self.__predict_time_limit()
+
+        if self.coarse_time_scale and self.coarse_time_scale // TIME_SCALE > 1:
+            coarse_time_limit = time_limit * COARSE_TIME_LIMIT_RATIO
+            starting_point = self.__solve_coarse(
+                factor=self.coarse_time_scale // TIME_SCALE,
+                time_limit=coarse_time_limit
+            )
+
+            if starting_point is not None:
+                self.mdl.set_starting_point(starting_point)
+                time_limit = time_limit - coarse_time_limit
+
+        if self.due_date_hint and self.mdl.get_starting_point() is None:
+            self.mdl.set_starting_point(self.__create_starting_point(self.__create_due_date_schedule()))
+
+        solve_params = {
+            "TimeLimit": time_limit
+        }
 
+        if settings.get_setting('solver_workers'):
+            solve_params["Workers"] = settings.get_setting('solver_workers')
+
+        target_gap = settings.get_setting('target_gap')
+        if target_gap:
+            solve_params["RelativeOptimalityTolerance"] = target_gap
+
+        if self.model_exporter is not None:
+            self.model_exporter.export(
+                name=self.mdl.get_name(),
+                mdl=self.mdl,
+                solve_params=solve_params,
+                instance=self.instance
+            )
+
+        with self.profiler.phase('solve'):
+            if self.portfolio_size > 1:
+                self.portfolio_solution = self.__solve_portfolio(target_gap, solve_params)
+                self.objective_bound = self.portfolio_solution['objective_bound']
+            else:
+                deadline = time.monotonic() + time_limit
+                is_lns = self.lns and self.instance.n_jobs > LNS_NEIGHBORHOOD_SIZE
+                if is_lns:
+                    solve_params["TimeLimit"] = time_limit * LNS_INITIAL_TIME_RATIO
+
+                log_output = True if settings.get_setting("STAGE") == 'dev' else None
+                self.msol = self.__solve(
+                    target_gap=target_gap,
+                    log_output=log_output,
+                    **solve_params
+                )
+                if self.msol.is_solution():
+                    # Bounds of the LNS subproblems are no bounds of the group
+                    self.objective_bound = self.msol.get_objective_bound()
+
+                    if is_lns:
+                        solve_params.pop("TimeLimit")
+                        self.__improve_by_lns(deadline, target_gap, log_output=log_output, **solve_params)
+                    elif self.solve_history is not None:
+                        self.__add_solve_history(solve_params["TimeLimit"], target_gap)
+
+        msol = self.msol
         self.__update_solution_status()
-        end_time_unit_dict = self.__create_end_time_unit_dict(msol)
+        if self.portfolio_solution is not None:
+            objective_value = self.portfolio_solution['objective_value']
+        else:
+            objective_value = msol.get_objective_value()
+        self.gap = self.presolve.relative_gap(objective_value, self.objective_bound)
+
+        with self.profiler.phase('extract_solution'):
+            solutions_df = self.get_solutions_df()
+
+        if self.solution_cache is not None and self.gap is not None:
+            self.solution_cache.put(
+                key=fingerprint,
+                objective_value=objective_value,
+                solutions_df=solutions_df
+            )
 
         obj_value_details = self.__calculate_objective_value(
-            msol.get_objective_value(), end_time_unit_dict)
+            objective_value, solutions_df)
 
         logger.info('Success.')
-        logger.info('Objective value is {}'.format(msol.get_objective_value()))
+        logger.info('Objective value is {}'.format(objective_value))
         logger.info('Tardy job objective value: {}'.format(
             obj_value_details['tardy_job_objective_value']))
         logger.info('Adjustment time objective value: {}'.format(
             obj_value_details['adjustment_time_objective_value']))
+        if self.gap is not None:
+            logger.info('Lower bound is {}, gap {:.2%}'.format(
+                self.get_lower_bound(), self.gap))
 
         return msol
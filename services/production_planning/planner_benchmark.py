@@ -0,0 +1,104 @@
+import os
+import itertools
+from typing import Any, Dict, List
+import pandas as pd
+
+from const import BENCHMARK_QUALITY_GAP
+from libs.profiler import Profiler
+from libs.settings import settings
+from libs.loggers import logging
+from services.production_planning.model_exporter import INSTANCE_FILE
+from services.production_planning.planner import Planner
+from services.production_planning.problem_instance import ProblemInstance
+
+
+logger = logging.getLogger('planner_benchmark')
+
+
+class PlannerBenchmark:
+    """
+        Build and solve the instances written by ModelExporter with every
+        planner configuration (formulation, search phases, ...) and compare
+        the build time, the model size and the time to a solution within
+        BENCHMARK_QUALITY_GAP of the best objective value any configuration
+        found for the instance.
+    """
+
+    def __init__(self, model_dirs: List[str]):
+        self.model_dirs = [x for x in model_dirs if os.path.exists(os.path.join(x, INSTANCE_FILE))]
+
+    def __solve(self, model_dir: str, config: Dict[str, Any], time_limit: float):
+        instance = ProblemInstance.load(os.path.join(model_dir, INSTANCE_FILE))
+        profiler = Profiler(enabled=True)
+        planner = Planner(
+            instance,
+            name=os.path.basename(model_dir),
+            time_limit=time_limit,
+            profiler=profiler,
+            record_trajectory=True,
+            **config
+        )
+
+        # Run the full time limit and never reuse a cached solution
+        with settings.override({"target_gap": 0, "solution_cache_dir": None}):
+            planner.generate()
+
+        seconds = {x['phase']: x['seconds'] for x in profiler.phases}
+        trajectory = planner.trajectory or []
+
+        return {
+            "model": os.path.basename(model_dir),
+            **config,
+            "n_jobs": instance.n_jobs,
+            "n_pairs": len(instance.pair_job),
+            "n_interval_vars": profiler.counters.get('n_interval_vars'),
+            "n_expressions": profiler.counters.get('n_expressions'),
+            "model_bytes": profiler.counters.get('model_bytes'),
+            "build_seconds": seconds.get('build_model'),
+            "solve_seconds": seconds.get('solve'),
+            "objective_value": planner.get_objective_value(),
+            "first_solution_seconds": trajectory[0][0] if len(trajectory) > 0 else None,
+            "first_objective_value": trajectory[0][1] if len(trajectory) > 0 else None,
+            "trajectory": trajectory
+        }
+
+    @staticmethod
+    def __time_to_quality(trajectory: List[List[float]], best_objective_value: float):
+        threshold = best_objective_value + BENCHMARK_QUALITY_GAP * max(abs(best_objective_value), 1)
+        for seconds, objective_value in trajectory:
+            if objective_value <= threshold:
+                return seconds
+
+        return None
+
+    def run(self, time_limit: float, config_grid: Dict[str, List[Any]]):
+        """
+            Solve every instance with every combination of config_grid.
+
+                Parameters:
+                    time_limit (float): time limit of every solve in seconds
+                    config_grid (Dict[str, List[Any]]): Planner argument name to the values to try,
+                        for example {"formulation": ["pairs", "alternative"]}. An empty list keeps
+                        the default of the Planner.
+
+                Returns:
+                    DataFrame with one row per instance and configuration
+        """
+        config_grid = {key: values for key, values in config_grid.items() if len(values) > 0}
+        configs = [dict(zip(config_grid.keys(), values)) for values in itertools.product(*config_grid.values())]
+
+        results = []
+        for model_dir in self.model_dirs:
+            model_results = []
+            for config in configs:
+                logger.info('Solve {} with {} ...'.format(model_dir, config))
+                model_results.append(self.__solve(model_dir, config, time_limit))
+
+            objective_values = [x['objective_value'] for x in model_results if x['objective_value'] is not None]
+            for result in model_results:
+                trajectory = result.pop('trajectory')
+                result['time_to_quality_seconds'] = self.__time_to_quality(
+                    trajectory, min(objective_values)) if len(objective_values) > 0 else None
+                results.append(result)
+
+        return pd.DataFrame(results)
@@ -0,0 +1,160 @@
+import numpy as np
+
+from libs.settings import PlanningContext
+from services.production_planning.problem_instance import ProblemInstance
+from libs.loggers import logging
+
+
+logger = logging.getLogger('presolve')
+
+
+class PresolveAnalysis:
+    """
+        Bounds and capacity check of one machine group computed from the
+        durations, adjustment times and due dates before the model is built.
+
+        Every solution without idle time is at least as good as the same
+        sequence with idle time, so every job on machine m ends before the
+        total work of its candidate jobs plus one adjustment between each.
+
+            has_candidate (bool): job has at least one compatible machine, other jobs are left out of the bounds
+            min_duration (int64): shortest processing time of every job, 0 without a compatible machine
+            end_max (int64): latest useful end of every job x machine, 0 if incompatible
+            horizon (int): latest useful end of the group
+            forced_load (int64): load of the jobs with a single compatible machine, per machine
+            load_lower_bound (float): lower bound of the average machine load
+            overload (dict): work due by a due date which cannot fit before it, None if the group fits
+            lower_bound (float): lower bound of the objective value
+    """
+
+    def __init__(self, instance: ProblemInstance, context: PlanningContext = None):
+        self.instance = instance
+        self.context = context if context is not None else PlanningContext.from_settings()
+
+        candidate_mask = instance.candidate_mask
+        duration = instance.duration.astype(np.int64)
+        setup_time = instance.setup_time.astype(np.int64)
+
+        n_candidates = candidate_mask.sum(axis=0)
+        machine_horizon = duration.sum(axis=0) + np.maximum(n_candidates - 1, 0) * setup_time
+
+        self.has_candidate = candidate_mask.any(axis=1)
+        self.min_duration = np.where(
+            self.has_candidate,
+            np.where(candidate_mask, duration, np.iinfo(np.int64).max).min(axis=1, initial=np.iinfo(np.int64).max),
+            0)
+        self.end_max = np.where(candidate_mask, machine_horizon[np.newaxis, :], 0)
+        self.horizon = int(machine_horizon.max()) if instance.n_machines > 0 else 0
+
+        is_forced = candidate_mask.sum(axis=1) == 1
+        self.forced_load = np.where(candidate_mask & is_forced[:, np.newaxis], duration, 0).sum(axis=0)
+        self.load_lower_bound = self.min_duration.sum() / max(instance.n_machines, 1)
+
+        self.overload = self.__find_overload()
+
+        self.tardiness_lower_bound = self.__calculate_tardiness_lower_bound()
+        self.adjustment_time_lower_bound = self.__calculate_adjustment_time_lower_bound()
+        self.lower_bound = self.tardiness_lower_bound * self.context.weight_of_tardy_job + \
+            self.adjustment_time_lower_bound * self.context.weight_of_adjustment_time
+
+    def __find_overload(self):
+        """
+            Earliest due date d where the shortest work of the jobs due by d
+            exceeds the capacity of all machines until d.
+        """
+        due = self.instance.due_time_unit.astype(np.int64)
+        has_due = (due > 0) & self.has_candidate
+        if not has_due.any():
+            return None
+
+        order = np.argsort(due[has_due], kind='stable')
+        sorted_due = due[has_due][order]
+        cumulative_work = np.cumsum(self.min_duration[has_due][order])
+        capacity = sorted_due * self.instance.n_machines
+        excess = cumulative_work - capacity
+
+        overloaded = np.flatnonzero(excess > 0)
+        if len(overloaded) == 0:
+            return None
+
+        i = overloaded[0]
+
+        return {
+            "due_time_unit": int(sorted_due[i]),
+            "work": int(cumulative_work[i]),
+            "capacity": int(capacity[i]),
+            "max_excess": int(excess.max())
+        }
+
+    def __calculate_tardiness_lower_bound(self):
+        """
+            The k-th completion among the jobs with a due date is not earlier
+            than the k shortest of them shared by all machines. Pairing these
+            completions with the sorted due dates gives the least tardiness.
+        """
+        due = self.instance.due_time_unit.astype(np.int64)
+        has_due = (due > 0) & self.has_candidate
+        if not has_due.any() or self.instance.n_machines == 0:
+            return 0
+
+        completion = np.ceil(
+            np.cumsum(np.sort(self.min_duration[has_due])) / self.instance.n_machines)
+
+        return int(np.maximum(completion - np.sort(due[has_due]), 0).sum())
+
+    def __calculate_adjustment_time_lower_bound(self):
+        """
+            Every machine adjusts at least once per material after its first
+            one, so the group adjusts at least (materials - machines) times.
+        """
+        if self.instance.n_machines == 0:
+            return 0
+
+        n_materials = len(np.unique(self.instance.mat_index))
+        n_adjustments = max(n_materials - self.instance.n_machines, 0)
+
+        return int(n_adjustments * self.instance.setup_time.min())
+
+    def relative_gap(self, objective_value: float, objective_bound: float = None):
+        """
+            Relative gap of objective_value to the best of the lower bound and
+            the objective bound of the solver.
+        """
+        if objective_value is None:
+            return None
+
+        lower_bound = self.lower_bound
+        if objective_bound is not None:
+            lower_bound = max(lower_bound, objective_bound)
+
+        if objective_value <= 0:
+            return 0.0
+
+        return max(objective_value - lower_bound, 0) / objective_value
+
+    def report(self, name: str):
+        logger.info('Horizon of {}: {} time units, average load at least {:.1f} time units.'.format(
+            name, self.horizon, self.load_lower_bound))
+
+        n_unplannable = int((~self.has_candidate).sum())
+        if n_unplannable > 0:
+            logger.warning('{} jobs of {} have no compatible machine.'.format(n_unplannable, name))
+
+        if self.overload is not None:
+            logger.warning(
+                'Machine group {} is overloaded: {} time units of work are due by time unit {} '
+                'but the machines can process {}. Tardiness cannot be avoided.'.format(
+                    name,
+                    self.overload['work'],
+                    self.overload['due_time_unit'],
+                    self.overload['capacity']
+                ))
+
+        return {
+            "horizon": self.horizon,
+            "load_lower_bound": float(self.load_lower_bound),
+            "max_forced_load": int(self.forced_load.max()) if len(self.forced_load) > 0 else 0,
+            "overload": self.overload,
+            "n_unplannable_jobs": n_unplannable,
+            "lower_bound": float(self.lower_bound)
+        }
@@ -0,0 +1,168 @@
+from typing import List
+import numpy as np
+from pandas import DataFrame
+
+from services.production_planning.job_duration_calculator import JobDurationCalculator
+
+
+class ProblemInstance:
+    """
+        Struct-of-arrays view of one machine group.
+
+        Jobs are addressed by their position j (0..n_jobs-1) and machines by
+        their position m (0..n_machines-1). Job arrays have n_jobs rows and the
+        job x machine matrices have n_jobs rows and n_machines columns.
+
+            job_index (int64): index label of the job in the pending job table of the plan
+            so_id (int64): sale order id of the job
+            mat_id (int64): material id of the job
+            mat_index (int32): dense material index of the job within the group
+            volume (float64): pending volume of the job
+            due_time_unit (int32): due date in time units, 0 when the job has no due date
+            machine_id (int32): machine id of every machine
+            setup_time (int32): adjustment time in time units of every machine
+            duration (int32): processing time units of job j on machine m, 0 if incompatible
+            rate (float64): volume produced per time unit of job j on machine m
+            candidate_mask (bool): job j can be processed on machine m
+
+        The candidate (job, machine) pairs are also kept sparse, in CSR style.
+        Pair p is job pair_job[p] on machine pair_machine[p], pairs are sorted
+        by job and then by machine.
+
+            pair_job, pair_machine (int64): job and machine of every pair
+            job_ptr (int64): pairs of job j are job_ptr[j]:job_ptr[j + 1]
+            machine_pairs (int64): pairs sorted by machine and then by job
+            machine_ptr (int64): pairs of machine m are machine_pairs[machine_ptr[m]:machine_ptr[m + 1]]
+    """
+
+    ARRAYS = [
+        'job_index', 'so_id', 'mat_id', 'mat_index', 'volume', 'due_time_unit',
+        'machine_id', 'setup_time', 'duration', 'rate'
+    ]
+
+    def __init__(
+        self,
+        job_index: np.ndarray,
+        so_id: np.ndarray,
+        mat_id: np.ndarray,
+        mat_index: np.ndarray,
+        volume: np.ndarray,
+        due_time_unit: np.ndarray,
+        machine_id: np.ndarray,
+        setup_time: np.ndarray,
+        duration: np.ndarray,
+        rate: np.ndarray
+    ):
+        self.job_index = job_index
+        self.so_id = so_id
+        self.mat_id = mat_id
+        self.mat_index = mat_index
+        self.volume = volume
+        self.due_time_unit = due_time_unit
+        self.machine_id = machine_id
+        self.setup_time = setup_time
+        self.duration = duration
+        self.rate = rate
+        self.candidate_mask = duration > 0
+
+        self.pair_job, self.pair_machine = np.nonzero(self.candidate_mask)
+        self.job_ptr = np.searchsorted(self.pair_job, np.arange(self.n_jobs + 1))
+        self.machine_pairs = np.argsort(self.pair_machine, kind='stable')
+        self.machine_ptr = np.searchsorted(
+            self.pair_machine[self.machine_pairs], np.arange(self.n_machines + 1))
+
+    @property
+    def n_jobs(self):
+        return len(self.job_index)
+
+    @property
+    def n_machines(self):
+        return len(self.machine_id)
+
+    @property
+    def n_pairs(self):
+        return len(self.pair_job)
+
+    def get_job_pairs(self, j: int):
+        return np.arange(self.job_ptr[j], self.job_ptr[j + 1])
+
+    def get_machine_pairs(self, m: int):
+        return self.machine_pairs[self.machine_ptr[m]:self.machine_ptr[m + 1]]
+
+    @classmethod
+    def build(
+        cls,
+        pending_job: DataFrame,
+        machine_ids: List[int],
+        setup_time: List[int],
+        duration_calculator: JobDurationCalculator,
+        job_index: np.ndarray = None
+    ):
+        """
+            Parameters:
+                job_index (ndarray) (optional): Index labels of the jobs in the pending job
+                    table of the plan, the index of pending_job by default
+        """
+        if job_index is None:
+            job_index = pending_job.index.to_numpy(dtype=np.int64)
+
+        mat_id = pending_job['mat_id'].to_numpy(dtype=np.int64)
+        volume = pending_job['res_draft_volume'].to_numpy(dtype=float)
+        _, mat_index = np.unique(mat_id, return_inverse=True)
+        due_time_unit = np.nan_to_num(
+            pending_job['due_time_unit'].to_numpy(dtype=float), nan=0)
+
+        rate = duration_calculator.calculate_rate_matrix(
+            machine_ids=machine_ids,
+            mat_ids=mat_id
+        )
+        duration = duration_calculator.calculate_duration_matrix(
+            machine_ids=machine_ids,
+            mat_ids=mat_id,
+            pending_volumes=volume
+        )
+
+        return cls(
+            job_index=np.asarray(job_index, dtype=np.int64),
+            so_id=pending_job['so_id'].to_numpy(dtype=np.int64),
+            mat_id=mat_id,
+            mat_index=mat_index.astype(np.int32),
+            volume=volume,
+            due_time_unit=due_time_unit.astype(np.int32),
+            machine_id=np.asarray(machine_ids, dtype=np.int32),
+            setup_time=np.asarray(setup_time, dtype=np.int32),
+            duration=duration,
+            rate=rate
+        )
+
+    def coarsen(self, factor: int):
+        """
+            Return the same instance on a time grid factor times coarser.
+
+            Durations, adjustment times and due dates are rounded up, so a
+            coarse schedule multiplied by factor is still feasible on the
+            original grid.
+        """
+        def ceil_div(values):
+            return -(-values // factor)
+
+        return ProblemInstance(
+            job_index=self.job_index,
+            so_id=self.so_id,
+            mat_id=self.mat_id,
+            mat_index=self.mat_index,
+            volume=self.volume,
+            due_time_unit=ceil_div(self.due_time_unit),
+            machine_id=self.machine_id,
+            setup_time=ceil_div(self.setup_time),
+            duration=ceil_div(self.duration),
+            rate=self.rate * factor
+        )
+
+    def save(self, file):
+        np.savez_compressed(file, **{name: getattr(self, name) for name in self.ARRAYS})
+
+    @classmethod
+    def load(cls, file):
+        with np.load(file) as data:
+            return cls(**{name: data[name] for name in cls.ARRAYS})
@@ -1,92 +1,178 @@
 import pandas as pd
 import numpy as np
 from mariadb import Connection
-from typing import Dict
-from datetime import timedelta
+from typing import Callable, List
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+import os
+import json
 import traceback
 
-from const import MACHINE_GROUP, N_DATE_BEFORE_DEADLINE, TIME_SCALE
-from const.working_hour import working_hour_interval, overtime_hour_interval
-from libs.settings import settings
+from const import MACHINE_GROUP, N_DATE_BEFORE_DEADLINE, TIME_SCALE, LOCAL_SEARCH_ENGINE, MIN_REMAINING_RATIO, \
+    MACHINE_GROUPING_AUTO
+from const.exclusion_reason import NON_POSITIVE_REMAINING, BELOW_MIN_REMAINING_RATIO, NO_COMPATIBLE_MACHINE, GROUP_SOLVE_FAILED
+from libs.settings import settings, PlanningContext
 from libs.utils import create_time_for_comparison
 from libs.loggers import logging
+from libs.profiler import Profiler
 from services.production_planning.job_duration_calculator import JobDurationCalculator
 from services.production_planning.planner import Planner
+from services.production_planning.problem_instance import ProblemInstance
+from services.production_planning.local_search_planner import LocalSearchPlanner
+from services.production_planning.model_exporter import ModelExporter
+from services.production_planning.solution_cache import SolutionCache
+from services.production_planning.solve_history import SolveHistory
+from services.production_planning.solver_pool import get_solver_pool
+from services.production_planning.plan_publisher import PlanPublisher
+from services.production_planning.presolve import PresolveAnalysis
+from services.production_planning.decomposition import MachineGroupDecomposition
 from services.production_planning.repositories import ProductionPlanningRepository
 from services.production_planning.scheduler import Scheduler
+from services.production_planning.schedule_evaluator import ScheduleEvaluator
+from services.production_planning.job_queue import create_job_queue
+from services.production_planning.distributed_planning import RemotePlanner
 
 
 logger = logging.getLogger('production_planning')
 
 class ProductionPlanning:
-    def __init__(self, conn: Connection):
+    def __init__(self, conn: Connection, connection_factory: Callable[[], Connection] = None, context: PlanningContext = None):
+        """
+            Parameters:
+                conn (Connection): database connection
+                connection_factory (Callable) (optional): creates more connections for concurrent fetching
+                context (PlanningContext) (optional): parameters of the run, from the settings by default
+        """
+        self.context = context if context is not None else PlanningContext.from_settings()
         self.repository = ProductionPlanningRepository(conn=conn)
-        self.non_processed_job = []
+        self.connection_factory = connection_factory
+        self.excluded_job = pd.DataFrame(columns=['so_id', 'mat_id', 'reason'])
         self.objective_value = 0
-        if settings.get_setting('ot'):
-            self.working_hour_interval = working_hour_interval + overtime_hour_interval
+        self.group_reports = []
+        self.profiler = Profiler(enabled=settings.get_setting('profile'))
+        self.machine_groups = MACHINE_GROUP
+        self.scope_machine_ids = None
+        if settings.get_setting('model_export_dir'):
+            self.model_exporter = ModelExporter(export_dir=os.path.join(
+                settings.get_setting('model_export_dir'),
+                datetime.now().strftime('%Y%m%d_%H%M%S')))
         else:
-            self.working_hour_interval = working_hour_interval
+            self.model_exporter = None
+        if settings.get_setting('solution_cache_dir'):
+            self.solution_cache = SolutionCache(
+                cache_dir=settings.get_setting('solution_cache_dir'))
+        else:
+            self.solution_cache = None
+        if settings.get_setting('history_dir'):
+            self.solve_history = SolveHistory(
+                history_dir=settings.get_setting('history_dir'))
+        else:
+            self.solve_history = None
+        if settings.get_setting('job_queue'):
+            self.job_queue = create_job_queue(settings.get_setting('job_queue'))
+        else:
+            self.job_queue = None
+        if settings.get_setting('solver_pool_size'):
+            self.solver_pool = get_solver_pool(
+                size=settings.get_setting('solver_pool_size'))
+        else:
+            self.solver_pool = None
+        self.working_hour_interval = self.context.working_hour_interval
+        self.schedule_evaluator = ScheduleEvaluator(self.context)
 
     def __retreive_master_data(self):
-        machine_master = pd.DataFrame(
-            self.repository.machine.get_machine_master())
-        machine_material = pd.DataFrame(
-            self.repository.machine_material.get_machine_material())
-        material_master = pd.DataFrame(
-            self.repository.materials.get_material_material())
+        machine_master = self.repository.machine.get_machine_master()
+        machine_material = self.repository.machine_material.get_machine_material()
+        material_master = self.repository.materials.get_material_material()
 
         return machine_master, machine_material, material_master
 
-    def __filter_pending_job(self, pending_job, machine_material):
-        self.non_processed_job.extend(
-            pending_job['so_id'].tolist()
+    def __preprocess_pending_job(self, pending_job: pd.DataFrame, machine_material: pd.DataFrame):
+        """
+            Split pending jobs into the plannable jobs and the excluded jobs.
+
+                Returns:
+                    pending_job (DataFrame): jobs which can be planned
+                    excluded_job (DataFrame): so_id, mat_id and reason of every excluded job
+        """
+        remaining_volume = pending_job['res_draft_volume'].to_numpy(dtype=float)
+        sale_volume = pending_job['sale_volume'].to_numpy(dtype=float)
+        remaining_ratio = np.divide(
+            remaining_volume, sale_volume,
+            out=np.full(len(pending_job), np.inf),
+            where=sale_volume != 0
+        )
+        is_compatible = np.isin(
+            pending_job['mat_id'].to_numpy(),
+            machine_material['mat_id'].unique()
         )
-        # Filter negative res_draft_volume value
-        pending_job = pending_job[pending_job['res_draft_volume'] > 0]
-        pending_job = pending_job.reset_index(drop=True)
 
-        # Filter too small volume
-        pending_job = pending_job[(
-            pending_job['res_draft_volume']/pending_job['sale_volume']) > 0.03]
-        pending_job = pending_job.reset_index(drop=True)
+        reason = np.select(
+            [
+                remaining_volume <= 0,
+                remaining_ratio <= MIN_REMAINING_RATIO,
+                ~is_compatible
+            ],
+            [
+                NON_POSITIVE_REMAINING,
+                BELOW_MIN_REMAINING_RATIO,
+                NO_COMPATIBLE_MACHINE
+            ],
+            default=''
+        )
+        is_plannable = reason == ''
 
-        # Filter materials that do not be included in machine_material data
-        pending_job = pending_job[pending_job['mat_id'].isin(
-            machine_material['mat_id'].tolist())]
-        pending_job = pending_job.reset_index(drop=True)
+        excluded_job = pending_job.loc[~is_plannable, ['so_id', 'mat_id']]
+        excluded_job = excluded_job.assign(reason=reason[~is_plannable])
 
-        for so_id in pending_job['so_id'].tolist():
-            if so_id in self.non_processed_job:
-                self.non_processed_job.remove(so_id)
+        return pending_job[is_plannable].reset_index(drop=True), excluded_job.reset_index(drop=True)
 
-        return pending_job
+    def __exclude_job(self, job: pd.DataFrame, reason: str):
+        self.excluded_job = pd.concat(
+            [self.excluded_job, job[['so_id', 'mat_id']].assign(reason=reason)],
+            sort=False, axis=0, ignore_index=True)
 
-    def __create_setup_time_dict(self, machines_dict: Dict[int, int], machine_master: pd.DataFrame):
-        relevant_machine_id_list = machines_dict.values()
-        select_machine_df = machine_master[machine_master['machine_id'].isin(
-            relevant_machine_id_list)]
-        select_machine_df = select_machine_df.reset_index(drop=True)
+    def __report_excluded_job(self):
+        for reason, excluded_job in self.excluded_job.groupby('reason'):
+            logger.info("Excluded jobs ({}): {} lines, so_id {}".format(
+                reason,
+                len(excluded_job),
+                ', '.join([str(x) for x in np.sort(excluded_job['so_id'].unique())])))
 
-        # Change time scale from 15 min to 1 unit using TIME_SCALE variable
-        select_machine_df['machine_change_time'] = np.ceil(
-            select_machine_df['machine_change_time']/TIME_SCALE)
-        select_machine_df['machine_change_time'] = select_machine_df['machine_change_time'].astype(
-            int)
+        logger.info("The so_id that are not processed in this planning are {}".format(
+            ', '.join([str(x) for x in np.sort(self.excluded_job['so_id'].unique())])))
 
-        return dict(zip(machines_dict.keys(), select_machine_df['machine_change_time'].tolist()))
+    def __write_run_report(self):
+        report_file = settings.get_setting('report_file')
+        if not report_file:
+            return
 
-    def __insert_production_plan(self, schedule_df: pd.DataFrame):
-        schedule_values = schedule_df.to_dict('records')
+        report = {
+            "start_working_hour": self.context.start_working_hour,
+            "objective_value": self.objective_value,
+            "groups": self.group_reports,
+            "profile": self.profiler.get_report(),
+            "excluded_job": self.excluded_job.groupby('reason').size().to_dict()
+        }
 
-        def insert_plan():
-            self.repository.pd_plan.delete_plan()
-            self.repository.pd_plan.insert_plan(
-                values=schedule_values
-            )
+        with open(report_file, 'w') as jsonfile:
+            json.dump(report, jsonfile, indent=4, default=str)
+
+        logger.info("Write run report to {}".format(report_file))
+
+    def __create_setup_time(self, machine_ids: List[int], machine_master: pd.DataFrame):
+        machine_change_time = machine_master.set_index('machine_id').loc[
+            machine_ids, 'machine_change_time'].to_numpy(dtype=float)
 
-        self.repository.run_in_transaction(
-            task=insert_plan
+        # Change time scale from 15 min to 1 unit using TIME_SCALE variable
+        return np.ceil(machine_change_time/TIME_SCALE).astype(int)
+
+    def __create_plan_publisher(self):
+        return PlanPublisher(
+            repository=self.repository,
+            mode=settings.get_setting('publish_mode'),
+            retention=settings.get_setting('plan_version_retention'),
+            machine_ids=self.scope_machine_ids
         )
 
     def __create_due_date_time_unit(self, pending_job):
@@ -104,139 +190,380 @@ class ProductionPlanning:
             time_unit_per_day = time_unit_per_day + time_unit
 
         pending_job['due_date'] = (
-            pending_job['deadline_date'] - settings.get_start_working_date(date_type="datetime") + timedelta(days=1)).dt.days
+            pending_job['deadline_date'] - self.context.start_working_hour + timedelta(days=1)).dt.days
         pending_job['due_time_unit'] = pending_job['due_date'].apply(
             lambda x: x * time_unit_per_day if x > 0 else None)
 
         return pending_job
 
-    def generate_production_plan(self):
-        machine_master, machine_material, material_master = self.__retreive_master_data()
-
-        pending_job = pd.DataFrame(self.repository.so_item.get_pending_job())
-        logger.info("Number of total jobs: {}.".format(len(pending_job)))
-        pending_job = self.__filter_pending_job(pending_job, machine_material)
-        logger.info(
-            "Number of total jobs after filtering: {}.".format(len(pending_job)))
-
-        duration_calculator = JobDurationCalculator(
-            machine_master=machine_master,
-            machine_material=machine_material,
-            material_master=material_master
-        )
-
-        all_schedule_df = pd.DataFrame()
-
-        logger.info('------------------------------------------------')
-
-        for machines_type_list in MACHINE_GROUP:
-            logger.info("Select machine type: {}.".format(
-                ', '.join([str(x) for x in machines_type_list])))
+    def __create_machine_groups(self, pending_job: pd.DataFrame, machine_master: pd.DataFrame, machine_material: pd.DataFrame):
+        """
+            Machine groups solved one by one. With automatic grouping these are
+            the independent groups of MachineGroupDecomposition within
+            self.machine_groups, otherwise self.machine_groups as they are.
+        """
+        if settings.get_setting('machine_grouping') == MACHINE_GROUPING_AUTO:
+            machine_groups = MachineGroupDecomposition(
+                pending_job=pending_job,
+                machine_master=machine_master,
+                machine_material=machine_material,
+                machine_types=[x for machines_type_list in MACHINE_GROUP for x in machines_type_list]
+            ).find_groups()
+
+            if self.scope_machine_ids is not None:
+                # A changed group has to be replanned with every machine connected to it
+                machine_groups = [
+                    machine_group for machine_group in machine_groups
+                    if len(set(machine_group['machine_ids']).intersection(self.scope_machine_ids)) > 0
+                ]
+                self.scope_machine_ids = sorted(
+                    x for machine_group in machine_groups for x in machine_group['machine_ids'])
+
+            return machine_groups
+
+        machine_groups = []
+        for machines_type_list in self.machine_groups:
             relavant_machine_list = machine_master[machine_master['machine_type_id'].isin(
                 machines_type_list)]['machine_id'].tolist()
             relevant_mat_id = machine_material[machine_material['machine_id'].isin(
                 relavant_machine_list)]['mat_id'].tolist()
 
-            selected_pending_job = pending_job[pending_job['mat_id'].isin(
-                relevant_mat_id)]
-            selected_pending_job = selected_pending_job.reset_index(drop=True)
+            machine_groups.append({
+                "name": 'machine_type_{}'.format('_'.join([str(x) for x in machines_type_list])),
+                "machines_type_list": machines_type_list,
+                "machine_ids": relavant_machine_list,
+                "mat_ids": relevant_mat_id
+            })
+
+        return machine_groups
+
+    def __prepare_machine_group(self, machine_group: dict, pending_job: pd.DataFrame):
+        logger.info("Select machine type: {}.".format(
+            ', '.join([str(x) for x in machine_group['machines_type_list']])))
+
+        selected_pending_job = pending_job[pending_job['mat_id'].isin(
+            machine_group['mat_ids'])]
+        # Jobs are numbered from 0 in every group, job_index keeps their label in the whole plan
+        job_index = selected_pending_job.index.to_numpy(dtype=np.int64)
+        selected_pending_job = selected_pending_job.reset_index(drop=True)
+        if len(selected_pending_job) > 0:
             selected_pending_job = self.__create_due_date_time_unit(
                 pending_job=selected_pending_job)
 
-            n_manchine = len(relavant_machine_list)
-            n_jobs = len(selected_pending_job)
+        logger.info("Number of machines: {}.".format(len(machine_group['machine_ids'])))
+        logger.info("Number of jobs: {}.".format(len(selected_pending_job)))
+
+        return dict(machine_group, pending_job=selected_pending_job, job_index=job_index)
+
+    def __plan_machine_group(self, machine_group: dict, machine_master: pd.DataFrame, duration_calculator: JobDurationCalculator):
+        """
+            Solve and schedule one machine group.
+
+                Returns:
+                    schedule_df (DataFrame): schedule of the group, None if the solver found no solution
+                    objective_value (float): objective value of the group
+        """
+        selected_pending_job = machine_group['pending_job']
+        profiler = Profiler(enabled=settings.get_setting('profile'))
+
+        with profiler.phase('build_instance'):
+            instance = ProblemInstance.build(
+                pending_job=selected_pending_job,
+                machine_ids=machine_group['machine_ids'],
+                setup_time=self.__create_setup_time(
+                    machine_ids=machine_group['machine_ids'],
+                    machine_master=machine_master
+                ),
+                duration_calculator=duration_calculator,
+                job_index=machine_group['job_index']
+            )
 
-            logger.info("Number of machines: {}.".format(n_manchine))
-            logger.info("Number of jobs: {}.".format(n_jobs))
+        presolve = PresolveAnalysis(instance, self.context)
+        presolve_report = presolve.report(machine_group['name'])
 
-            jobs_dict: Dict[int, int] = dict(
-                zip(range(0, n_jobs), selected_pending_job.index))
-            machines_dict: Dict[int, int] = dict(
-                zip(range(0, n_manchine), relavant_machine_list))
-            due_date_dict: Dict[int, int] = dict(
-                zip(range(0, n_jobs), selected_pending_job['due_time_unit'])
+        if settings.get_setting('engine') == LOCAL_SEARCH_ENGINE:
+            planner = LocalSearchPlanner(
+                instance=instance,
+                presolve=presolve,
+                context=self.context
             )
-
-            setup_time_dict = self.__create_setup_time_dict(
-                machines_dict=machines_dict,
-                machine_master=machine_master
+        elif self.job_queue is not None:
+            planner = RemotePlanner(
+                instance=instance,
+                job_queue=self.job_queue,
+                name=machine_group['name'],
+                presolve=presolve,
+                context=self.context,
+                planner_options={
+                    "coarse_time_scale": settings.get_setting('coarse_time_scale'),
+                    "portfolio_size": settings.get_setting('portfolio_size'),
+                    "lns": settings.get_setting('lns'),
+                    "formulation": settings.get_setting('formulation'),
+                    "search_phases": settings.get_setting('search_phases'),
+                    "due_date_hint": settings.get_setting('due_date_hint')
+                }
             )
-
+        else:
             planner = Planner(
-                jobs_dict=jobs_dict,
-                machines_dict=machines_dict,
-                pending_task=selected_pending_job,
-                duration_calculator=duration_calculator,
-                due_date_dict=due_date_dict,
-                setup_time_dict=setup_time_dict
+                instance=instance,
+                name=machine_group['name'],
+                model_exporter=self.model_exporter,
+                solution_cache=self.solution_cache,
+                solver_pool=self.solver_pool,
+                coarse_time_scale=settings.get_setting('coarse_time_scale'),
+                presolve=presolve,
+                profiler=profiler,
+                portfolio_size=settings.get_setting('portfolio_size'),
+                lns=settings.get_setting('lns'),
+                context=self.context,
+                solve_history=self.solve_history,
+                auto_time_limit=settings.get_setting('auto_time_limit'),
+                formulation=settings.get_setting('formulation'),
+                search_phases=settings.get_setting('search_phases'),
+                due_date_hint=settings.get_setting('due_date_hint')
             )
 
+        try:
+            planner.generate()
+        except Exception as e:
+            logger.debug(e)
+            logger.debug(traceback.format_exc())
+            logger.error('Plan for machine type: {} failed.'.format(
+                [str(x) for x in machine_group['machines_type_list']]))
+
+            raise e
+
+        self.group_reports.append({
+            "name": machine_group['name'],
+            "n_jobs": instance.n_jobs,
+            "n_machines": instance.n_machines,
+            "engine": settings.get_setting('engine'),
+            "objective_value": planner.get_objective_value(),
+            "lower_bound": planner.get_lower_bound(),
+            "gap": planner.get_gap(),
+            "presolve": presolve_report,
+            "profile": profiler.get_report()
+        })
+
+        if not planner.get_solution_status():
+            return None, planner.get_objective_value()
+
+        try:
+            with profiler.phase('schedule'):
+                scheduler = Scheduler(
+                    instance=instance,
+                    solutions_df=planner.get_solutions_df(),
+                    work_date=self.context.start_working_hour,
+                    context=self.context
+                )
+
+                schdule_df = scheduler.main(
+                    selected_pending_job=selected_pending_job
+                )
+
+            self.schedule_evaluator.add_group(instance, planner.get_solutions_df())
+        except Exception as e:
+            logger.debug(e)
+            logger.debug(traceback.format_exc())
+            logger.error('Create schedule for machine type: {} failed.'.format(
+                [str(x) for x in machine_group['machines_type_list']]))
+
+            raise e
+
+        return schdule_df, planner.get_objective_value()
+
+    def __generate_serial(self, machine_groups: List[dict], pending_job: pd.DataFrame, machine_master: pd.DataFrame, duration_calculator: JobDurationCalculator):
+        all_schedule_df = pd.DataFrame()
+        n_groups_with_jobs = 0
+
+        for machine_group in machine_groups:
+            machine_group = self.__prepare_machine_group(machine_group, pending_job)
+            if len(machine_group['pending_job']) == 0:
+                continue
+            n_groups_with_jobs = n_groups_with_jobs + 1
+
             try:
-                solution = planner.generate()
+                schdule_df, objective_value = self.__plan_machine_group(
+                    machine_group, machine_master, duration_calculator)
+            except Exception:
+                self.__exclude_job(machine_group['pending_job'], GROUP_SOLVE_FAILED)
 
-                self.objective_value = self.objective_value + solution.get_objective_value()
+                continue
+
+            self.objective_value = self.objective_value + objective_value
 
-                processing_itv_vars = planner.get_processing_itv_vars()
+            if schdule_df is not None:
+                all_schedule_df = pd.concat(
+                    [all_schedule_df, schdule_df], sort=False, axis=0, ignore_index=True)
 
+            logger.info('------------------------------------------------')
+
+        # Without pending jobs the empty plan is published, it clears the plan of the machines
+        if len(all_schedule_df) > 0 or n_groups_with_jobs == 0:
+            plan_publisher = None
+            try:
+                logger.info("Scheduling succeeded.")
+                logger.info("Insert schedule to the database ...")
+                plan_publisher = self.__create_plan_publisher()
+                if len(all_schedule_df) > 0:
+                    plan_publisher.stage(all_schedule_df)
+                plan_publisher.publish()
+                logger.info("Success.")
             except Exception as e:
                 logger.debug(e)
                 logger.debug(traceback.format_exc())
-                logger.error('Plan for machine type: {} failed.'.format(
-                    [str(x) for x in machines_type_list]))
-                self.non_processed_job.extend(
-                    selected_pending_job['so_id'].tolist())
+                logger.error("Failed.")
+                if plan_publisher is not None:
+                    plan_publisher.discard()
 
-                continue
+                raise Exception("Insert schedule to the database failed.")
+        else:
+            logger.error("All planning failed.")
+
+            raise Exception("All planning failed.")
+
+    def __generate_pipelined(self, machine_groups: List[dict], pending_job: pd.DataFrame, machine_master: pd.DataFrame, duration_calculator: JobDurationCalculator):
+        """
+            Solve the machine groups concurrently and stage every finished
+            schedule while the other groups are still solving. The staged plan
+            is published once at the end.
+        """
+        plan_publisher = self.__create_plan_publisher()
+
+        # With a job queue the threads only wait for the workers, put every group on the queue at once
+        max_workers = len(machine_groups) if self.job_queue is not None else settings.get_setting('pipeline_workers')
+        # The threads of the executor do not inherit the settings override of a site
+        plan_machine_group = settings.bind(self.__plan_machine_group)
+        with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+            futures = {}
+            for machine_group in machine_groups:
+                machine_group = self.__prepare_machine_group(machine_group, pending_job)
+                if len(machine_group['pending_job']) == 0:
+                    continue
+                future = executor.submit(
+                    plan_machine_group, machine_group, machine_master, duration_calculator)
+                futures[future] = machine_group
+
+            for future in as_completed(futures):
+                machine_group = futures[future]
 
-            if planner.get_solution_status():
                 try:
-                    scheduler = Scheduler(
-                        solution=solution,
-                        jobs_dict=jobs_dict,
-                        machines_dict=machines_dict,
-                        processing_itv_vars=processing_itv_vars,
-                        duration_calculator=duration_calculator,
-                        work_date=settings.get_start_working_date(
-                            date_type="datetime")
-                    )
-
-                    schdule_df = scheduler.main(
-                        selected_pending_job=selected_pending_job
-                    )
-
-                    all_schedule_df = pd.concat(
-                        [all_schedule_df, schdule_df], sort=False, axis=0, ignore_index=True)
-
-                except Exception as e:
-                    logger.debug(e)
-                    logger.debug(traceback.format_exc())
-                    logger.error('Create schedule for machine type: {} failed.'.format(
-                        [str(x) for x in machines_type_list]))
-                    self.non_processed_job.extend(
-                        selected_pending_job['so_id'].tolist())
+                    schdule_df, objective_value = future.result()
+                except Exception:
+                    self.__exclude_job(machine_group['pending_job'], GROUP_SOLVE_FAILED)
 
                     continue
-            
-            logger.info('------------------------------------------------')
 
-        if len(all_schedule_df) > 0:
+                self.objective_value = self.objective_value + objective_value
+
+                if schdule_df is not None and len(schdule_df) > 0:
+                    logger.info("Stage schedule of machine type: {}.".format(
+                        ', '.join([str(x) for x in machine_group['machines_type_list']])))
+                    plan_publisher.stage(schdule_df)
+
+        # Without pending jobs the empty plan is published, it clears the plan of the machines
+        if plan_publisher.n_staged_rows > 0 or len(futures) == 0:
             try:
                 logger.info("Scheduling succeeded.")
-                logger.info("Insert schedule to the database ...")
-                self.__insert_production_plan(
-                    schedule_df=all_schedule_df
-                )
+                logger.info("Publish staged schedule into the database ...")
+                plan_publisher.publish()
                 logger.info("Success.")
-                logger.info("The overall objective value is {}".format(self.objective_value))
-                logger.info("The so_id that are not processed in this planning are {}".format(
-                    ', '.join([str(x) for x in sorted(self.non_processed_job)])))
             except Exception as e:
                 logger.debug(e)
                 logger.debug(traceback.format_exc())
                 logger.error("Failed.")
+                plan_publisher.discard()
 
                 raise Exception("Insert schedule to the database failed.")
         else:
             logger.error("All planning failed.")
+            plan_publisher.discard()
 
             raise Exception("All planning failed.")
+
+    def __fetch_with_new_connection(self, fetch_task):
+        conn = self.connection_factory()
+        try:
+            return fetch_task(ProductionPlanningRepository(conn=conn))
+        finally:
+            conn.close()
+
+    def __retreive_data_concurrently(self):
+        fetch_tasks = [
+            lambda repository: repository.machine.get_machine_master(),
+            lambda repository: repository.machine_material.get_machine_material(),
+            lambda repository: repository.materials.get_material_material(),
+            lambda repository: repository.so_item.get_pending_job()
+        ]
+
+        with ThreadPoolExecutor(max_workers=len(fetch_tasks)) as executor:
+            futures = [executor.submit(settings.bind(self.__fetch_with_new_connection), task) for task in fetch_tasks]
+
+            return [future.result() for future in futures]
+
+    def __find_scope(self, machine_master: pd.DataFrame, machine_material: pd.DataFrame):
+        """
+            Machines and materials of the machine groups being planned.
+        """
+        machine_types = [x for machines_type_list in self.machine_groups for x in machines_type_list]
+        machine_ids = machine_master.loc[
+            machine_master['machine_type_id'].isin(machine_types), 'machine_id'].unique()
+        mat_ids = machine_material.loc[
+            machine_material['machine_id'].isin(machine_ids), 'mat_id'].unique()
+
+        return [int(x) for x in machine_ids], [int(x) for x in mat_ids]
+
+    def generate_production_plan(self, machine_groups: List[List[int]] = None):
+        """
+            Plan the pending jobs and publish the plan.
+
+                Parameters:
+                    machine_groups (List[List[int]]) (optional): Plan only these machine groups of
+                        MACHINE_GROUP and keep the plan of the other machines, all groups by default
+        """
+        with self.profiler.phase('fetch'):
+            if machine_groups is not None:
+                self.machine_groups = machine_groups
+                machine_master, machine_material, material_master = self.__retreive_master_data()
+                self.scope_machine_ids, mat_ids = self.__find_scope(machine_master, machine_material)
+                if settings.get_setting('machine_grouping') == MACHINE_GROUPING_AUTO:
+                    # The connected groups can reach beyond the scope, see __create_machine_groups
+                    mat_ids = None
+                pending_job = self.repository.so_item.get_pending_job(mat_ids=mat_ids)
+            elif settings.get_setting('pipeline') and self.connection_factory is not None:
+                machine_master, machine_material, material_master, pending_job = self.__retreive_data_concurrently()
+            else:
+                machine_master, machine_material, material_master = self.__retreive_master_data()
+                pending_job = self.repository.so_item.get_pending_job()
+
+        logger.info("Number of total jobs: {}.".format(len(pending_job)))
+        with self.profiler.phase('preprocess'):
+            pending_job, excluded_job = self.__preprocess_pending_job(
+                pending_job, machine_material)
+        self.excluded_job = excluded_job
+        logger.info(
+            "Number of total jobs after filtering: {}.".format(len(pending_job)))
+
+        duration_calculator = JobDurationCalculator(
+            machine_master=machine_master,
+            machine_material=machine_material,
+            material_master=material_master
+        )
+
+        machine_groups = self.__create_machine_groups(
+            pending_job, machine_master, machine_material)
+
+        logger.info('------------------------------------------------')
+
+        with self.profiler.phase('plan_and_publish'):
+            if settings.get_setting('pipeline') or self.job_queue is not None:
+                self.__generate_pipelined(
+                    machine_groups, pending_job, machine_master, duration_calculator)
+            else:
+                self.__generate_serial(
+                    machine_groups, pending_job, machine_master, duration_calculator)
+
+        logger.info("The overall objective value is {}".format(self.objective_value))
+        self.__report_excluded_job()
+        self.profiler.log_summary()
+        self.__write_run_report()
@@ -6,6 +6,7 @@ from services.production_planning.repositories.machine_material import MachineMa
 from services.production_planning.repositories.materials import Materials
 from services.production_planning.repositories.pd_plan import PdPlan
 from services.production_planning.repositories.so_item import SoItem
+from services.production_planning.repositories.change_log import ChangeLog
 
 
 class ProductionPlanningRepository(Repository):
@@ -17,3 +18,4 @@ class ProductionPlanningRepository(Repository):
         self.materials = Materials(conn=conn)
         self.so_item = SoItem(conn=conn)
         self.pd_plan = PdPlan(conn=conn)
+        self.change_log = ChangeLog(conn=conn)
@@ -0,0 +1,55 @@
+from libs.db_manager import CustomRepository
+
+
+class ChangeLog(CustomRepository):
+    def get_last_change_id(self):
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+                SELECT COALESCE(MAX(change_id), 0)
+                FROM pd_change_log
+            """
+        )
+
+        return cur.fetchone()[0]
+
+    def get_changes(self, after_change_id: int):
+        """
+            Get the changes logged after a change.
+
+                Parameters:
+                    after_change_id (int): last change already processed
+        """
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+                SELECT change_id, table_name, so_id, mat_id, changed_at
+                FROM pd_change_log
+                WHERE change_id > %s
+                ORDER BY change_id
+            """,
+            (after_change_id,)
+        )
+
+        return self.fetch_dataframe(cur)
+
+    def delete_changes(self, up_to_change_id: int, commit=False):
+        """
+            Delete the processed changes.
+
+                Parameters:
+                    up_to_change_id (int): last processed change
+                    commit (boolean) (optional): Commit after execute or not
+        """
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+                DELETE
+                FROM pd_change_log
+                WHERE change_id <= %s
+            """,
+            (up_to_change_id,)
+        )
+
+        if commit:
+            self.conn.commit()
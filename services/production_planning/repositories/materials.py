@@ -11,4 +11,4 @@ class Materials(CustomRepository):
             """
         )
 
-        return self.fetch_list_of_dict(cur)
+        return self.fetch_dataframe(cur)
@@ -2,6 +2,16 @@ from typing import Dict, List, Any
 from libs.db_manager import CustomRepository
 
 
+PD_PLAN_TABLE = 'pd_plan'
+PD_PLAN_STAGING_TABLE_PREFIX = 'pd_plan_staging_'
+PD_PLAN_OLD_TABLE_PREFIX = 'pd_plan_old_'
+PD_PLAN_VERSION_TABLE_PREFIX = 'pd_plan_v'
+# Named lock held by the publisher while it replaces the plan
+PD_PLAN_LOCK = 'pd_plan_publish'
+PD_PLAN_LOCK_TIMEOUT = 600
+PD_PLAN_COLUMNS = ['so_id', 'mat_id', 'res_volume', 'start_timestamp', 'end_timestamp',
+                   'machine_id', 'pd_plan_pub_date', 'batch_volume', 'remaining_volume']
+
 class PdPlan(CustomRepository):
     def delete_plan(self, commit=False):
         """
@@ -21,7 +31,54 @@ class PdPlan(CustomRepository):
         if commit:
             self.conn.commit()
 
-    def insert_plan(self, values: List[Dict[Any, Any]], commit=False):
+    def get_plan(self, table: str = PD_PLAN_TABLE):
+        """
+            Get the production plan in the database.
+
+                Parameters:
+                    table (str) (optional): Source table, pd_plan by default
+        """
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+                SELECT {}
+                FROM {}
+            """.format(', '.join(PD_PLAN_COLUMNS), table)
+        )
+
+        return self.fetch_dataframe(cur)
+
+    def delete_plan_rows(self, values: List[Dict[Any, Any]], commit=False):
+        """
+            Delete plan rows in the database.
+
+                Parameters:
+                    values (List[Dict[Any,Any]]): List of Dictionaries which contain keys as the following
+                        so_id (int): sale order id
+                        mat_id (int): material id
+                        machine_id (int): machine id
+                        start_timestamp (str): start timestamp of plan period
+                        end_timestamp (str): end timestamp of plan period
+                    commit (boolean) (optional): Commit after execute or not
+        """
+        cur = self.conn.cursor()
+        cur.executemany(
+            """
+                DELETE
+                FROM pd_plan
+                WHERE so_id = %(so_id)s
+                    AND mat_id = %(mat_id)s
+                    AND machine_id = %(machine_id)s
+                    AND start_timestamp = %(start_timestamp)s
+                    AND end_timestamp = %(end_timestamp)s
+            """,
+            values
+        )
+
+        if commit:
+            self.conn.commit()
+
+    def insert_plan(self, values: List[Dict[Any, Any]], commit=False, table: str = PD_PLAN_TABLE):
         """
             Insert production plan into the database.
 
@@ -34,16 +91,159 @@ class PdPlan(CustomRepository):
                         end_timestamp (str): end timestamp of plan period
                         machine_id (int): machine id
                     commit (boolean) (optional): Commit after execute or not
+                    table (str) (optional): Target table, pd_plan by default
         """
 
         cur = self.conn.cursor()
         cur.executemany(
             """
-                INSERT INTO pd_plan (so_id, mat_id, res_volume, start_timestamp, end_timestamp, machine_id, pd_plan_pub_date, batch_volume, remaining_volume)
+                INSERT INTO {} (so_id, mat_id, res_volume, start_timestamp, end_timestamp, machine_id, pd_plan_pub_date, batch_volume, remaining_volume)
                 VALUES (%(so_id)s, %(mat_id)s, %(res_volume)s, %(start_timestamp)s, %(end_timestamp)s, %(machine_id)s, NOW(), %(batch_volume)s, %(remaining_volume)s)
-            """,
+            """.format(table),
             values
         )
 
         if commit:
             self.conn.commit()
+
+    def create_staging_table(self, table: str, commit=False):
+        """
+            Create an empty staging table with the same structure as pd_plan.
+            CREATE TABLE ... LIKE copies the columns and indexes, not the
+            foreign keys and triggers, see get_dependent_objects.
+
+                Parameters:
+                    table (str): Name of the staging table
+                    commit (boolean) (optional): Commit after execute or not
+        """
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+                CREATE TABLE {} LIKE {}
+            """.format(table, PD_PLAN_TABLE)
+        )
+
+        if commit:
+            self.conn.commit()
+
+    def copy_plan_rows(self, exclude_machine_ids: List[int], table: str, commit=False):
+        """
+            Copy the current plan of all other machines into a table.
+
+                Parameters:
+                    exclude_machine_ids (List[int]): Machines whose plan is not copied
+                    table (str): Target table
+                    commit (boolean) (optional): Commit after execute or not
+        """
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+                INSERT INTO {} ({})
+                SELECT {}
+                FROM {}
+                WHERE machine_id NOT IN ({})
+            """.format(
+                table,
+                ', '.join(PD_PLAN_COLUMNS),
+                ', '.join(PD_PLAN_COLUMNS),
+                PD_PLAN_TABLE,
+                ', '.join(['%s'] * len(exclude_machine_ids))),
+            tuple(exclude_machine_ids)
+        )
+
+        if commit:
+            self.conn.commit()
+
+    def swap_staging_table(self, staging_table: str, version_table: str = None):
+        """
+            Replace pd_plan with the staging table. RENAME TABLE swaps both
+            tables atomically, so readers see either the old or the new plan.
+
+                Parameters:
+                    staging_table (str): Name of the staging table
+                    version_table (str) (optional): Keep the replaced plan under this name instead of dropping it
+        """
+        old_table = version_table or staging_table.replace(PD_PLAN_STAGING_TABLE_PREFIX, PD_PLAN_OLD_TABLE_PREFIX, 1)
+
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+                DROP TABLE IF EXISTS {}
+            """.format(old_table)
+        )
+        cur.execute(
+            """
+                RENAME TABLE {} TO {}, {} TO {}
+            """.format(PD_PLAN_TABLE, old_table, staging_table, PD_PLAN_TABLE)
+        )
+
+        if version_table is None:
+            cur.execute(
+                """
+                    DROP TABLE {}
+                """.format(old_table)
+            )
+
+    def get_dependent_objects(self):
+        """
+            Get the foreign keys and triggers of pd_plan, and the foreign keys
+            of other tables to pd_plan. A table swap loses all of them.
+        """
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+                SELECT constraint_name
+                FROM information_schema.referential_constraints
+                WHERE constraint_schema = DATABASE()
+                    AND (table_name = %s OR referenced_table_name = %s)
+                UNION ALL
+                SELECT trigger_name
+                FROM information_schema.triggers
+                WHERE trigger_schema = DATABASE()
+                    AND event_object_table = %s
+            """,
+            (PD_PLAN_TABLE, PD_PLAN_TABLE, PD_PLAN_TABLE)
+        )
+
+        return [x[0] for x in cur.fetchall()]
+
+    def lock_plan(self, timeout: int = PD_PLAN_LOCK_TIMEOUT):
+        """
+            Wait for the named lock of the plan, so only one publisher at a
+            time reads and replaces the plan.
+        """
+        cur = self.conn.cursor()
+        cur.execute("SELECT GET_LOCK(%s, %s)", (PD_PLAN_LOCK, timeout))
+
+        if cur.fetchone()[0] != 1:
+            raise Exception('Lock of the plan not acquired in {} seconds'.format(timeout))
+
+    def unlock_plan(self):
+        cur = self.conn.cursor()
+        cur.execute("SELECT RELEASE_LOCK(%s)", (PD_PLAN_LOCK,))
+        cur.fetchall()
+
+    def get_version_tables(self):
+        """
+            Get the names of the kept plan versions, newest first.
+        """
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+                SELECT table_name
+                FROM information_schema.tables
+                WHERE table_schema = DATABASE()
+                    AND table_name LIKE %s
+            """,
+            (PD_PLAN_VERSION_TABLE_PREFIX.replace('_', '\\_') + '%',)
+        )
+
+        return sorted([x[0] for x in cur.fetchall()], reverse=True)
+
+    def drop_table(self, table: str):
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+                DROP TABLE IF EXISTS {}
+            """.format(table)
+        )
@@ -1,8 +1,23 @@
+from typing import List
 from libs.db_manager import CustomRepository
 
 
 class SoItem(CustomRepository):
-    def get_pending_job(self):
+    def get_pending_job(self, mat_ids: List[int] = None):
+        """
+            Get the pending sale order items.
+
+                Parameters:
+                    mat_ids (List[int]) (optional): Only items of these materials, all items by default
+        """
+        mat_filter = ''
+        params = ()
+        if mat_ids is not None:
+            if len(mat_ids) == 0:
+                mat_ids = [None]
+            mat_filter = 'AND so_item.mat_id IN ({})'.format(', '.join(['%s'] * len(mat_ids)))
+            params = tuple(mat_ids)
+
         cur = self.conn.cursor()
         cur.execute(
             """
@@ -51,7 +66,9 @@ class SoItem(CustomRepository):
                     AND so_item.so_id = draft_buffer.so_id
                 )
                 WHERE so_status_id < 9
-            """
+                {}
+            """.format(mat_filter),
+            params
         )
 
-        return self.fetch_list_of_dict(cur)
+        return self.fetch_dataframe(cur)
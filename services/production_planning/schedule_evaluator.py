@@ -0,0 +1,362 @@
+import threading
+from datetime import timedelta
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+
+from const import TIME_SCALE
+from libs.settings import PlanningContext
+from libs.loggers import logging
+from services.production_planning.problem_instance import ProblemInstance
+
+
+logger = logging.getLogger('schedule_evaluator')
+
+# Working days added to the calendar at once
+CALENDAR_EXTEND_DAYS = 30
+
+SCHEDULE_COLUMNS = [
+    'job_index', 'so_id', 'mat_id', 'machine_id', 'volume',
+    'start', 'end', 'start_timestamp', 'end_timestamp'
+]
+
+
+class WorkingCalendar:
+    """
+        Map working time units since the start of the plan to timestamps.
+
+        Like Scheduler, the plan starts at the first working hour of the
+        start date, only the working hours count and the following holidays
+        are skipped. A job which starts at the end of a working hour interval
+        starts at the beginning of the next one.
+    """
+
+    def __init__(self, context: PlanningContext):
+        self.context = context
+        self.__shift_starts = []
+        self.__shift_offsets = np.zeros(0, dtype=np.int64)
+        self.__shift_ends = np.zeros(0, dtype=np.int64)
+        self.__work_date = context.start_working_hour.replace(hour=0, minute=0, second=0, microsecond=0)
+        self.__extend()
+
+    def __extend(self):
+        shift_starts = []
+        shift_minutes = []
+        for _ in range(CALENDAR_EXTEND_DAYS):
+            for start, end in self.context.working_hour_interval:
+                start_hour, start_minute = [int(x) for x in start.split(':')]
+                end_hour, end_minute = [int(x) for x in end.split(':')]
+                shift_starts.append(self.__work_date + timedelta(hours=start_hour, minutes=start_minute))
+                shift_minutes.append((end_hour - start_hour) * 60 + end_minute - start_minute)
+
+            self.__work_date = self.__work_date + timedelta(days=1)
+            while self.context.is_holiday(self.__work_date):
+                self.__work_date = self.__work_date + timedelta(days=1)
+
+        offset = self.__shift_ends[-1] if len(self.__shift_ends) > 0 else 0
+        shift_ends = offset + np.cumsum(shift_minutes)
+
+        self.__shift_starts = self.__shift_starts + shift_starts
+        self.__shift_offsets = np.concatenate([self.__shift_offsets, shift_ends - shift_minutes])
+        self.__shift_ends = np.concatenate([self.__shift_ends, shift_ends])
+
+    def to_timestamps(self, time_units: np.ndarray, is_end: bool = False):
+        minutes = np.asarray(time_units, dtype=np.int64) * TIME_SCALE
+        while len(minutes) > 0 and minutes.max() >= self.__shift_ends[-1]:
+            self.__extend()
+
+        # Ends at the end of a working hour interval stay in it
+        shifts = np.searchsorted(self.__shift_ends, minutes, side='left' if is_end else 'right')
+
+        return [
+            self.__shift_starts[k] + timedelta(minutes=int(minute - self.__shift_offsets[k]))
+            for k, minute in zip(shifts, minutes)
+        ]
+
+
+class ScheduleEvaluator:
+    """
+        Apply manual edits (move, swap, resize) to the solved plan and
+        recompute the objective incrementally.
+
+        The plan of every machine is its job sequence with start and end time
+        units. An edit only reschedules the machines it touches, from the
+        first changed position on: the jobs before keep their times and the
+        following jobs start as early as possible after their predecessor and
+        its adjustment time. Tardiness and adjustment time are counted like in
+        the CP model and kept per machine, so an edit costs time proportional
+        to the length of the affected sequences.
+
+        Jobs are addressed by their index label in the pending job table of
+        the whole plan (ProblemInstance.job_index) and machines by their
+        machine_id. A job can only move to the machines of
+        its own machine group.
+    """
+
+    def __init__(self, context: PlanningContext = None):
+        self.context = context if context is not None else PlanningContext.from_settings()
+        self.calendar = WorkingCalendar(self.context)
+        self.groups = []
+        self.job_lookup: Dict[int, Tuple[int, int]] = {}
+        self.machine_lookup: Dict[int, Tuple[int, int]] = {}
+        self.history = []
+        self.__lock = threading.Lock()
+
+    def add_group(self, instance: ProblemInstance, solutions_df: pd.DataFrame):
+        """
+            Add the solved plan of one machine group.
+
+                Parameters:
+                    instance (ProblemInstance): instance of the machine group
+                    solutions_df (DataFrame): machine_id (position of the machine), job_id, start and end of every job
+        """
+        solutions_df = solutions_df.sort_values(['machine_id', 'start'])
+        job_machine = solutions_df['machine_id'].to_numpy(dtype=np.int64)
+
+        group = {
+            "instance": instance,
+            "volume": instance.volume.copy(),
+            "duration": instance.duration.astype(np.int64),
+            "sequences": [],
+            "tardiness": np.zeros(instance.n_machines, dtype=np.int64),
+            "adjustment_time": np.zeros(instance.n_machines, dtype=np.int64)
+        }
+        for m in range(instance.n_machines):
+            rows = solutions_df[job_machine == m]
+            group['sequences'].append({
+                "jobs": rows['job_id'].to_numpy(dtype=np.int64),
+                "start": rows['start'].to_numpy(dtype=np.int64),
+                "end": rows['end'].to_numpy(dtype=np.int64)
+            })
+
+        with self.__lock:
+            g = len(self.groups)
+            self.groups.append(group)
+            for m in range(instance.n_machines):
+                self.__update_cost(g, m)
+                self.machine_lookup[int(instance.machine_id[m])] = (g, m)
+            for j in solutions_df['job_id'].to_numpy(dtype=np.int64):
+                self.job_lookup[int(instance.job_index[j])] = (g, int(j))
+
+    def __update_cost(self, g: int, m: int):
+        group = self.groups[g]
+        sequence = group['sequences'][m]
+        due = group['instance'].due_time_unit[sequence['jobs']].astype(np.int64)
+
+        group['tardiness'][m] = np.where(due > 0, np.maximum(sequence['end'] - due, 0), 0).sum()
+        group['adjustment_time'][m] = (sequence['start'][1:] - sequence['end'][:-1]).sum()
+
+    def __reschedule(self, g: int, m: int, jobs: np.ndarray, first_position: int):
+        """
+            Replace the sequence of machine m by jobs, keeping the times of
+            the jobs before first_position.
+        """
+        group = self.groups[g]
+        instance = group['instance']
+        sequence = group['sequences'][m]
+
+        first_position = min(first_position, len(jobs))
+        start = np.empty(len(jobs), dtype=np.int64)
+        end = np.empty(len(jobs), dtype=np.int64)
+        start[:first_position] = sequence['start'][:first_position]
+        end[:first_position] = sequence['end'][:first_position]
+
+        suffix = jobs[first_position:]
+        if len(suffix) > 0:
+            mats = instance.mat_index[jobs[max(first_position - 1, 0):]]
+            is_changeover = mats[1:] != mats[:-1]
+            setups = np.zeros(len(suffix), dtype=np.int64)
+            if first_position > 0:
+                setups[:] = is_changeover * int(instance.setup_time[m])
+            else:
+                setups[1:] = is_changeover * int(instance.setup_time[m])
+
+            durations = group['duration'][suffix, m]
+            base = end[first_position - 1] if first_position > 0 else 0
+            end[first_position:] = base + np.cumsum(setups + durations)
+            start[first_position:] = end[first_position:] - durations
+
+        group['sequences'][m] = {"jobs": jobs, "start": start, "end": end}
+        self.__update_cost(g, m)
+
+    def __find_job(self, job_index: int):
+        if job_index not in self.job_lookup:
+            raise Exception('Job {} is not in the plan'.format(job_index))
+
+        g, j = self.job_lookup[job_index]
+        for m, sequence in enumerate(self.groups[g]['sequences']):
+            positions = np.flatnonzero(sequence['jobs'] == j)
+            if len(positions) > 0:
+                return g, j, m, int(positions[0])
+
+        raise Exception('Job {} is not in the plan'.format(job_index))
+
+    def __find_machine(self, machine_id: int, g: int):
+        if machine_id not in self.machine_lookup or self.machine_lookup[machine_id][0] != g:
+            raise Exception('Machine {} is not in the machine group of the job'.format(machine_id))
+
+        return self.machine_lookup[machine_id][1]
+
+    def __save_state(self, g: int, machines: List[int], jobs: List[int] = None):
+        group = self.groups[g]
+        self.history.append({
+            "group": g,
+            "sequences": {m: group['sequences'][m] for m in machines},
+            "volume": {j: group['volume'][j] for j in jobs or []},
+            "duration": {j: group['duration'][j].copy() for j in jobs or []}
+        })
+
+    def __restore_state(self, state: dict):
+        group = self.groups[state['group']]
+        for j, volume in state['volume'].items():
+            group['volume'][j] = volume
+            group['duration'][j] = state['duration'][j]
+        for m, sequence in state['sequences'].items():
+            group['sequences'][m] = sequence
+            self.__update_cost(state['group'], m)
+
+    def move(self, job_index: int, machine_id: int, position: int = None):
+        """
+            Move a job to position (the end by default) of the sequence of a
+            machine, which can be its own machine.
+        """
+        with self.__lock:
+            g, j, m1, p1 = self.__find_job(job_index)
+            m2 = self.__find_machine(machine_id, g)
+            if self.groups[g]['duration'][j, m2] <= 0:
+                raise Exception('Job {} cannot be processed on machine {}'.format(job_index, machine_id))
+
+            self.__save_state(g, sorted({m1, m2}))
+            source = np.delete(self.groups[g]['sequences'][m1]['jobs'], p1)
+            target = source if m1 == m2 else self.groups[g]['sequences'][m2]['jobs']
+            p2 = len(target) if position is None else min(max(int(position), 0), len(target))
+            target = np.insert(target, p2, j)
+
+            if m1 == m2:
+                self.__reschedule(g, m1, target, min(p1, p2))
+            else:
+                self.__reschedule(g, m1, source, p1)
+                self.__reschedule(g, m2, target, p2)
+
+            return self.__create_result(g, sorted({m1, m2}))
+
+    def swap(self, job_index_1: int, job_index_2: int):
+        """
+            Exchange the places of two jobs of the same machine group.
+        """
+        with self.__lock:
+            g1, j1, m1, p1 = self.__find_job(job_index_1)
+            g2, j2, m2, p2 = self.__find_job(job_index_2)
+            if g1 != g2:
+                raise Exception('Jobs {} and {} are in different machine groups'.format(job_index_1, job_index_2))
+            duration = self.groups[g1]['duration']
+            if duration[j1, m2] <= 0 or duration[j2, m1] <= 0:
+                raise Exception('Jobs {} and {} cannot be processed on each other\'s machine'.format(
+                    job_index_1, job_index_2))
+
+            self.__save_state(g1, sorted({m1, m2}))
+            jobs_1 = self.groups[g1]['sequences'][m1]['jobs'].copy()
+            jobs_2 = jobs_1 if m1 == m2 else self.groups[g1]['sequences'][m2]['jobs'].copy()
+            jobs_1[p1] = j2
+            jobs_2[p2] = j1
+
+            if m1 == m2:
+                self.__reschedule(g1, m1, jobs_1, min(p1, p2))
+            else:
+                self.__reschedule(g1, m1, jobs_1, p1)
+                self.__reschedule(g1, m2, jobs_2, p2)
+
+            return self.__create_result(g1, sorted({m1, m2}))
+
+    def resize(self, job_index: int, volume: float):
+        """
+            Change the volume of a job. Its processing time follows from the
+            production rates of the JobDurationCalculator.
+        """
+        with self.__lock:
+            g, j, m, p = self.__find_job(job_index)
+            group = self.groups[g]
+            rate = group['instance'].rate[j]
+            if volume <= 0:
+                raise Exception('Volume of job {} must be positive'.format(job_index))
+
+            self.__save_state(g, [m], [j])
+            group['volume'][j] = volume
+            with np.errstate(divide='ignore', invalid='ignore'):
+                group['duration'][j] = np.where(rate > 0, np.ceil(volume / rate), 0).astype(np.int64)
+            self.__reschedule(g, m, group['sequences'][m]['jobs'], p)
+
+            return self.__create_result(g, [m])
+
+    def undo(self):
+        """
+            Revert the last edit, None if there is nothing to revert.
+        """
+        with self.__lock:
+            if len(self.history) == 0:
+                return None
+
+            state = self.history.pop()
+            self.__restore_state(state)
+
+            return self.__create_result(state['group'], sorted(state['sequences'].keys()))
+
+    def get_objective(self):
+        tardiness = sum(int(x['tardiness'].sum()) for x in self.groups)
+        adjustment_time = sum(int(x['adjustment_time'].sum()) for x in self.groups)
+        tardy_job_objective_value = tardiness * self.context.weight_of_tardy_job
+        adjustment_time_objective_value = adjustment_time * self.context.weight_of_adjustment_time
+
+        return {
+            "objective_value": tardy_job_objective_value + adjustment_time_objective_value,
+            "tardy_job_objective_value": tardy_job_objective_value,
+            "adjustment_time_objective_value": adjustment_time_objective_value
+        }
+
+    def __create_schedule_df(self, g: int, machines: List[int]):
+        group = self.groups[g]
+        instance = group['instance']
+        sequences = [group['sequences'][m] for m in machines]
+        jobs = np.concatenate([x['jobs'] for x in sequences] + [np.zeros(0, dtype=np.int64)])
+        start = np.concatenate([x['start'] for x in sequences] + [np.zeros(0, dtype=np.int64)])
+        end = np.concatenate([x['end'] for x in sequences] + [np.zeros(0, dtype=np.int64)])
+
+        return pd.DataFrame({
+            "job_index": instance.job_index[jobs],
+            "so_id": instance.so_id[jobs],
+            "mat_id": instance.mat_id[jobs],
+            "machine_id": np.repeat(instance.machine_id[machines], [len(x['jobs']) for x in sequences]),
+            "volume": group['volume'][jobs],
+            "start": start,
+            "end": end,
+            "start_timestamp": self.calendar.to_timestamps(start),
+            "end_timestamp": self.calendar.to_timestamps(end, is_end=True)
+        }, columns=SCHEDULE_COLUMNS)
+
+    def __create_result(self, g: int, machines: List[int]):
+        """
+            Objective of the plan after the edit and the new schedule of the
+            machines the edit touched.
+        """
+        return {
+            **self.get_objective(),
+            "machine_ids": [int(self.groups[g]['instance'].machine_id[m]) for m in machines],
+            "schedule_df": self.__create_schedule_df(g, machines)
+        }
+
+    def get_schedule_df(self):
+        """
+            Job level schedule of the whole plan. A job split over several
+            working hour intervals has the start of its first part and the
+            end of its last part.
+        """
+        with self.__lock:
+            schedule_dfs = [
+                self.__create_schedule_df(g, list(range(group['instance'].n_machines)))
+                for g, group in enumerate(self.groups)
+            ]
+
+        if len(schedule_dfs) == 0:
+            return pd.DataFrame(columns=SCHEDULE_COLUMNS)
+
+        return pd.concat(schedule_dfs, ignore_index=True)
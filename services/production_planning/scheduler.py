@@ -1,14 +1,11 @@
-from typing import Dict, List
 from datetime import datetime, timedelta
 import pandas as pd
 import numpy as np
-from docplex.cp.solution import CpoSolveResult, CpoIntervalVar, CpoIntervalVarSolution
 
 from const import TIME_SCALE
-from const.working_hour import working_hour_interval, overtime_hour_interval
 from libs.loggers import logging
-from libs.settings import settings
-from services.production_planning.job_duration_calculator import JobDurationCalculator
+from libs.settings import PlanningContext
+from services.production_planning.problem_instance import ProblemInstance
 
 
 logger = logging.getLogger('scheduler')
@@ -16,45 +13,17 @@ logger = logging.getLogger('scheduler')
 class Scheduler:
     def __init__(
         self,
-        solution: CpoSolveResult,
-        jobs_dict: Dict[int, int],
-        machines_dict: Dict[int, int],
-        processing_itv_vars: List[List[CpoIntervalVar]],
-        duration_calculator: JobDurationCalculator,
-        work_date: datetime
+        instance: ProblemInstance,
+        solutions_df: pd.DataFrame,
+        work_date: datetime,
+        context: PlanningContext = None
     ):
         logger.info('Start scheduling ...')
-        self.msol = solution
-        self.jobs = list(jobs_dict.keys())
-        self.machines = list(machines_dict.keys())
-        self.machines_dict = machines_dict
-        self.processing_itv_vars = processing_itv_vars
+        self.instance = instance
+        self.solutions_df = solutions_df
         self.work_date = work_date
-        self.duration_calculator = duration_calculator
-        if settings.get_setting('ot'):
-            self.working_hour_interval = working_hour_interval + overtime_hour_interval
-        else:
-            self.working_hour_interval = working_hour_interval
-
-    def __create_solution_dataframe(self):
-        solutions = []
-        for m in self.machines:
-            for j in self.jobs:
-                itv: CpoIntervalVarSolution = self.msol.get_var_solution(
-                    self.processing_itv_vars[j][m])
-                if itv:
-                    if itv.is_present():
-                        solutions.append(
-                            {
-                                "machine_id": m,
-                                "job_id": j,
-                                "start": itv.get_start(),
-                                "end": itv.get_end()
-                            }
-                        )
-        solutions_df = pd.DataFrame(solutions)
-
-        return solutions_df
+        self.context = context if context is not None else PlanningContext.from_settings()
+        self.working_hour_interval = self.context.working_hour_interval
 
     def __create_time_for_comparison(self, time: str):
         (hour, min) = time.split(':')
@@ -172,29 +141,19 @@ class Scheduler:
             is_new_work_date_correct = False
             while not is_new_work_date_correct:
                 work_date = work_date + timedelta(days=1)
-                if work_date.strftime('%Y-%m-%d') not in settings.get_setting('holiday'):
+                if not self.context.is_holiday(work_date):
                     is_new_work_date_correct = True
 
         return time_table
     
-    def __calculate_weight(self, data: pd.Series):
-        self.duration_calculator.register(
-            machine_id=data['machine_id'],
-            mat_id=data['mat_id']
-        )
-
-        working_time_unit = int((data['end_timestamp'] - data['start_timestamp']).seconds / 60 / TIME_SCALE)
+    def __calculate_weight(self, df: pd.DataFrame):
+        working_time_unit = ((df['end_timestamp'] - df['start_timestamp']).dt.seconds / 60 / TIME_SCALE).astype(int)
 
-        weight = self.duration_calculator.calculate_weight(
-            time_unit=working_time_unit
-        )
-
-        self.duration_calculator.clear()
-
-        return weight
+        return working_time_unit.to_numpy() * self.instance.rate[
+            df['job_id'].to_numpy(dtype=int), df['machine_id'].to_numpy(dtype=int)]
 
     def main(self, selected_pending_job: pd.DataFrame):
-        solutions_df = self.__create_solution_dataframe()
+        solutions_df = self.solutions_df
 
         selected_pending_job.index.name = 'job_id'
         selected_pending_job = selected_pending_job.reset_index(drop=False)
@@ -221,10 +180,9 @@ class Scheduler:
         machine_timetable_df = machine_timetable_df.reset_index(drop=True)
         selected_pending_job = selected_pending_job.merge(machine_timetable_df[[
                                                           'job_id', 'start_timestamp', 'end_timestamp']], how='left', on='job_id')
-        selected_pending_job['machine_id'] = selected_pending_job['machine_id'].map(self.machines_dict)
-
-        weight_list = selected_pending_job.apply(lambda x: self.__calculate_weight(x), axis=1).tolist()
-        selected_pending_job['batch_volume'] = weight_list
+        selected_pending_job['batch_volume'] = self.__calculate_weight(selected_pending_job)
+        selected_pending_job['machine_id'] = self.instance.machine_id[
+            selected_pending_job['machine_id'].to_numpy(dtype=int)]
 
         selected_pending_job = selected_pending_job[['so_id', 'mat_id', 'res_draft_volume', 'batch_volume', 'start_timestamp', 'end_timestamp', 'machine_id']]
         selected_pending_job = selected_pending_job.rename(columns={'res_draft_volume': 'res_volume'})
@@ -0,0 +1,87 @@
+import os
+import json
+import hashlib
+from typing import Any, Dict
+import pandas as pd
+
+from const import SOLUTION_CACHE_MAX_BYTES
+from libs.loggers import logging
+
+
+logger = logging.getLogger('solution_cache')
+
+
+class SolutionCache:
+    """
+        File cache of solved interval assignments keyed by a fingerprint of the
+        normalized planning inputs. The least recently used entries are removed
+        when the cache grows over max_bytes.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = SOLUTION_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def fingerprint(inputs: Dict[str, Any]):
+        normalized = json.dumps(inputs, sort_keys=True, default=str)
+
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+    def __path(self, key: str):
+        return os.path.join(self.cache_dir, '{}.json'.format(key))
+
+    def get(self, key: str):
+        path = self.__path(key)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, 'r') as jsonfile:
+                entry = json.load(jsonfile)
+        except Exception as e:
+            logger.debug(e)
+            return None
+
+        # Touch the entry so eviction removes the least recently used first
+        os.utime(path)
+
+        return {
+            "objective_value": entry['objective_value'],
+            "solutions_df": pd.DataFrame(entry['solutions'], columns=['machine_id', 'job_id', 'start', 'end'])
+        }
+
+    def put(self, key: str, objective_value: float, solutions_df: pd.DataFrame):
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        entry = {
+            "objective_value": objective_value,
+            "solutions": solutions_df[['machine_id', 'job_id', 'start', 'end']].astype(int).to_dict('records')
+        }
+
+        with open(self.__path(key), 'w') as jsonfile:
+            json.dump(entry, jsonfile)
+
+        self.__evict()
+
+    def __evict(self):
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            if filename.endswith('.json'):
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, filename))
+                except FileNotFoundError:
+                    # Removed by another planner running at the same time
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, filename))
+
+        total_bytes = sum([size for _, size, _ in entries])
+        for _, size, filename in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+
+            try:
+                os.remove(os.path.join(self.cache_dir, filename))
+            except FileNotFoundError:
+                pass
+            total_bytes = total_bytes - size
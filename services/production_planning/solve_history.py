@@ -0,0 +1,148 @@
+import os
+import json
+import threading
+from datetime import datetime
+from typing import List
+import numpy as np
+
+from const import HISTORY_MAX_RECORDS, HISTORY_MIN_RECORDS, HISTORY_NEIGHBORS, HISTORY_NEGLIGIBLE_IMPROVEMENT, \
+    HISTORY_SAFETY_FACTOR
+from libs.loggers import logging
+
+
+logger = logging.getLogger('solve_history')
+
+HISTORY_FILE = 'solve_history.jsonl'
+
+
+class SolveHistory:
+    """
+        Store of the objective value over time of every solved machine group
+        together with the size of its instance, one JSON record per line.
+
+        The history predicts the time limit of a new instance: the time after
+        which the solutions of similar sized instances improved by less than
+        HISTORY_NEGLIGIBLE_IMPROVEMENT, with a safety factor.
+    """
+
+    def __init__(self, history_dir: str, max_records: int = HISTORY_MAX_RECORDS):
+        self.history_dir = history_dir
+        self.max_records = max_records
+        self.__lock = threading.Lock()
+
+    def __path(self):
+        return os.path.join(self.history_dir, HISTORY_FILE)
+
+    def __load(self):
+        if not os.path.exists(self.__path()):
+            return []
+
+        records = []
+        with open(self.__path(), 'r') as jsonfile:
+            for line in jsonfile:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # A line cut off by an interrupted run
+                    continue
+
+        return records[-self.max_records:]
+
+    def add(
+        self,
+        name: str,
+        n_jobs: int,
+        n_machines: int,
+        n_pairs: int,
+        time_limit: float,
+        trajectory: List[List[float]],
+        is_complete: bool
+    ):
+        """
+            Parameters:
+                name (str): machine group name
+                n_jobs, n_machines, n_pairs (int): size of the instance
+                time_limit (float): time limit of the solve in seconds
+                trajectory (List[List[float]]): [seconds, objective value] of every solution found
+                is_complete (bool): the search ended before the time limit, optimal or within the target gap
+        """
+        record = {
+            "run_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "name": name,
+            "n_jobs": int(n_jobs),
+            "n_machines": int(n_machines),
+            "n_pairs": int(n_pairs),
+            "time_limit": float(time_limit),
+            "trajectory": trajectory,
+            "is_complete": bool(is_complete)
+        }
+
+        with self.__lock:
+            os.makedirs(self.history_dir, exist_ok=True)
+            with open(self.__path(), 'a') as jsonfile:
+                jsonfile.write(json.dumps(record) + '\n')
+
+            if self.__count_lines() > 2 * self.max_records:
+                self.__compact()
+
+    def __count_lines(self):
+        with open(self.__path(), 'r') as jsonfile:
+            return sum(1 for _ in jsonfile)
+
+    def __compact(self):
+        records = self.__load()
+        path = self.__path()
+        with open(path + '.tmp', 'w') as jsonfile:
+            for record in records:
+                jsonfile.write(json.dumps(record) + '\n')
+        os.replace(path + '.tmp', path)
+
+    @staticmethod
+    def convergence_time(record: dict):
+        """
+            Seconds until the objective value was within
+            HISTORY_NEGLIGIBLE_IMPROVEMENT of the last one of the record. A
+            solve which still found solutions late in its time limit may have
+            been stopped too early, it counts as converged at the time limit.
+        """
+        seconds = np.array([x[0] for x in record['trajectory']], dtype=float)
+        objective_values = np.array([x[1] for x in record['trajectory']], dtype=float)
+        final_objective_value = objective_values[-1]
+
+        if not record['is_complete'] and seconds[-1] > record['time_limit'] / HISTORY_SAFETY_FACTOR:
+            return record['time_limit']
+
+        is_converged = objective_values - final_objective_value <= \
+            HISTORY_NEGLIGIBLE_IMPROVEMENT * max(abs(final_objective_value), 1)
+
+        return float(seconds[np.argmax(is_converged)])
+
+    def predict_time_limit(self, n_pairs: int, floor: float, ceiling: float):
+        """
+            Time limit of an instance with n_pairs job and machine pairs
+            within [floor, ceiling], None if the history has too few records.
+        """
+        with self.__lock:
+            records = [x for x in self.__load() if len(x['trajectory']) > 0]
+
+        if len(records) < HISTORY_MIN_RECORDS:
+            return None
+
+        # Nearest records by the order of magnitude of their size
+        distance = np.abs(
+            np.log(np.array([x['n_pairs'] for x in records], dtype=float) + 1) - np.log(n_pairs + 1))
+        neighbors = [records[i] for i in np.argsort(distance, kind='stable')[:HISTORY_NEIGHBORS]]
+
+        predictions = []
+        for record in neighbors:
+            # Larger instances converge later, at most twice as late
+            size_ratio = np.clip((n_pairs + 1) / (record['n_pairs'] + 1), 0.5, 2)
+            predictions.append(self.convergence_time(record) * size_ratio)
+
+        time_limit = float(np.clip(max(predictions) * HISTORY_SAFETY_FACTOR, floor, ceiling))
+
+        logger.debug('Predicted time limit {:.1f}s from {} runs of {} to {} pairs.'.format(
+            time_limit, len(neighbors),
+            min([x['n_pairs'] for x in neighbors]), max([x['n_pairs'] for x in neighbors])))
+
+        return time_limit
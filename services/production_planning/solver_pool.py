@@ -0,0 +1,190 @@
+import atexit
+import threading
+from contextlib import contextmanager
+from docplex.cp.model import CpoModel
+from docplex.cp.solver.solver import CpoSolver, STATUS_IDLE
+
+from const import SOLVER_POOL_SIZE
+from libs.utils import get_cpoptimizer_path
+from libs.loggers import logging
+
+
+logger = logging.getLogger('solver_pool')
+
+
+class PooledCpoSolver(CpoSolver):
+    """
+        CpoSolver which borrows its solver agent (the cpoptimizer process) from
+        a SolverPool instead of starting a new process.
+    """
+
+    def __init__(self, model: CpoModel, pool, **kwargs):
+        self.pool = pool
+        super().__init__(model, **kwargs)
+
+    def _get_solver_agent(self):
+        return self.pool.acquire_agent(self)
+
+    def create_agent(self):
+        return super()._get_solver_agent()
+
+
+def is_supported():
+    """
+        True if the installed docplex has the private CpoSolver method which
+        PooledCpoSolver replaces.
+    """
+    return callable(getattr(CpoSolver, '_get_solver_agent', None))
+
+
+class SolverPool:
+    """
+        Pool of long-lived local cpoptimizer processes.
+
+        Every solve borrows one process, sends its model and returns the process
+        to the pool afterwards, so the process start is paid once per process
+        and not once per solve. A process that died or was left in the middle of
+        an operation is ended and replaced by a new one.
+
+        The pool depends on private attributes of the docplex solver agent. If
+        a process cannot be reused with the installed docplex, the pool turns
+        reuse off and every solve starts its own process.
+    """
+
+    def __init__(self, size: int = SOLVER_POOL_SIZE, execfile: str = None):
+        self.size = size
+        self.execfile = execfile
+        self.__idle_agents = []
+        self.__n_agents = 0
+        self.__condition = threading.Condition()
+        self.is_reuse_enabled = True
+
+    def __is_alive(self, agent):
+        process = getattr(agent, 'process', None)
+
+        return getattr(agent, 'active', False) and process is not None and process.poll() is None
+
+    def __end_agent(self, agent):
+        try:
+            agent.end()
+        except Exception as e:
+            logger.debug(e)
+
+    def __bind(self, agent, solver: CpoSolver):
+        # Same initialization as CpoSolverAgent.__init__ for an already running process
+        sctx = solver.context.solver.get(solver.context.solver.agent)
+        agent.solver = solver
+        agent.model = solver.get_model()
+        agent.params = sctx.params
+        agent.context = sctx
+        agent.last_json_result = None
+        agent.process_infos = solver.process_infos
+        agent.process_infos.update(agent.version_info)
+        agent.log_output = sctx.get_log_output()
+        agent.log_print = sctx.trace_log and (agent.log_output is not None)
+        agent.log_data = [] if sctx.add_log_to_solution else None
+        agent.log_enabled = agent.log_print or (agent.log_data is not None)
+
+        return agent
+
+    def acquire_agent(self, solver: PooledCpoSolver):
+        with self.__condition:
+            while len(self.__idle_agents) == 0 and self.__n_agents >= self.size:
+                self.__condition.wait()
+
+            while len(self.__idle_agents) > 0:
+                agent = self.__idle_agents.pop()
+                if not self.__is_alive(agent):
+                    logger.warning('Solver process is not alive, restart it.')
+                else:
+                    try:
+                        return self.__bind(agent, solver)
+                    except AttributeError as e:
+                        logger.warning(
+                            'Cannot reuse solver processes with this docplex version ({}), '
+                            'start a new process for every solve.'.format(e))
+                        self.is_reuse_enabled = False
+
+                self.__end_agent(agent)
+                self.__n_agents = self.__n_agents - 1
+
+            self.__n_agents = self.__n_agents + 1
+
+        try:
+            logger.debug('Start a new solver process.')
+            return solver.create_agent()
+        except Exception as e:
+            with self.__condition:
+                self.__n_agents = self.__n_agents - 1
+                self.__condition.notify()
+            raise e
+
+    def __release(self, solver: CpoSolver, is_reusable: bool):
+        agent = getattr(solver, 'agent', None)
+        if agent is None:
+            # Not started, or started by docplex itself
+            solver.end()
+            return
+        # Detach the agent so ending the solver does not stop the process
+        solver.agent = None
+
+        with self.__condition:
+            is_reusable = is_reusable and self.is_reuse_enabled and getattr(solver, 'status', None) == STATUS_IDLE
+            if is_reusable and self.__is_alive(agent):
+                self.__idle_agents.append(agent)
+            else:
+                self.__end_agent(agent)
+                self.__n_agents = self.__n_agents - 1
+            self.__condition.notify()
+
+    @contextmanager
+    def session(self, mdl: CpoModel, **kwargs):
+        """
+            Create a CpoSolver for mdl which runs on a pooled process.
+
+                Parameters:
+                    mdl (CpoModel): model to solve
+                    kwargs: solving context and parameters as for CpoModel.solve
+        """
+        solver = PooledCpoSolver(
+            mdl, pool=self, execfile=self.execfile or get_cpoptimizer_path(), **kwargs)
+        is_reusable = False
+        try:
+            yield solver
+            is_reusable = True
+        finally:
+            self.__release(solver, is_reusable)
+
+    def solve(self, mdl: CpoModel, **kwargs):
+        with self.session(mdl, **kwargs) as solver:
+            return solver.solve()
+
+    def close(self):
+        with self.__condition:
+            for agent in self.__idle_agents:
+                self.__end_agent(agent)
+            self.__n_agents = self.__n_agents - len(self.__idle_agents)
+            self.__idle_agents = []
+
+
+_solver_pool = None
+_solver_pool_lock = threading.Lock()
+
+
+def get_solver_pool(size: int = SOLVER_POOL_SIZE):
+    """
+        Return the solver pool shared by the whole process, None if the
+        installed docplex does not support it.
+    """
+    global _solver_pool
+
+    if not is_supported():
+        logger.warning('The solver pool does not support this docplex version, it is turned off.')
+        return None
+
+    with _solver_pool_lock:
+        if _solver_pool is None:
+            _solver_pool = SolverPool(size=size)
+            atexit.register(_solver_pool.close)
+
+        return _solver_pool
@@ -0,0 +1,251 @@
+import os
+import math
+import time
+import queue
+import threading
+import traceback
+import multiprocessing
+from typing import Any, Dict, List
+from docplex.cp.model import CpoModel
+from docplex.cp.solution import CpoIntervalVarSolution
+from docplex.cp.solver.solver import CpoSolver
+
+from const import PORTFOLIO_SEARCH_CONFIGS
+from libs.utils import get_cpoptimizer_path
+from libs.loggers import logging
+
+
+logger = logging.getLogger('solver_portfolio')
+
+# Seconds to wait for the workers after the time limit
+PORTFOLIO_GRACE_PERIOD = 30
+# Seconds between two checks of the stop event in a worker
+PORTFOLIO_STOP_POLL_INTERVAL = 0.1
+# Objective values closer than this are considered equal
+PORTFOLIO_TOLERANCE = 1e-6
+
+
+def solve_portfolio_member(
+    index: int,
+    cpo_string: str,
+    params: Dict[str, Any],
+    execfile: str,
+    result_queue,
+    stop_event
+):
+    """
+        Solve one configuration of the portfolio in a worker process.
+
+        Every new solution is reported to result_queue, and the search is
+        aborted when stop_event is set. The last message of the worker has
+        is_final set and contains the interval values of the best solution.
+    """
+    solver = None
+    try:
+        mdl = CpoModel()
+        mdl.import_model_string(cpo_string)
+        solver = CpoSolver(mdl, execfile=execfile, log_output=None, **params)
+
+        def abort_on_stop():
+            # Poll instead of wait(): set() blocks on waiters of exited processes
+            while not stop_event.is_set():
+                time.sleep(PORTFOLIO_STOP_POLL_INTERVAL)
+            solver.abort_search()
+
+        threading.Thread(target=abort_on_stop, daemon=True).start()
+
+        while True:
+            sres = solver.search_next()
+            if not sres.is_solution() or not sres.is_new_solution():
+                break
+
+            result_queue.put({
+                "index": index,
+                "is_final": False,
+                "objective_value": sres.get_objective_value(),
+                "objective_bound": sres.get_objective_bound(),
+                "is_optimal": sres.is_solution_optimal()
+            })
+
+        sres = solver.end_search()
+        intervals = None
+        if sres.is_solution():
+            intervals = {
+                itv.get_name(): (itv.get_start(), itv.get_end())
+                for itv in sres.get_all_var_solutions()
+                if isinstance(itv, CpoIntervalVarSolution) and itv.is_present()
+            }
+
+        result_queue.put({
+            "index": index,
+            "is_final": True,
+            "objective_value": sres.get_objective_value() if sres.is_solution() else None,
+            "objective_bound": sres.get_objective_bound(),
+            "is_optimal": sres.is_solution_optimal(),
+            "intervals": intervals,
+            "error": None
+        })
+    except Exception as e:
+        result_queue.put({
+            "index": index,
+            "is_final": True,
+            "objective_value": None,
+            "objective_bound": None,
+            "is_optimal": False,
+            "intervals": None,
+            "error": '{}\n{}'.format(e, traceback.format_exc())
+        })
+    finally:
+        if solver is not None:
+            solver.end()
+
+
+class SolverPortfolio:
+    """
+        Solve the same CP model with several search configurations in parallel
+        processes and keep the best solution. Equivalent models with another
+        formulation of the same objective can be added, the members take the
+        models in turn, so the portfolio varies the search and the formulation.
+
+        The processes report every solution, so the best objective value and
+        the best bound are shared between them: when one configuration proves
+        optimality, or the best solution of any configuration is within
+        target_gap of the best bound of any other (or of lower_bound), all
+        processes are stopped.
+    """
+
+    def __init__(self, size: int, total_workers: int = None, execfile: str = None):
+        self.size = size
+        self.total_workers = total_workers or os.cpu_count() or 1
+        self.execfile = execfile
+
+    def __create_configs(self, solve_params: Dict[str, Any]):
+        configs = []
+        for i in range(self.size):
+            if i < len(PORTFOLIO_SEARCH_CONFIGS):
+                config = dict(PORTFOLIO_SEARCH_CONFIGS[i])
+            else:
+                config = {"SearchType": "Restart", "RandomSeed": i}
+
+            params = dict(solve_params)
+            params.update(config)
+            params["Workers"] = max(1, self.total_workers // self.size)
+            configs.append(params)
+
+        return configs
+
+    def __is_proven(self, best: Dict[str, Any], best_bound: float, target_gap: float):
+        if best is None:
+            return False
+        if best['is_optimal']:
+            return True
+
+        objective_value = best['objective_value']
+        if objective_value <= best_bound + PORTFOLIO_TOLERANCE:
+            return True
+
+        return bool(target_gap) and (objective_value - best_bound) / objective_value <= target_gap
+
+    def solve(
+        self,
+        mdl: CpoModel,
+        solve_params: Dict[str, Any],
+        lower_bound: float = 0,
+        target_gap: float = None,
+        alternative_models: List[CpoModel] = None
+    ):
+        """
+            Return the best final result of the portfolio with the keys
+            objective_value, objective_bound, is_optimal, intervals (present
+            interval name to (start, end)), params and model (name of the
+            solved model), None if no configuration found a solution.
+
+                Parameters:
+                    mdl (CpoModel): model to solve
+                    solve_params (Dict[str, Any]): parameters of every member
+                    lower_bound (float): known lower bound of the objective value
+                    target_gap (float): stop when the best solution is within this relative gap
+                    alternative_models (List[CpoModel]): models with the same objective value and
+                        interval names as mdl, member i solves [mdl, *alternative_models][i % n]
+        """
+        configs = self.__create_configs(solve_params)
+        models = [mdl] + list(alternative_models or [])
+        model_names = [models[i % len(models)].get_name() for i in range(len(configs))]
+        cpo_strings = [x.get_cpo_string() for x in models]
+
+        context = multiprocessing.get_context('spawn')
+        result_queue = context.Queue()
+        stop_event = context.Event()
+        processes = [
+            context.Process(
+                target=solve_portfolio_member,
+                args=(i, cpo_strings[i % len(cpo_strings)], params, self.execfile or get_cpoptimizer_path(),
+                      result_queue, stop_event),
+                daemon=True
+            )
+            for i, params in enumerate(configs)
+        ]
+        for process in processes:
+            process.start()
+
+        best = None
+        best_bound = lower_bound
+        finals = {}
+        timeout = solve_params.get('TimeLimit', 0) + PORTFOLIO_GRACE_PERIOD
+
+        try:
+            while len(finals) < len(processes):
+                try:
+                    message = result_queue.get(timeout=timeout)
+                except queue.Empty:
+                    logger.warning('Portfolio workers did not finish in time.')
+                    break
+
+                # Aborted or failed searches report no usable bound
+                if message['objective_value'] is not None and message['objective_bound'] is not None \
+                        and math.isfinite(message['objective_bound']):
+                    best_bound = max(best_bound, message['objective_bound'])
+
+                if message['objective_value'] is not None and (
+                        best is None or message['objective_value'] < best['objective_value']
+                        or (message['is_optimal'] and not best['is_optimal'])):
+                    best = message
+
+                if message['is_final']:
+                    finals[message['index']] = message
+                    if message['error'] is not None:
+                        logger.debug('Portfolio member {} failed: {}'.format(
+                            message['index'], message['error']))
+
+                if not stop_event.is_set() and self.__is_proven(best, best_bound, target_gap):
+                    logger.info('Portfolio member {} reached the bound, stop the others.'.format(
+                        best['index']))
+                    stop_event.set()
+        finally:
+            stop_event.set()
+            for process in processes:
+                process.join(timeout=PORTFOLIO_GRACE_PERIOD)
+                if process.is_alive():
+                    process.terminate()
+
+        # The best final message contains the interval values
+        results = [x for x in finals.values() if x['intervals'] is not None]
+        if len(results) == 0:
+            return None
+
+        result = min(results, key=lambda x: (x['objective_value'], not x['is_optimal']))
+        for message in finals.values():
+            logger.debug('Portfolio member {} {} {}: {}'.format(
+                message['index'], model_names[message['index']], configs[message['index']],
+                message['objective_value']))
+        logger.info('Best portfolio member: {} {} {}'.format(
+            result['index'], model_names[result['index']], configs[result['index']]))
+
+        return {
+            "objective_value": result['objective_value'],
+            "objective_bound": best_bound,
+            "is_optimal": result['is_optimal'] or self.__is_proven(result, best_bound, None),
+            "intervals": result['intervals'],
+            "params": configs[result['index']],
+            "model": model_names[result['index']]
+        }
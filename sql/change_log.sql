@@ -0,0 +1,127 @@
+-- Change log of the tables read by SoItem.get_pending_job, polled by main.py --watch.
+-- Every insert, update and delete writes the sale order and material it affects.
+-- An update which moves a row to another sale order or material also writes the
+-- old one, its plan has to be replanned as well.
+
+CREATE TABLE IF NOT EXISTS pd_change_log (
+    change_id BIGINT NOT NULL AUTO_INCREMENT,
+    table_name VARCHAR(64) NOT NULL,
+    so_id INT NULL,
+    mat_id INT NULL,
+    changed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (change_id)
+);
+
+DELIMITER //
+
+-- Replace the triggers changed since earlier versions of this script
+DROP TRIGGER IF EXISTS so_item_after_update;
+//
+DROP TRIGGER IF EXISTS do_item_after_update;
+//
+DROP TRIGGER IF EXISTS draft_do_item_after_insert;
+//
+DROP TRIGGER IF EXISTS draft_do_item_after_update;
+//
+DROP TRIGGER IF EXISTS draft_do_item_after_delete;
+//
+
+CREATE TRIGGER IF NOT EXISTS so_item_after_insert AFTER INSERT ON so_item FOR EACH ROW
+    INSERT INTO pd_change_log (table_name, so_id, mat_id) VALUES ('so_item', NEW.so_id, NEW.mat_id);
+//
+CREATE TRIGGER IF NOT EXISTS so_item_after_update AFTER UPDATE ON so_item FOR EACH ROW
+BEGIN
+    INSERT INTO pd_change_log (table_name, so_id, mat_id) VALUES ('so_item', NEW.so_id, NEW.mat_id);
+    IF NOT (OLD.so_id <=> NEW.so_id AND OLD.mat_id <=> NEW.mat_id) THEN
+        INSERT INTO pd_change_log (table_name, so_id, mat_id) VALUES ('so_item', OLD.so_id, OLD.mat_id);
+    END IF;
+END;
+//
+CREATE TRIGGER IF NOT EXISTS so_item_after_delete AFTER DELETE ON so_item FOR EACH ROW
+    INSERT INTO pd_change_log (table_name, so_id, mat_id) VALUES ('so_item', OLD.so_id, OLD.mat_id);
+//
+
+CREATE TRIGGER IF NOT EXISTS do_item_after_insert AFTER INSERT ON do_item FOR EACH ROW
+    INSERT INTO pd_change_log (table_name, so_id, mat_id)
+    VALUES ('do_item', (SELECT so_id FROM do WHERE do_id = NEW.do_id), NEW.mat_id);
+//
+CREATE TRIGGER IF NOT EXISTS do_item_after_update AFTER UPDATE ON do_item FOR EACH ROW
+BEGIN
+    INSERT INTO pd_change_log (table_name, so_id, mat_id)
+    VALUES ('do_item', (SELECT so_id FROM do WHERE do_id = NEW.do_id), NEW.mat_id);
+    IF NOT (OLD.do_id <=> NEW.do_id AND OLD.mat_id <=> NEW.mat_id) THEN
+        INSERT INTO pd_change_log (table_name, so_id, mat_id)
+        VALUES ('do_item', (SELECT so_id FROM do WHERE do_id = OLD.do_id), OLD.mat_id);
+    END IF;
+END;
+//
+CREATE TRIGGER IF NOT EXISTS do_item_after_delete AFTER DELETE ON do_item FOR EACH ROW
+    INSERT INTO pd_change_log (table_name, so_id, mat_id)
+    VALUES ('do_item', (SELECT so_id FROM do WHERE do_id = OLD.do_id), OLD.mat_id);
+//
+
+-- The status and date of a sale order and the status of a delivery order
+-- decide whether their items are pending, so a change of the header logs
+-- every material of its items.
+CREATE TRIGGER IF NOT EXISTS so_after_update AFTER UPDATE ON so FOR EACH ROW
+    INSERT INTO pd_change_log (table_name, so_id, mat_id)
+    SELECT 'so', so_item.so_id, so_item.mat_id FROM so_item WHERE so_item.so_id IN (OLD.so_id, NEW.so_id);
+//
+CREATE TRIGGER IF NOT EXISTS so_after_delete AFTER DELETE ON so FOR EACH ROW
+    INSERT INTO pd_change_log (table_name, so_id, mat_id)
+    SELECT 'so', so_item.so_id, so_item.mat_id FROM so_item WHERE so_item.so_id = OLD.so_id;
+//
+
+CREATE TRIGGER IF NOT EXISTS do_after_update AFTER UPDATE ON do FOR EACH ROW
+BEGIN
+    INSERT INTO pd_change_log (table_name, so_id, mat_id)
+    SELECT 'do', NEW.so_id, do_item.mat_id FROM do_item WHERE do_item.do_id = NEW.do_id;
+    IF NOT (OLD.do_id <=> NEW.do_id AND OLD.so_id <=> NEW.so_id) THEN
+        INSERT INTO pd_change_log (table_name, so_id, mat_id)
+        SELECT 'do', OLD.so_id, do_item.mat_id FROM do_item WHERE do_item.do_id = OLD.do_id;
+    END IF;
+END;
+//
+CREATE TRIGGER IF NOT EXISTS do_after_delete AFTER DELETE ON do FOR EACH ROW
+    INSERT INTO pd_change_log (table_name, so_id, mat_id)
+    SELECT 'do', OLD.so_id, do_item.mat_id FROM do_item WHERE do_item.do_id = OLD.do_id;
+//
+
+-- Recorded production counts against the sale order items of its result
+-- material through draft_do_item.
+CREATE TRIGGER IF NOT EXISTS pd_item_after_insert AFTER INSERT ON pd_item FOR EACH ROW
+    INSERT INTO pd_change_log (table_name, mat_id) VALUES ('pd_item', NEW.result_id);
+//
+CREATE TRIGGER IF NOT EXISTS pd_item_after_update AFTER UPDATE ON pd_item FOR EACH ROW
+BEGIN
+    INSERT INTO pd_change_log (table_name, mat_id) VALUES ('pd_item', NEW.result_id);
+    IF NOT (OLD.result_id <=> NEW.result_id) THEN
+        INSERT INTO pd_change_log (table_name, mat_id) VALUES ('pd_item', OLD.result_id);
+    END IF;
+END;
+//
+CREATE TRIGGER IF NOT EXISTS pd_item_after_delete AFTER DELETE ON pd_item FOR EACH ROW
+    INSERT INTO pd_change_log (table_name, mat_id) VALUES ('pd_item', OLD.result_id);
+//
+
+-- A draft item counts against the result material of its production item.
+CREATE TRIGGER IF NOT EXISTS draft_do_item_after_insert AFTER INSERT ON draft_do_item FOR EACH ROW
+    INSERT INTO pd_change_log (table_name, mat_id)
+    VALUES ('draft_do_item', (SELECT result_id FROM pd_item WHERE pd_item_id = NEW.pd_item_id));
+//
+CREATE TRIGGER IF NOT EXISTS draft_do_item_after_update AFTER UPDATE ON draft_do_item FOR EACH ROW
+BEGIN
+    INSERT INTO pd_change_log (table_name, mat_id)
+    VALUES ('draft_do_item', (SELECT result_id FROM pd_item WHERE pd_item_id = NEW.pd_item_id));
+    IF NOT (OLD.pd_item_id <=> NEW.pd_item_id) THEN
+        INSERT INTO pd_change_log (table_name, mat_id)
+        VALUES ('draft_do_item', (SELECT result_id FROM pd_item WHERE pd_item_id = OLD.pd_item_id));
+    END IF;
+END;
+//
+CREATE TRIGGER IF NOT EXISTS draft_do_item_after_delete AFTER DELETE ON draft_do_item FOR EACH ROW
+    INSERT INTO pd_change_log (table_name, mat_id)
+    VALUES ('draft_do_item', (SELECT result_id FROM pd_item WHERE pd_item_id = OLD.pd_item_id));
+//
+
+DELIMITER ;
@@ -0,0 +1,159 @@
+from datetime import datetime
+from types import SimpleNamespace
+import pandas as pd
+import pytest
+
+from const import PUBLISH_MODE_DIFF, MACHINE_GROUPING_FIXED
+from libs.settings import settings, PlanningContext
+import services.production_planning.change_watcher as change_watcher
+import services.production_planning.production_planning as production_planning
+
+
+PENDING_JOB_COLUMNS = ['mat_id', 'so_id', 'sale_volume', 'res_draft_volume', 'so_pub_date']
+CHANGE_LOG_COLUMNS = ['change_id', 'table_name', 'so_id', 'mat_id', 'changed_at']
+
+
+def plan_row(so_id, mat_id, machine_id):
+    return {
+        "so_id": so_id,
+        "mat_id": mat_id,
+        "machine_id": machine_id,
+        "start_timestamp": '2026-10-10 08:00:00',
+        "end_timestamp": '2026-10-10 10:00:00',
+        "res_volume": 100.0,
+        "batch_volume": 100.0,
+        "remaining_volume": 0.0
+    }
+
+
+class FakeRepository:
+    """
+        Repository of a database where machine 1 (type 1) produces material 10
+        and machine 2 (type 2) material 20, without pending jobs.
+    """
+
+    def __init__(self, database):
+        self.database = database
+        self.machine = SimpleNamespace(get_machine_master=lambda: pd.DataFrame({
+            "machine_id": [1, 2],
+            "machine_type_id": [1, 2],
+            "machine_change_time": [30, 30],
+            "machine_weight_hour": [500.0, 500.0],
+            "machine_spd_mul": [1.0, 1.0]
+        }))
+        self.machine_material = SimpleNamespace(
+            get_machine_material=lambda: pd.DataFrame({"machine_id": [1, 2], "mat_id": [10, 20]}))
+        self.materials = SimpleNamespace(
+            get_material_material=lambda: pd.DataFrame({"mat_id": [10, 20], "mat_size": [10.0, 10.0]}))
+        self.so_item = SimpleNamespace(
+            get_pending_job=lambda mat_ids=None: pd.DataFrame(columns=PENDING_JOB_COLUMNS))
+        self.change_log = SimpleNamespace(
+            get_last_change_id=lambda: 0,
+            get_changes=lambda after_change_id: pd.DataFrame(columns=CHANGE_LOG_COLUMNS),
+            delete_changes=lambda up_to_change_id: database['deleted_changes'].append(up_to_change_id))
+        self.pd_plan = SimpleNamespace(
+            get_plan=lambda: pd.DataFrame(database['pd_plan']),
+            delete_plan_rows=lambda values, **kwargs: database['deleted_rows'].extend(values),
+            insert_plan=lambda values, **kwargs: database['inserted_rows'].extend(values),
+            lock_plan=lambda: None,
+            unlock_plan=lambda: None)
+
+    def run_in_transaction(self, task, kwargs=None):
+        return task(**(kwargs or {}))
+
+    def commit(self):
+        pass
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = {
+        "pd_plan": [plan_row(1, 10, 1), plan_row(2, 20, 2)],
+        "deleted_changes": [],
+        "deleted_rows": [],
+        "inserted_rows": []
+    }
+    monkeypatch.setattr(change_watcher, 'ProductionPlanningRepository', lambda conn: FakeRepository(database))
+    monkeypatch.setattr(production_planning, 'ProductionPlanningRepository', lambda conn: FakeRepository(database))
+
+    with settings.override({
+        "publish_mode": PUBLISH_MODE_DIFF,
+        "machine_grouping": MACHINE_GROUPING_FIXED,
+        "solution_cache_dir": None,
+        "history_dir": None,
+        "job_queue": None
+    }):
+        yield database
+
+
+def create_changes(change_ids, mat_id):
+    return pd.DataFrame({
+        "change_id": change_ids,
+        "table_name": ['so_item'] * len(change_ids),
+        "so_id": [1] * len(change_ids),
+        "mat_id": [mat_id] * len(change_ids),
+        "changed_at": [None] * len(change_ids)
+    })
+
+
+def test_replan_without_pending_jobs_clears_the_plan_of_the_scope(database):
+    watcher = change_watcher.ChangeWatcher(conn=None)
+
+    # The last pending job of material 10 was delivered
+    watcher.replan(create_changes([5, 6], mat_id=10))
+
+    assert watcher.last_change_id == 6
+    assert database['deleted_changes'] == [6]
+    assert [(x['so_id'], x['machine_id']) for x in database['deleted_rows']] == [(1, 1)]
+    assert database['inserted_rows'] == []
+
+
+def test_failed_replan_is_not_read_again_and_replanned_with_the_next_changes(database, monkeypatch):
+    planned_groups = []
+
+    class FailingProductionPlanning:
+        def __init__(self, conn, connection_factory=None, context=None):
+            pass
+
+        def generate_production_plan(self, machine_groups=None):
+            planned_groups.append(machine_groups)
+            if len(planned_groups) == 1:
+                raise Exception('All planning failed.')
+
+    monkeypatch.setattr(change_watcher, 'ProductionPlanning', FailingProductionPlanning)
+    watcher = change_watcher.ChangeWatcher(conn=None)
+
+    with pytest.raises(Exception):
+        watcher.replan(create_changes([5], mat_id=10))
+
+    assert watcher.last_change_id == 5
+    assert database['deleted_changes'] == []
+
+    watcher.replan(create_changes([7], mat_id=20))
+
+    assert planned_groups == [[[1]], [[1], [2]]]
+    assert watcher.last_change_id == 7
+    assert database['deleted_changes'] == [7]
+    assert watcher.failed_machine_groups == []
+
+
+def test_replan_does_not_start_before_tomorrow(database, monkeypatch):
+    contexts = []
+
+    class RecordingProductionPlanning:
+        def __init__(self, conn, connection_factory=None, context=None):
+            contexts.append(context)
+
+        def generate_production_plan(self, machine_groups=None):
+            pass
+
+    monkeypatch.setattr(change_watcher, 'ProductionPlanning', RecordingProductionPlanning)
+    context = PlanningContext(start_working_hour=datetime(2020, 1, 6, 8, 30))
+    future_context = context.with_start_date('2999-01-04')
+
+    change_watcher.ChangeWatcher(conn=None, context=context).replan(create_changes([5], mat_id=10))
+    change_watcher.ChangeWatcher(conn=None, context=future_context).replan(create_changes([6], mat_id=10))
+
+    assert contexts[0].start_working_hour > datetime.now()
+    assert contexts[0].start_working_hour.strftime('%H:%M') == '08:30'
+    assert contexts[1] == future_context
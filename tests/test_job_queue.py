@@ -0,0 +1,157 @@
+import os
+import time
+import threading
+import pytest
+
+from services.production_planning.job_queue import FileJobQueue, SqliteJobQueue, create_job_queue, \
+    TASK_PENDING, TASK_CLAIMED, TASK_DONE, TASK_FAILED
+
+
+LEASE_SECONDS = 0.5
+
+
+@pytest.fixture(params=['file', 'sqlite'])
+def job_queue(request, tmp_path):
+    if request.param == 'file':
+        return FileJobQueue(str(tmp_path / 'queue'), lease_seconds=LEASE_SECONDS, max_attempts=2)
+
+    return SqliteJobQueue(str(tmp_path / 'queue.db'), lease_seconds=LEASE_SECONDS, max_attempts=2)
+
+
+def expire_lease():
+    time.sleep(LEASE_SECONDS * 1.5)
+
+
+def test_create_job_queue_by_location(tmp_path):
+    assert isinstance(create_job_queue(str(tmp_path / 'queue.db')), SqliteJobQueue)
+    assert isinstance(create_job_queue(str(tmp_path / 'queue.sqlite')), SqliteJobQueue)
+    assert isinstance(create_job_queue(str(tmp_path / 'queue')), FileJobQueue)
+
+
+def test_claim_returns_the_oldest_task_once(job_queue):
+    job_queue.put('task_1', {"name": 'a'}, b'data a')
+    job_queue.put('task_2', {"name": 'b'}, b'data b')
+
+    first = job_queue.claim('worker_1')
+    second = job_queue.claim('worker_2')
+
+    assert (first['task_id'], first['task'], first['data'], first['attempt']) == ('task_1', {"name": 'a'}, b'data a', 1)
+    assert second['task_id'] == 'task_2'
+    assert job_queue.claim('worker_3') is None
+    assert job_queue.get('task_1')['status'] == TASK_CLAIMED
+
+
+def test_concurrent_workers_claim_every_task_exactly_once(job_queue):
+    task_ids = ['task_{:02d}'.format(i) for i in range(20)]
+    for task_id in task_ids:
+        job_queue.put(task_id, {}, b'')
+
+    claimed = []
+    lock = threading.Lock()
+
+    def work(worker_id):
+        while True:
+            task = job_queue.claim(worker_id)
+            if task is None:
+                return
+            with lock:
+                claimed.append(task['task_id'])
+            # A task left claimed would be claimed again once its short lease expires
+            job_queue.complete(task['task_id'], task['attempt'], {})
+
+    workers = [threading.Thread(target=work, args=('worker_{}'.format(i),)) for i in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert sorted(claimed) == task_ids
+
+
+def test_renewed_lease_is_kept(job_queue):
+    job_queue.put('task_1', {}, b'')
+    task = job_queue.claim('worker_1')
+
+    for _ in range(3):
+        time.sleep(LEASE_SECONDS / 2)
+        assert job_queue.renew('task_1', task['attempt'])
+
+    assert job_queue.claim('worker_2') is None
+    assert job_queue.get('task_1')['status'] == TASK_CLAIMED
+
+
+def test_expired_lease_is_claimed_again(job_queue):
+    job_queue.put('task_1', {}, b'')
+    first = job_queue.claim('worker_1')
+
+    expire_lease()
+    assert job_queue.get('task_1')['status'] == TASK_PENDING
+    second = job_queue.claim('worker_2')
+
+    assert second['attempt'] == 2
+    assert not job_queue.renew('task_1', first['attempt'])
+    assert job_queue.renew('task_1', second['attempt'])
+
+
+def test_task_fails_after_max_attempts(job_queue):
+    job_queue.put('task_1', {}, b'')
+
+    first = job_queue.claim('worker_1')
+    job_queue.fail('task_1', first['attempt'], 'first error')
+    assert job_queue.get('task_1')['status'] == TASK_PENDING
+
+    second = job_queue.claim('worker_2')
+    assert second['attempt'] == 2
+    job_queue.fail('task_1', second['attempt'], 'second error')
+
+    assert job_queue.claim('worker_3') is None
+    assert job_queue.get('task_1') == {"status": TASK_FAILED, "result": None, "error": 'second error'}
+
+
+def test_task_fails_when_the_lease_of_the_last_attempt_expires(job_queue):
+    job_queue.put('task_1', {}, b'')
+
+    job_queue.claim('worker_1')
+    expire_lease()
+    job_queue.claim('worker_2')
+    expire_lease()
+
+    state = job_queue.get('task_1')
+    assert state['status'] == TASK_FAILED
+    assert 'expired' in state['error']
+    assert job_queue.claim('worker_3') is None
+
+
+def test_late_result_of_an_expired_attempt_is_kept(job_queue):
+    job_queue.put('task_1', {}, b'')
+    first = job_queue.claim('worker_1')
+
+    expire_lease()
+    job_queue.claim('worker_2')
+    job_queue.complete('task_1', first['attempt'], {"objective_value": 1})
+
+    assert job_queue.get('task_1') == {"status": TASK_DONE, "result": {"objective_value": 1}, "error": None}
+    assert job_queue.claim('worker_3') is None
+
+
+def test_deleted_task_is_gone(job_queue):
+    job_queue.put('task_1', {}, b'')
+    task = job_queue.claim('worker_1')
+    job_queue.delete('task_1')
+
+    # A worker finishing a deleted task must not fail
+    job_queue.complete('task_1', task['attempt'], {})
+    job_queue.fail('task_1', task['attempt'], 'error')
+    assert job_queue.claim('worker_2') is None
+
+
+def test_file_lease_uses_the_time_of_the_storage(tmp_path, monkeypatch):
+    job_queue = FileJobQueue(str(tmp_path / 'queue'), lease_seconds=LEASE_SECONDS)
+    job_queue.put('task_1', {}, b'')
+    job_queue.claim('worker_1')
+
+    # The clock of this host runs an hour ahead of the storage
+    monkeypatch.setattr(time, 'time', lambda: os.path.getmtime(str(tmp_path / 'queue' / '.clock')) + 3600)
+
+    assert job_queue.get('task_1')['status'] == TASK_CLAIMED
+    assert job_queue.claim('worker_2') is None
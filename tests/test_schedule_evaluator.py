@@ -0,0 +1,116 @@
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pytest
+
+from libs.settings import PlanningContext
+from services.production_planning.problem_instance import ProblemInstance
+from services.production_planning.schedule_evaluator import ScheduleEvaluator
+
+
+def create_instance(job_index, mat_id, due_time_unit, machine_id, setup_time, duration, rate):
+    duration = np.asarray(duration, dtype=np.int32)
+    _, mat_index = np.unique(mat_id, return_inverse=True)
+
+    return ProblemInstance(
+        job_index=np.asarray(job_index, dtype=np.int64),
+        so_id=np.asarray(job_index, dtype=np.int64) + 100,
+        mat_id=np.asarray(mat_id, dtype=np.int64),
+        mat_index=mat_index.astype(np.int32),
+        volume=(duration.max(axis=1) * np.asarray(rate, dtype=float).max(axis=1)),
+        due_time_unit=np.asarray(due_time_unit, dtype=np.int32),
+        machine_id=np.asarray(machine_id, dtype=np.int32),
+        setup_time=np.asarray(setup_time, dtype=np.int32),
+        duration=duration,
+        rate=np.asarray(rate, dtype=float)
+    )
+
+
+def create_solutions(rows):
+    return pd.DataFrame(rows, columns=['machine_id', 'job_id', 'start', 'end'])
+
+
+@pytest.fixture
+def evaluator():
+    """
+        Two machine groups whose jobs are numbered 0 and 1 in each group:
+        jobs 0 and 2 of the plan on machine 101 (machine 102 is empty), and
+        jobs 1 and 3 of two materials on machine 201.
+    """
+    evaluator = ScheduleEvaluator(PlanningContext(
+        start_working_hour=datetime(2026, 10, 19, 8, 0),
+        weight_of_tardy_job=10,
+        weight_of_adjustment_time=1
+    ))
+    evaluator.add_group(
+        create_instance(
+            job_index=[0, 2], mat_id=[1, 1], due_time_unit=[2, 4], machine_id=[101, 102],
+            setup_time=[1, 1], duration=[[2, 2], [3, 3]], rate=[[10.0, 10.0], [10.0, 10.0]]),
+        create_solutions([(0, 0, 0, 2), (0, 1, 2, 5)])
+    )
+    evaluator.add_group(
+        create_instance(
+            job_index=[1, 3], mat_id=[2, 3], due_time_unit=[0, 0], machine_id=[201],
+            setup_time=[1], duration=[[4], [1]], rate=[[10.0], [10.0]]),
+        create_solutions([(0, 0, 0, 4), (0, 1, 5, 6)])
+    )
+
+    return evaluator
+
+
+def get_job(schedule_df, job_index):
+    return schedule_df.set_index('job_index').loc[job_index]
+
+
+def test_schedule_has_every_job_of_the_plan_once(evaluator):
+    schedule_df = evaluator.get_schedule_df()
+
+    assert sorted(schedule_df['job_index']) == [0, 1, 2, 3]
+    assert get_job(schedule_df, 3)['machine_id'] == 201
+    assert evaluator.get_objective() == {
+        "objective_value": 11,
+        "tardy_job_objective_value": 10,
+        "adjustment_time_objective_value": 1
+    }
+
+
+def test_move_edits_the_job_of_its_own_group(evaluator):
+    result = evaluator.move(2, 102, position=0)
+
+    assert result['machine_ids'] == [101, 102]
+    assert get_job(result['schedule_df'], 2)[['machine_id', 'start', 'end']].tolist() == [102, 0, 3]
+    assert get_job(evaluator.get_schedule_df(), 3)[['machine_id', 'start', 'end']].tolist() == [201, 5, 6]
+    assert evaluator.get_objective()['objective_value'] == 1
+
+    with pytest.raises(Exception):
+        evaluator.move(0, 201)
+
+
+def test_swap_and_resize_reschedule_the_other_group(evaluator):
+    result = evaluator.swap(1, 3)
+
+    assert result['machine_ids'] == [201]
+    assert result['schedule_df'][['job_index', 'start', 'end']].values.tolist() == [[3, 0, 1], [1, 2, 6]]
+
+    result = evaluator.resize(3, 30.0)
+
+    assert result['schedule_df'][['job_index', 'start', 'end']].values.tolist() == [[3, 0, 3], [1, 4, 8]]
+    assert get_job(evaluator.get_schedule_df(), 2)[['machine_id', 'start', 'end']].tolist() == [101, 2, 5]
+
+    with pytest.raises(Exception):
+        evaluator.swap(0, 1)
+
+
+def test_undo_restores_the_plan_before_each_edit(evaluator):
+    before = evaluator.get_schedule_df()
+    evaluator.move(2, 102)
+    after_move = evaluator.get_schedule_df()
+    evaluator.resize(3, 30.0)
+
+    evaluator.undo()
+    pd.testing.assert_frame_equal(evaluator.get_schedule_df(), after_move)
+
+    evaluator.undo()
+    pd.testing.assert_frame_equal(evaluator.get_schedule_df(), before)
+    assert evaluator.get_objective()['objective_value'] == 11
+    assert evaluator.undo() is None
@@ -0,0 +1,19 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from libs.settings import settings
+
+
+def test_bound_task_sees_the_override_in_another_thread():
+    with settings.override({"site": 'site_a'}):
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            unbound = executor.submit(settings.get_setting, 'site').result()
+            bound = executor.submit(settings.bind(settings.get_setting), 'site').result()
+
+    assert unbound is None
+    assert bound == 'site_a'
+
+
+def test_task_bound_without_override_sees_the_shared_settings():
+    task = settings.get_setting
+
+    assert settings.bind(task) is task
@@ -0,0 +1,43 @@
+import sys
+import argparse
+import multiprocessing
+
+from libs.settings import settings
+from libs.loggers import logging
+from services.production_planning.job_queue import create_job_queue
+from services.production_planning.distributed_planning import PlanningWorker
+from services.production_planning.solver_pool import get_solver_pool
+
+
+parser = argparse.ArgumentParser(
+    description="Solve the machine groups queued by main.py --queue.")
+parser.add_argument("queue", help="Job queue: a SQLite file (.db) or a directory")
+parser.add_argument("--worker-id", help="Name of the worker in the queue, host and process id by default")
+parser.add_argument("--idle-timeout", metavar="SEC", type=float,
+                    help="Stop after the queue was empty for SEC seconds, run forever by default")
+parser.add_argument("--max-tasks", metavar="N", type=int, help="Stop after N tasks")
+parser.add_argument("--workers", metavar="N", type=int, help="Solver workers (cores) per task, all cores by default")
+parser.add_argument("--solver-pool", action="store_true",
+                    help="Keep the cpoptimizer process alive and reuse it for the next task")
+parser.add_argument("--debug", action="store_true")
+
+
+def main(args):
+    if args.debug:
+        settings.update_setting('STAGE', 'dev')
+    settings.update_setting('solver_workers', args.workers)
+
+    logging.init()
+
+    worker = PlanningWorker(
+        job_queue=create_job_queue(args.queue),
+        worker_id=args.worker_id,
+        solver_pool=get_solver_pool(1) if args.solver_pool else None
+    )
+    worker.run(idle_timeout=args.idle_timeout, max_tasks=args.max_tasks)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main(parser.parse_args())
+    sys.exit(0)